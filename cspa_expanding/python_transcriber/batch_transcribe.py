@@ -0,0 +1,173 @@
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import main
+import main_seq_text
+import main_tuple
+
+# The run_protocol scripts in prot_impl start a new interpreter through the
+# shell for every folder, this transcribes all of them from one pool of worker
+# processes that import the transcribers once.
+
+
+@dataclass
+class Variant:
+    """the transcriber to use and where its output goes, same suffixes as
+    run_protocol.py, run_protocol_tuple.py and new_run_protocol.py"""
+    main_module_name: str
+    base_file_name: str
+    file_suffix: str
+
+
+VARIANTS: Dict[str, Variant] = {
+    "new": Variant("main", "base_with_seq.frg", "new_transcr.frg"),
+    "hash": Variant("main", "base_with_seq_and_hash.frg", "transcr_with_hash.frg"),
+    "tuple": Variant("main_tuple", "base_with_seq_and_tuple_micro.frg", "tuple_new_transcr.frg"),
+    "seq_text": Variant("main_seq_text", "base_with_seq_text.frg", "new_transcr_seq_text.frg"),
+}
+MAIN_MODULES = {"main": main, "main_tuple": main_tuple, "main_seq_text": main_seq_text}
+
+
+@dataclass
+class ProtocolFolder:
+    folder_path: Path
+    rkt_file_path: Path
+    run_forge_file_path: Path
+
+    @property
+    def base_prot_name(self) -> str:
+        return self.rkt_file_path.stem
+
+
+@dataclass
+class FolderResult:
+    folder_name: str
+    status: str
+    seconds: float
+    message: str
+
+
+def path_rel_to_script(path):
+    script_path = Path(__file__).parent
+    return (script_path / path).resolve()
+
+
+def find_protocol_folders(root: str | Path) -> Tuple[List[ProtocolFolder], List[FolderResult]]:
+    """every direct subfolder of root with exactly one rkt file and a run file
+    of the same name, folders that do not look like that are returned as
+    skipped results with the reason"""
+    folders: List[ProtocolFolder] = []
+    skipped: List[FolderResult] = []
+    for folder_path in sorted(Path(root).iterdir()):
+        if not folder_path.is_dir() or folder_path.name.startswith((".", "__")):
+            continue
+        rkt_files = sorted(folder_path.glob("*.rkt"))
+        if len(rkt_files) != 1:
+            skipped.append(FolderResult(folder_path.name, "skipped", 0.0,
+                                        f"expected one rkt file not {len(rkt_files)}"))
+            continue
+        run_forge_file_path = rkt_files[0].with_suffix(".frg")
+        if not run_forge_file_path.exists():
+            skipped.append(FolderResult(folder_path.name, "skipped", 0.0,
+                                        f"no run file {run_forge_file_path.name}"))
+            continue
+        folders.append(ProtocolFolder(folder_path, rkt_files[0], run_forge_file_path))
+    return folders, skipped
+
+
+def destination_path(prot_folder: ProtocolFolder, variant: Variant,
+                     output_dir: str | Path | None) -> Path:
+    dest_dir = prot_folder.folder_path if output_dir is None else Path(output_dir)
+    return dest_dir / f"{prot_folder.base_prot_name}_{variant.file_suffix}"
+
+
+def transcribe_folder(prot_folder: ProtocolFolder, variant_name: str,
+                      output_dir: str | Path | None = None,
+                      parse_cache_dir: str | None = None) -> FolderResult:
+    """runs the main function of the variant in this process. The output is
+    transcribed to memory first so a failing protocol never leaves a half
+    written file behind, whatever the transcriber prints is dropped"""
+    variant = VARIANTS[variant_name]
+    transcriber_main = MAIN_MODULES[variant.main_module_name].main
+    start = time.perf_counter()
+    destination_forge_file = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            with open(prot_folder.rkt_file_path) as cpsa_file:
+                with open(path_rel_to_script(variant.base_file_name)) as base_file:
+                    with open(path_rel_to_script("./extra_funcs.frg")) as extra_func_file:
+                        with open(prot_folder.run_forge_file_path) as run_forge_file:
+                            transcriber_main(cpsa_file, destination_forge_file, base_file,
+                                             extra_func_file, run_forge_file, False, None,
+                                             parse_cache_dir)
+        dest_path = destination_path(prot_folder, variant, output_dir)
+        dest_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(dest_path, "w") as dest_file:
+            dest_file.write(destination_forge_file.getvalue())
+    except Exception as e:
+        last_frame = traceback.extract_tb(e.__traceback__)[-1]
+        return FolderResult(prot_folder.folder_path.name, "failed", time.perf_counter() - start,
+                            f"{type(e).__name__}: {e} ({Path(last_frame.filename).name}:{last_frame.lineno})")
+    return FolderResult(prot_folder.folder_path.name, "ok", time.perf_counter() - start,
+                        f"wrote {dest_path.name}")
+
+
+def transcribe_all(folders: List[ProtocolFolder], variant_name: str, jobs: int | None = None,
+                   output_dir: str | Path | None = None,
+                   parse_cache_dir: str | None = None) -> List[FolderResult]:
+    """results in the order of folders"""
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(transcribe_folder, prot_folder, variant_name,
+                                   output_dir, parse_cache_dir): indx
+                   for indx, prot_folder in enumerate(folders)}
+        results: List[FolderResult | None] = [None] * len(folders)
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+    return results
+
+
+def format_table(results: List[FolderResult]) -> str:
+    name_width = max([len("folder")] + [len(result.folder_name) for result in results])
+    lines = [f"{'folder':<{name_width}}  status   seconds  message"]
+    for result in results:
+        lines.append(f"{result.folder_name:<{name_width}}  {result.status:<7}  {result.seconds:7.3f}  {result.message}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    argument_parser = argparse.ArgumentParser(
+        prog="batch_transcribe",
+        description="transcribe every protocol folder in parallel and print how long each one took")
+    argument_parser.add_argument("root", nargs="?", default=str(path_rel_to_script("../../prot_impl")),
+                                 help="folder containing one folder per protocol, defaults to prot_impl")
+    argument_parser.add_argument("--variant", choices=VARIANTS.keys(), default="new",
+                                 help="which transcriber to run, decides the suffix of the output files")
+    argument_parser.add_argument("--jobs", type=int, default=None,
+                                 help="number of worker processes, defaults to the number of cpus")
+    argument_parser.add_argument("--output_dir", type=str,
+                                 help="write every output here instead of next to its rkt file")
+    argument_parser.add_argument("--parse_cache_dir", type=str,
+                                 help="directory used to cache parsed protocols, skeletons and instances between runs")
+    args = argument_parser.parse_args()
+
+    if args.output_dir is not None:
+        os.makedirs(args.output_dir, exist_ok=True)
+    wall_start = time.perf_counter()
+    folders, skipped = find_protocol_folders(args.root)
+    results = transcribe_all(folders, args.variant, args.jobs, args.output_dir, args.parse_cache_dir)
+    wall_seconds = time.perf_counter() - wall_start
+    print(format_table(sorted(results + skipped, key=lambda result: result.folder_name)))
+    num_ok = len([result for result in results if result.status == "ok"])
+    print(f"{num_ok}/{len(folders)} transcribed, {len(skipped)} skipped, "
+          f"{sum([result.seconds for result in results]):.3f}s transcribing, {wall_seconds:.3f}s wall")
+    if num_ok != len(folders):
+        sys.exit(1)
@@ -0,0 +1,263 @@
+import argparse
+import io
+import json
+import platform
+import re
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import batch_transcribe
+import new_transcribe
+import new_transcribe_tuple
+import parser
+import protocol_generator
+import sexp_reader
+import transcribe_seq_text
+from type_and_helpers import *
+
+# Times every phase of a transcription separately for every example under
+# prot_impl, for copies of one example with more and more roles and for
+# protocol_generator output along each of its knobs, with every
+# transcriber. The best of several repeats is kept for each phase.
+
+PHASES = ["read", "sexp_parse", "ast", "transcribe_protocol", "transcribe_skeletons",
+          "transcribe_instances", "write"]
+BENCHMARK_VERSION = 1
+# synthetic cases copy the roles and skeletons of this example
+SCALING_SEED = "new_otway_rees/new_otway_rees.rkt"
+DEFAULT_SCALES = [1, 2, 4, 8, 16]
+# every knob of protocol_generator is swept over these values with the others
+# left at their defaults
+GENERATED_DIMENSIONS = ["roles", "trace_length", "enc_depth", "tuple_width", "nonces", "skeleton_constraints"]
+DEFAULT_GENERATED_SIZES = [1, 2, 4, 8]
+
+
+@dataclass
+class TranscriberVariant:
+    module: object
+    instance_type: type | None
+    base_file_name: str
+
+    def transcribe_protocol(self, protocol: Protocol, transcr, skeletons) -> None:
+        if self.module is new_transcribe:
+            new_transcribe.transcribe_protocol(protocol, transcr,
+                                               new_transcribe.partial_strand_heights(protocol, skeletons))
+        else:
+            self.module.transcribe_protocol(protocol, transcr)
+
+
+VARIANTS: Dict[str, TranscriberVariant] = {
+    "new": TranscriberVariant(new_transcribe, InstanceBounds, "base_with_seq.frg"),
+    "tuple": TranscriberVariant(new_transcribe_tuple, AltInstanceBounds, "base_with_seq_and_tuple_micro.frg"),
+    "seq_text": TranscriberVariant(transcribe_seq_text, None, "base_with_seq_text.frg"),
+}
+
+
+@dataclass
+class CaseResult:
+    case: str
+    variant: str
+    phases: Dict[str, float] = field(default_factory=dict)
+    total: float = 0.0
+    output_bytes: int = 0
+    error: str | None = None
+
+
+def parse_forms(forms: List[sexp_reader.SourceForm], variant: TranscriberVariant) \
+        -> Tuple[Protocol, List[Skeleton | InstanceBounds | AltInstanceBounds]]:
+    """same dispatch as the main scripts, instances the variant cannot
+    transcribe are left out"""
+    protocol = parser.parse_protocol(forms[0].s_expr)
+    skeletons: List[Skeleton | InstanceBounds | AltInstanceBounds] = []
+    for form in forms[1:]:
+        clause_type = get_str_from_symbol(form.s_expr[0], "defskeleton/definstance")
+        if clause_type == DEF_SKEL_STR:
+            skeletons.append(parser.parse_skeleton(form.s_expr, protocol))
+        elif clause_type == DEF_INST_BOUNDS and variant.instance_type is InstanceBounds:
+            skeletons.append(parser.parse_instance(form.s_expr, protocol))
+        elif clause_type == DEF_ALT_INST_BOUNDS and variant.instance_type is AltInstanceBounds:
+            skeletons.append(parser.parse_alt_instance(form.s_expr, protocol))
+    return protocol, skeletons
+
+
+def run_once(cpsa_path: Path, run_forge_txt: str, variant: TranscriberVariant,
+             destination_path: Path) -> Tuple[Dict[str, float], int]:
+    phases: Dict[str, float] = {}
+
+    def timed(phase: str, func: Callable):
+        start = time.perf_counter()
+        result = func()
+        phases[phase] = phases.get(phase, 0.0) + time.perf_counter() - start
+        return result
+
+    cpsa_txt = timed("read", lambda: cpsa_path.read_text())
+    forms = timed("sexp_parse", lambda: list(sexp_reader.load_cspa_source_forms(io.StringIO(cpsa_txt))))
+    protocol, skeletons = timed("ast", lambda: parse_forms(forms, variant))
+    with open(destination_path, "w") as destination_file:
+        transcr = variant.module.Transcribe_obj(destination_file)
+
+        def import_base_files():
+            with open(batch_transcribe.path_rel_to_script(variant.base_file_name)) as base_file:
+                transcr.import_file(base_file)
+            with open(batch_transcribe.path_rel_to_script("./extra_funcs.frg")) as extra_func_file:
+                transcr.import_file(extra_func_file)
+        timed("write", import_base_files)
+        timed("transcribe_protocol", lambda: variant.transcribe_protocol(protocol, transcr, skeletons))
+        skel_indx = 0
+        for skel_or_instance in skeletons:
+            if isinstance(skel_or_instance, Skeleton):
+                timed("transcribe_skeletons",
+                      lambda: variant.module.transcribe_skeleton(skel_or_instance, protocol, transcr, skel_indx))
+                skel_indx += 1
+            else:
+                timed("transcribe_instances",
+                      lambda: variant.module.transcribe_instance(skel_or_instance, protocol, transcr))
+
+        def write_rest():
+            transcr.print_to_file(run_forge_txt, add_space=False)
+            transcr.flush()
+        timed("write", write_rest)
+    return phases, destination_path.stat().st_size
+
+
+def benchmark_case(cpsa_path: Path, run_forge_txt: str, case_name: str, variant_name: str,
+                   repeat: int, scratch_dir: Path) -> CaseResult:
+    """best time of repeat runs for every phase, a case the variant cannot
+    transcribe keeps its error instead of timings"""
+    result = CaseResult(case_name, variant_name)
+    variant = VARIANTS[variant_name]
+    for _ in range(repeat):
+        try:
+            phases, result.output_bytes = run_once(cpsa_path, run_forge_txt, variant,
+                                                   scratch_dir / f"{variant_name}.frg")
+        except Exception as e:
+            result.error = f"{type(e).__name__}: {e}"
+            result.phases = {}
+            return result
+        for phase in PHASES:
+            seconds = phases.get(phase, 0.0)
+            result.phases[phase] = min(result.phases.get(phase, seconds), seconds)
+    result.total = sum(result.phases.values())
+    return result
+
+
+def scaled_protocol(seed_txt: str, scale: int) -> str:
+    """seed protocol with every role and skeleton copied scale times, the
+    copies of a role get a numbered name and the copied skeletons use them"""
+    lang_line = seed_txt[:seed_txt.find("\n") + 1]
+    forms = list(sexp_reader.load_cspa_source_forms(io.StringIO(seed_txt)))
+    prot_txt = forms[0].text
+    role_forms = [form for form in sexp_reader.iter_source_forms(prot_txt[1:-1])
+                  if type(form.s_expr) == list and str(form.s_expr[0]) == "defrole"]
+    role_names = [str(form.s_expr[1]) for form in role_forms]
+
+    def renamed(txt: str, copy_indx: int) -> str:
+        if copy_indx == 0:
+            return txt
+        for role_name in role_names:
+            txt = re.sub(rf"(\((?:defrole|defstrand)\s+){re.escape(role_name)}\b",
+                         rf"\g<1>{role_name}_{copy_indx}", txt)
+        return txt
+
+    roles_txt = "\n".join([renamed(form.text, copy_indx) for copy_indx in range(scale) for form in role_forms])
+    prot_end = prot_txt.index(role_forms[0].text)
+    prot_txt = prot_txt[:prot_end] + roles_txt + "\n)"
+    skeletons_txt = [renamed(form.text, copy_indx) for copy_indx in range(scale) for form in forms[1:]]
+    return lang_line + "\n".join([prot_txt] + skeletons_txt) + "\n"
+
+
+def example_cases(prot_impl: Path) -> List[Tuple[str, Path, str]]:
+    folders, _ = batch_transcribe.find_protocol_folders(prot_impl)
+    return [(prot_folder.folder_path.name, prot_folder.rkt_file_path, prot_folder.run_forge_file_path.read_text())
+            for prot_folder in folders]
+
+
+def synthetic_cases(prot_impl: Path, scales: List[int], scratch_dir: Path) -> List[Tuple[str, Path, str]]:
+    seed_txt = (prot_impl / SCALING_SEED).read_text()
+    cases = []
+    for scale in scales:
+        cpsa_path = scratch_dir / f"scaled_{scale}.rkt"
+        cpsa_path.write_text(scaled_protocol(seed_txt, scale))
+        cases.append((f"synthetic/scaled_roles_{scale}", cpsa_path, ""))
+    return cases
+
+
+def generated_cases(sizes: List[int], scratch_dir: Path) -> List[Tuple[str, Path, str]]:
+    """one protocol_generator case per knob and size, sizes a knob does not
+    allow (like a trace of one event) are left out"""
+    cases = []
+    for dimension in GENERATED_DIMENSIONS:
+        for size in sizes:
+            params = protocol_generator.GeneratorParams(with_instance=True)
+            setattr(params, dimension, size)
+            try:
+                params.validate()
+            except ValueError:
+                continue
+            cpsa_path = scratch_dir / f"{params.protocol_name()}.rkt"
+            cpsa_path.write_text(protocol_generator.generate_protocol(params))
+            cases.append((f"generated/{dimension}_{size}", cpsa_path, ""))
+    return cases
+
+
+def run_benchmarks(prot_impl: Path, variant_names: List[str], repeat: int,
+                   scales: List[int], generated_sizes: List[int]) -> List[CaseResult]:
+    results = []
+    with tempfile.TemporaryDirectory() as scratch:
+        scratch_dir = Path(scratch)
+        cases = (example_cases(prot_impl) + synthetic_cases(prot_impl, scales, scratch_dir) +
+                 generated_cases(generated_sizes, scratch_dir))
+        for case_name, cpsa_path, run_forge_txt in cases:
+            for variant_name in variant_names:
+                results.append(benchmark_case(cpsa_path, run_forge_txt, case_name, variant_name,
+                                              repeat, scratch_dir))
+    return results
+
+
+def compare(baseline: Dict, results: List[CaseResult]) -> List[str]:
+    """one line per case present in both runs, ratio < 1 means faster now"""
+    old_totals = {(entry["case"], entry["variant"]): entry["total"]
+                  for entry in baseline["results"] if entry["error"] is None}
+    lines = []
+    for result in results:
+        old_total = old_totals.get((result.case, result.variant))
+        if result.error is not None or old_total is None or old_total == 0:
+            continue
+        lines.append(f"{result.case:<40} {result.variant:<9} {old_total * 1000:9.3f}ms -> "
+                     f"{result.total * 1000:9.3f}ms  x{result.total / old_total:.2f}")
+    return lines
+
+
+if __name__ == "__main__":
+    argument_parser = argparse.ArgumentParser(
+        prog="benchmark_transcriber",
+        description="time every phase of transcribing the prot_impl examples and synthetic protocols")
+    argument_parser.add_argument("--prot_impl", type=str, default=str(batch_transcribe.path_rel_to_script("../../prot_impl")))
+    argument_parser.add_argument("--variant", action='append', choices=VARIANTS.keys(),
+                                 help="transcriber to benchmark, can be repeated, defaults to all of them")
+    argument_parser.add_argument("--repeat", type=int, default=5, help="the best of this many runs is kept")
+    argument_parser.add_argument("--scales", type=int, nargs="*", default=DEFAULT_SCALES,
+                                 help="how many copies of the roles and skeletons the synthetic cases have")
+    argument_parser.add_argument("--generated_sizes", type=int, nargs="*", default=DEFAULT_GENERATED_SIZES,
+                                 help="values every knob of protocol_generator.py is swept over")
+    argument_parser.add_argument("--output", type=str, default="benchmark_results.json")
+    argument_parser.add_argument("--compare", type=str, metavar="BASELINE_JSON",
+                                 help="print the change in total time against an earlier output")
+    args = argument_parser.parse_args()
+
+    variant_names = args.variant if args.variant is not None else list(VARIANTS.keys())
+    results = run_benchmarks(Path(args.prot_impl), variant_names, args.repeat, args.scales, args.generated_sizes)
+    with open(args.output, "w") as output_file:
+        json.dump({"version": BENCHMARK_VERSION, "python": sys.version, "platform": platform.platform(),
+                   "repeat": args.repeat, "phases": PHASES, "results": [asdict(result) for result in results]},
+                  output_file, indent=2)
+    num_errors = len([result for result in results if result.error is not None])
+    print(f"{len(results) - num_errors} cases timed, {num_errors} not supported by their transcriber, "
+          f"written to {args.output}")
+    if args.compare is not None:
+        with open(args.compare) as baseline_file:
+            print("\n".join(compare(json.load(baseline_file), results)))
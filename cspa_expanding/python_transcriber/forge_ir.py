@@ -0,0 +1,215 @@
+from dataclasses import dataclass, field
+from typing import Callable, List, Tuple
+
+from forge_writer import ForgeWriter
+
+# Small typed representation of the forge text the transcribers emit. Only
+# the structure (blocks and the kind of each constraint) is modelled, the
+# relational expressions themselves stay plain strings. Every top level
+# declaration is built completely before anything is printed so passes can
+# rewrite it first.
+
+
+@dataclass
+class Raw:
+    """a formula with no node of its own, text has no trailing newline"""
+    text: str
+
+
+@dataclass
+class Blank:
+    """empty line, only there to keep the output readable"""
+    pass
+
+
+@dataclass
+class Eq:
+    lhs: str
+    rhs: str
+
+
+@dataclass
+class NotEq:
+    lhs: str
+    rhs: str
+
+
+@dataclass
+class In:
+    lhs: str
+    rhs: str
+
+
+@dataclass
+class Call:
+    """predicate application, printed without brackets if there are no args"""
+    pred_name: str
+    args: List[str] = field(default_factory=list)
+
+
+@dataclass
+class Sig:
+    name: str
+    parent: str | None
+    fields: List[Tuple[str, str]]
+    modifier: str | None = None
+
+
+@dataclass
+class Pred:
+    name: str
+    body: List["Node"] = field(default_factory=list)
+    params: List[Tuple[str, str]] = field(default_factory=list)
+
+
+@dataclass
+class Inst:
+    name: str
+    body: List["Node"] = field(default_factory=list)
+
+
+@dataclass
+class Let:
+    """one let clause per binding, printed stacked at the same indentation
+    with all of their closing brackets on one line"""
+    bindings: List[Tuple[str, str]]
+    body: List["Node"] = field(default_factory=list)
+
+
+@dataclass
+class Quant:
+    """quantifier block. bar is False for the `some t0 : Timeslot {` form,
+    with stacked set and a single Quant in the body the inner header is
+    printed at the same indentation and the closing brackets are merged"""
+    quantifier: str
+    var_names: List[str]
+    set_expr: str
+    body: List["Node"] = field(default_factory=list)
+    bar: bool = True
+    stacked: bool = False
+
+
+@dataclass
+class Implies:
+    condition: str
+    body: List["Node"] = field(default_factory=list)
+
+
+Block = Pred | Inst | Let | Quant | Implies
+Node = Raw | Blank | Eq | NotEq | In | Call | Sig | Block
+IRPass = Callable[[Node], Node]
+
+
+def is_block(node: Node) -> bool:
+    return isinstance(node, Pred | Inst | Let | Quant | Implies)
+
+
+def block_headers(block: Block) -> List[str]:
+    match block:
+        case Pred(name, _, params):
+            params_str = "" if len(params) == 0 else "[" + ", ".join(
+                [f"{param_name}: {param_type}" for param_name, param_type in params]) + "]"
+            return [f"pred {name}{params_str} {{"]
+        case Inst(name, _):
+            return [f"inst {name} {{"]
+        case Let(bindings, _):
+            return [f"let {var_name}  = {var_expr} | {{" for var_name, var_expr in bindings]
+        case Quant(quantifier, var_names, set_expr, _, bar, _):
+            bar_str = " |" if bar else ""
+            return [f"{quantifier} {','.join(var_names)} : {set_expr}{bar_str} {{"]
+        case Implies(condition, _):
+            return [f"{condition} => {{"]
+    raise TypeError(f"not a block {block}")
+
+
+def constraint_text(node: Node) -> str:
+    match node:
+        case Raw(text):
+            return text
+        case Eq(lhs, rhs):
+            return f"{lhs} = {rhs}"
+        case NotEq(lhs, rhs):
+            return f"{lhs} != {rhs}"
+        case In(lhs, rhs):
+            return f"{lhs} in {rhs}"
+        case Call(pred_name, args):
+            if len(args) == 0:
+                return pred_name
+            return f"{pred_name}[{','.join(args)}]"
+    raise TypeError(f"not a constraint {node}")
+
+
+class ForgePrinter:
+    """serializes IR nodes to a ForgeWriter, this is the only place where the
+    layout of predicates, lets and quantifiers is decided"""
+
+    def __init__(self, writer: ForgeWriter) -> None:
+        self.writer = writer
+
+    def print_node(self, node: Node, space_lvl: int = 0) -> None:
+        match node:
+            case Blank():
+                self.writer.write("\n")
+            case Sig(name, parent, fields, modifier):
+                parent_str = "" if parent is None else f"extends {parent} "
+                modifier_str = "" if modifier is None else modifier + " "
+                self.writer.write(f"{modifier_str}sig {name} {parent_str}{{\n", space_lvl)
+                for indx, (field_name, field_type) in enumerate(fields):
+                    sep = "," if indx != len(fields) - 1 else ""
+                    self.writer.write(f"{field_name} : {field_type}{sep}\n", space_lvl + 1)
+                self.writer.write("}\n", space_lvl)
+            case Pred() | Inst() | Let() | Quant() | Implies():
+                self.print_block(node, space_lvl)
+            case _:
+                self.writer.write(constraint_text(node) + "\n", space_lvl)
+
+    def print_block(self, block: Block, space_lvl: int) -> None:
+        headers = block_headers(block)
+        num_closing = len(headers)
+        while isinstance(block, Quant) and block.stacked and len(block.body) == 1 and isinstance(block.body[0], Quant):
+            block = block.body[0]
+            inner_headers = block_headers(block)
+            headers += inner_headers
+            num_closing += len(inner_headers)
+        for header in headers:
+            self.writer.write(header + "\n", space_lvl)
+        for child in block.body:
+            self.print_node(child, space_lvl + 1)
+        closing = "}" * num_closing
+        self.writer.write(closing + "\n", space_lvl if closing != "" else 0)
+
+
+class IRBuilder:
+    """collects the nodes of the declaration currently being transcribed.
+    Blocks are opened and closed by the transcriber contexts, once the
+    outermost block is closed every pass in passes is applied to it and the
+    result is printed"""
+
+    def __init__(self, writer: ForgeWriter) -> None:
+        self.printer = ForgePrinter(writer)
+        self.open_blocks: List[Block] = []
+        self.passes: List[IRPass] = []
+
+    def is_open(self) -> bool:
+        return len(self.open_blocks) != 0
+
+    def emit(self, node: Node, space_lvl: int = 0) -> None:
+        if self.is_open():
+            self.open_blocks[-1].body.append(node)
+        else:
+            self.write_top_level(node, space_lvl)
+
+    def open_block(self, block: Block) -> None:
+        if self.is_open():
+            self.open_blocks[-1].body.append(block)
+        self.open_blocks.append(block)
+
+    def close_block(self, space_lvl: int = 0) -> None:
+        block = self.open_blocks.pop()
+        if not self.is_open():
+            self.write_top_level(block, space_lvl)
+
+    def write_top_level(self, node: Node, space_lvl: int) -> None:
+        for ir_pass in self.passes:
+            node = ir_pass(node)
+        self.printer.print_node(node, space_lvl)
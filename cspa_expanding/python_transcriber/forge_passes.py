@@ -0,0 +1,317 @@
+import re
+from collections import defaultdict
+from dataclasses import replace
+from typing import Callable, Dict, List, Set, Tuple
+
+from forge_ir import *
+
+# Rewrite passes over the forge IR, each pass is a callable taking a top
+# level node and returning the rewritten node so it can be appended to
+# IRBuilder.passes. Expressions are plain strings, names are matched as
+# whole identifiers.
+
+_COMPONENT_EXPR_RE = re.compile(r"\((?P<seq_expr>.*)\)\[(?P<indx>\d+)\]", re.DOTALL)
+_SIMPLE_EXPR_RE = re.compile(r"[\w`.]+", re.DOTALL)
+
+
+def name_regex(name: str) -> re.Pattern:
+    """matches name as a whole identifier, field accesses like x.name and
+    atoms like `name0 are not matches"""
+    return re.compile(rf"(?<![\w`.]){re.escape(name)}(?!\w)")
+
+
+def map_exprs(node: Node, func: Callable[[str], str]) -> Node:
+    """copy of node with func applied to every expression string in it,
+    names introduced by lets and quantifiers are left alone. Expressions the
+    transcriber could not produce (None) are left alone as well"""
+    outer_func = func
+    func = lambda expr: outer_func(expr) if isinstance(expr, str) else expr
+    match node:
+        case Raw(text):
+            return Raw(func(text))
+        case Eq(lhs, rhs):
+            return Eq(func(lhs), func(rhs))
+        case NotEq(lhs, rhs):
+            return NotEq(func(lhs), func(rhs))
+        case In(lhs, rhs):
+            return In(func(lhs), func(rhs))
+        case Call(pred_name, args):
+            return Call(pred_name, [func(arg) for arg in args])
+        case Let(bindings, body):
+            return Let([(name, func(expr)) for name, expr in bindings],
+                       [map_exprs(child, func) for child in body])
+        case Quant():
+            return replace(node, set_expr=func(node.set_expr),
+                           body=[map_exprs(child, func) for child in node.body])
+        case Implies(condition, body):
+            return Implies(func(condition), [map_exprs(child, func) for child in body])
+        case Pred() | Inst():
+            return replace(node, body=[map_exprs(child, func) for child in node.body])
+    return node
+
+
+def node_exprs(node: Node) -> List[str]:
+    """every expression string in node and its children"""
+    exprs: List[str] = []
+
+    def collect(expr: str) -> str:
+        exprs.append(expr)
+        return expr
+    map_exprs(node, collect)
+    return exprs
+
+
+def count_uses(name: str, nodes: List[Node]) -> int:
+    regex = name_regex(name)
+    return sum([len(regex.findall(expr)) for node in nodes for expr in node_exprs(node)])
+
+
+def bound_names(nodes: List[Node]) -> Set[str]:
+    """names introduced by lets and quantifiers anywhere inside nodes"""
+    names: Set[str] = set()
+    for node in nodes:
+        match node:
+            case Let(bindings, body):
+                names.update([name for name, _ in bindings if isinstance(name, str)])
+                names.update(bound_names(body))
+            case Quant(_, var_names, _, body):
+                names.update(var_names)
+                names.update(bound_names(body))
+            case Pred() | Inst() | Implies():
+                names.update(bound_names(node.body))
+    return names
+
+
+def conjunct_nodes(body: List[Node]) -> List[Node]:
+    """nodes that hold whenever body holds, descends into nested lets since a
+    let body is a conjunction but not into quantifiers or implications"""
+    conjuncts: List[Node] = []
+    for node in body:
+        conjuncts.append(node)
+        if isinstance(node, Let):
+            conjuncts.extend(conjunct_nodes(node.body))
+    return conjuncts
+
+
+def substitute(nodes: List[Node], name: str, expr: str,
+               skip: Node | None = None) -> List[Node]:
+    """replaces every use of name by expr, the node skip (compared by
+    identity) is left untouched"""
+    regex = name_regex(name)
+
+    def sub_expr(txt: str) -> str:
+        return regex.sub(lambda _: expr, txt)
+
+    def sub(node: Node) -> Node:
+        if node is skip:
+            return node
+        match node:
+            case Let(bindings, body):
+                return Let(map_exprs(Let(bindings), sub_expr).bindings,
+                           [sub(child) for child in body])
+            case Pred() | Inst() | Quant() | Implies():
+                node = replace(node, body=[sub(child) for child in node.body])
+                if isinstance(node, Quant):
+                    node = replace(node, set_expr=sub_expr(node.set_expr))
+                elif isinstance(node, Implies):
+                    node = replace(node, condition=sub_expr(node.condition))
+                return node
+        return map_exprs(node, sub_expr)
+    return [sub(node) for node in nodes]
+
+
+def remove_node(nodes: List[Node], target: Node) -> List[Node]:
+    """drops target (compared by identity) from nodes or any nested body"""
+    new_nodes: List[Node] = []
+    for node in nodes:
+        if node is target:
+            continue
+        if is_block(node):
+            node = replace(node, body=remove_node(node.body, target))
+        new_nodes.append(node)
+    return new_nodes
+
+
+def parenthesize(expr: str) -> str:
+    if _SIMPLE_EXPR_RE.fullmatch(expr) or _COMPONENT_EXPR_RE.fullmatch(expr):
+        return expr
+    return f"({expr})"
+
+
+class LetInliner:
+    """removes let bindings from the output of write_new_seq_constraint.
+    A binding is dropped when it is unused, inlined when it is used once,
+    and replaced by its value when the body fixes it with `name = value`.
+    In the last case the equality itself is dropped if it already follows
+    from the component equation `seq = 0->a + 1->name + ...` of the same
+    sequence, otherwise it is kept as `(seq)[i] = value`"""
+
+    def __init__(self) -> None:
+        self.removed = 0
+
+    def __call__(self, node: Node) -> Node:
+        return self.rewrite(node)
+
+    def rewrite(self, node: Node) -> Node:
+        if not is_block(node):
+            return node
+        new_body: List[Node] = []
+        for child in node.body:
+            child = self.rewrite(child)
+            if isinstance(child, Let) and len(child.bindings) == 0:
+                new_body.extend(child.body)
+            else:
+                new_body.append(child)
+        node = replace(node, body=new_body)
+        if isinstance(node, Let):
+            node = self.eliminate_bindings(node)
+        return node
+
+    def defining_eq(self, name: str, body: List[Node]) -> Tuple[Eq, str] | None:
+        inner_names = bound_names(body)
+        regex = name_regex(name)
+        for node in conjunct_nodes(body):
+            match node:
+                case Eq(lhs, rhs) if lhs == name and regex.search(rhs) is None:
+                    if any([name_regex(inner).search(rhs) for inner in inner_names]):
+                        continue
+                    return node, rhs
+        return None
+
+    def implied_by_components(self, name: str, expr: str, body: List[Node]) -> bool:
+        match_obj = _COMPONENT_EXPR_RE.fullmatch(expr)
+        if match_obj is None:
+            return False
+        seq_expr, indx = match_obj.group("seq_expr"), match_obj.group("indx")
+        for node in conjunct_nodes(body):
+            match node:
+                case Eq(lhs, rhs) if lhs == seq_expr:
+                    if f"{indx}->{name}" in rhs.split(" + "):
+                        return True
+        return False
+
+    def eliminate_bindings(self, let: Let) -> Let:
+        body = let.body
+        kept: List[Tuple[str, str]] = []
+        # later bindings may refer to earlier ones so go backwards and count
+        # uses in the bindings that are kept as well
+        for name, expr in reversed(let.bindings):
+            if not isinstance(name, str):
+                # terms the transcriber has no name for are left as they are
+                kept.insert(0, (name, expr))
+                continue
+            kept_lets = [Let(kept)]
+            uses = count_uses(name, body) + count_uses(name, kept_lets)
+            if uses == 0:
+                self.removed += 1
+                continue
+            defining = self.defining_eq(name, body)
+            if defining is not None:
+                eq_node, value = defining
+                implied = self.implied_by_components(name, expr, body)
+                body = substitute(body, name, value, skip=eq_node)
+                kept = substitute(kept_lets, name, value)[0].bindings
+                if implied:
+                    body = remove_node(body, eq_node)
+                else:
+                    body = substitute(body, name, expr)
+                self.removed += 1
+                continue
+            if uses == 1:
+                body = substitute(body, name, parenthesize(expr))
+                kept = substitute(kept_lets, name, parenthesize(expr))[0].bindings
+                self.removed += 1
+                continue
+            kept.insert(0, (name, expr))
+        return Let(kept, body)
+
+
+# expressions worth sharing when repeated, key lookups and the message sent
+# at a timeslot
+CSE_PATTERNS = [
+    re.compile(r"get(?:LTK|PUBK|PRIVK)\[[^\[\]]*\]"),
+    re.compile(r"\(\w+\.data\)"),
+]
+
+
+def pattern_occurrences(nodes: List[Node]) -> List[str]:
+    """every match of CSE_PATTERNS in nodes in order of appearance"""
+    return [match_obj.group(0) for node in nodes for expr in node_exprs(node)
+            for pattern in CSE_PATTERNS for match_obj in pattern.finditer(expr)]
+
+
+class CommonSubexprHoister:
+    """binds key and term expressions repeated inside an exec_<role>
+    predicate once with a let placed just inside the quantifier that binds
+    the variables they use (the innermost timeslot of a stacked chain, or the
+    strand quantifier for key lookups) and replaces every use by the name"""
+
+    def __init__(self, pred_prefix: str = "exec_") -> None:
+        self.pred_prefix = pred_prefix
+        self.hoisted = 0
+        self.name_num = 0
+
+    def __call__(self, node: Node) -> Node:
+        match node:
+            case Pred(name) if name.startswith(self.pred_prefix):
+                return self.hoist(node)
+        return node
+
+    def quant_depths(self, nodes: List[Node], depth: int = 0) -> Dict[str, Tuple[int, Quant]]:
+        """variable name -> (nesting depth, quantifier binding it)"""
+        quants: Dict[str, Tuple[int, Quant]] = {}
+        for node in nodes:
+            if isinstance(node, Quant):
+                for var_name in node.var_names:
+                    quants[var_name] = (depth, node)
+            if is_block(node):
+                quants.update(self.quant_depths(node.body, depth + 1))
+        return quants
+
+    def target_block(self, expr: str, pred: Pred,
+                     quants: Dict[str, Tuple[int, Quant]],
+                     let_names: Set[str]) -> Block | None:
+        if any([name_regex(name).search(expr) for name in let_names]):
+            return None
+        used = [quants[var_name] for var_name in quants
+                if name_regex(var_name).search(expr)]
+        if len(used) == 0:
+            return pred
+        _, target = max(used, key=lambda depth_quant: depth_quant[0])
+        while target.stacked and len(target.body) == 1 and isinstance(target.body[0], Quant):
+            target = target.body[0]
+        return target
+
+    def hoist(self, pred: Pred) -> Pred:
+        quants = self.quant_depths(pred.body)
+        let_names = bound_names(pred.body) - set(quants)
+        hoisted_at: Dict[int, List[Tuple[str, str]]] = defaultdict(list)
+        seen: Set[str] = set()
+        for expr in pattern_occurrences(pred.body):
+            if expr in seen:
+                continue
+            seen.add(expr)
+            target = self.target_block(expr, pred, quants, let_names)
+            if target is None or pattern_occurrences(target.body).count(expr) < 2:
+                continue
+            self.name_num += 1
+            hoisted_at[id(target)].append((f"cse_{self.name_num}", expr))
+            self.hoisted += 1
+        if len(hoisted_at) == 0:
+            return pred
+        return self.rewrite(pred, hoisted_at)
+
+    def rewrite(self, node: Node, hoisted_at: Dict[int, List[Tuple[str, str]]]) -> Node:
+        if not is_block(node):
+            return node
+        bindings = hoisted_at.get(id(node), [])
+        body = [self.rewrite(child, hoisted_at) for child in node.body]
+        if len(bindings) == 0:
+            return replace(node, body=body)
+
+        def share(txt: str) -> str:
+            for name, expr in bindings:
+                txt = txt.replace(expr, name)
+            return txt
+        body = [map_exprs(child, share) for child in body]
+        return replace(node, body=[Let(bindings, body)])
@@ -0,0 +1,84 @@
+import io
+import os
+from contextlib import contextmanager
+from typing import List, Tuple
+
+# flush once this many characters have been buffered, large enough that a
+# typical spec is written with a handful of write calls
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+
+class ForgeWriter:
+    """buffers emitted forge text in a list of strings and writes it to the
+    destination in large chunks instead of one print call per fragment.
+    With direct_fd the chunks are encoded and passed to os.write on the file
+    descriptor of the destination, skipping the text layer of the file object"""
+
+    def __init__(self, file: io.TextIOBase, space_str: str = " " * 2,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 direct_fd: bool = False) -> None:
+        self.file = file
+        self.space_str = space_str
+        self.chunk_size = chunk_size
+        self.fd: int | None = None
+        if direct_fd:
+            # anything already written through the file object has to reach
+            # the descriptor before our own writes
+            file.flush()
+            self.fd = file.fileno()
+        self.parts: List[str] = []
+        self.buffered_size = 0
+        self.indents: List[str] = [""]
+        # outer buffers (and their sizes) of capture blocks that are open
+        self.capture_stack: List[Tuple[List[str], int]] = []
+
+    def indent(self, space_lvl: int) -> str:
+        """indentation prefix for space_lvl, built once per level"""
+        while len(self.indents) <= space_lvl:
+            self.indents.append(self.indents[-1] + self.space_str)
+        return self.indents[space_lvl]
+
+    def write(self, txt: str, space_lvl: int = 0) -> None:
+        if space_lvl > 0:
+            self.parts.append(self.indent(space_lvl))
+        self.parts.append(txt)
+        self.buffered_size += len(txt)
+        if self.buffered_size >= self.chunk_size and len(self.capture_stack) == 0:
+            self.flush()
+
+    def write_file(self, other_file: io.TextIOBase, space_lvl: int = 0) -> None:
+        """copies the whole of other_file, every line except blank ones gets
+        the indentation of space_lvl"""
+        if space_lvl == 0:
+            self.write(other_file.read())
+            return
+        prefix = self.indent(space_lvl)
+        for line in other_file:
+            self.write(line if line == "\n" else prefix + line)
+
+    def flush(self) -> None:
+        if len(self.parts) == 0 or len(self.capture_stack) != 0:
+            return
+        chunk = "".join(self.parts)
+        self.parts = []
+        self.buffered_size = 0
+        if self.fd is None:
+            self.file.write(chunk)
+            return
+        data = memoryview(chunk.encode())
+        while len(data) > 0:
+            written = os.write(self.fd, data)
+            data = data[written:]
+
+    @contextmanager
+    def capture(self):
+        """collects everything written inside the with block into the yielded
+        StringIO instead of the destination, nothing is flushed meanwhile"""
+        captured = io.StringIO()
+        self.capture_stack.append((self.parts, self.buffered_size))
+        self.parts = []
+        try:
+            yield captured
+        finally:
+            captured.write("".join(self.parts))
+            self.parts, self.buffered_size = self.capture_stack.pop()
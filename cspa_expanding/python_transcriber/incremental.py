@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+from types import ModuleType
+from typing import Callable, Dict, List, Sequence
+
+from type_and_helpers import *
+
+# bump when the layout of the fragment file changes
+FRAGMENT_CACHE_VERSION = 1
+
+
+def transcriber_version(transcriber: ModuleType, ir_passes: Sequence = ()) -> str:
+    """hash of the transcriber sources and of the IR passes that are enabled,
+    emitted text from an older transcriber or other passes is never reused"""
+    hasher = hashlib.sha256()
+    script_path = Path(__file__).parent
+    paths = [Path(transcriber.__file__), script_path / "type_and_helpers.py",
+             script_path / "forge_ir.py"]
+    for ir_pass in ir_passes:
+        pass_type = type(ir_pass)
+        hasher.update(pass_type.__qualname__.encode())
+        paths.append(Path(sys.modules[pass_type.__module__].__file__))
+    for path in paths:
+        hasher.update(path.read_bytes())
+    return hasher.hexdigest()
+
+
+def node_hash(version: str, *parts) -> str:
+    """content hash of the AST nodes a fragment was transcribed from, the
+    CPSA style repr of the nodes is used as it covers every parsed field"""
+    hasher = hashlib.sha256(version.encode())
+    for part in parts:
+        hasher.update(b"\0")
+        hasher.update(repr(part).encode())
+    return hasher.hexdigest()
+
+
+class FragmentCache:
+    """remembers the forge text emitted for every role predicate, skeleton and
+    instance block of a destination file together with the hash of the AST
+    node it came from, fragments whose node is unchanged are copied from here
+    instead of being transcribed again"""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.old_fragments: Dict[str, Dict] = {}
+        self.new_fragments: Dict[str, Dict] = {}
+        self.reused: List[str] = []
+        self.transcribed: List[str] = []
+        try:
+            with open(self.path) as cache_file:
+                contents = json.load(cache_file)
+            if contents.get("version") == FRAGMENT_CACHE_VERSION:
+                self.old_fragments = contents["fragments"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def emit(self, transcr, key: str, content_hash: str,
+             transcribe_func: Callable[[], None]) -> None:
+        """writes the fragment named key, reusing the previous text when
+        content_hash matches. The fresh number counter is advanced by as many
+        names as the fragment used originally, the reused names are all bound
+        locally inside the fragment so they cannot clash with other fragments"""
+        entry = self.old_fragments.get(key)
+        if entry is not None and entry["hash"] == content_hash:
+            transcr.print_to_file(entry["text"], add_space=False)
+            transcr.fresh_num += entry["fresh_nums"]
+            self.reused.append(key)
+        else:
+            fresh_num_before = transcr.fresh_num
+            with transcr.capture() as captured:
+                transcribe_func()
+            entry = {"hash": content_hash, "text": captured.getvalue(),
+                     "fresh_nums": transcr.fresh_num - fresh_num_before}
+            transcr.print_to_file(entry["text"], add_space=False)
+            self.transcribed.append(key)
+        self.new_fragments[key] = entry
+
+    def save(self) -> None:
+        """only fragments emitted in this run are kept so that removed roles or
+        skeletons do not accumulate in the file"""
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w") as cache_file:
+            json.dump({"version": FRAGMENT_CACHE_VERSION,
+                       "fragments": self.new_fragments}, cache_file)
+        os.replace(tmp_path, self.path)
+
+
+def transcribe_incrementally(transcriber: ModuleType, protocol: Protocol,
+                             skeletons: List[Skeleton | InstanceBounds | AltInstanceBounds],
+                             transcr, fragment_cache: FragmentCache) -> None:
+    """same output as transcriber.transcribe_protocol followed by
+    transcribe_skeleton/transcribe_instance for every skeleton and instance,
+    but every role, skeleton and instance goes through fragment_cache,
+    like main.py only InstanceBounds are transcribed"""
+    version = transcriber_version(transcriber, transcr.ir.passes)
+    transcr.strand_heights = transcriber.partial_strand_heights(protocol, skeletons)
+    for role in protocol.role_arr:
+        prefix_heights = transcr.strand_heights.get(role.role_name)
+        role_context = transcr.create_role_context(
+            role, protocol,
+            transcr.role_var_name_in_prot_pred(role.role_name,
+                                               protocol.protocol_name))
+        fragment_cache.emit(
+            transcr, f"exec_{role_context.role_sig_name}",
+            node_hash(version, protocol.protocol_name, role, prefix_heights,
+                      transcr.exact_time_order, transcr.batch_orig,
+                      role.role_name in transcr.dead_roles),
+            lambda: transcriber.transcribe_role(role, role_context, prefix_heights))
+    if transcr.exact_time_order:
+        transcriber.transcribe_timeslot_order_sig(transcr)
+    if transcr.batch_orig:
+        transcriber.transcribe_orig_helpers(transcr)
+    if transcr.symmetry_breaking:
+        transcriber.transcribe_symmetry_breaking(protocol, transcr)
+
+    skel_indx = 0
+    for skel_or_instance in skeletons:
+        match skel_or_instance:
+            case Skeleton(_) as skeleton:
+                cur_skel_indx = skel_indx
+                fragment_cache.emit(
+                    transcr, f"skeleton_{skeleton.protocol_name}_{cur_skel_indx}",
+                    node_hash(version, protocol, skeleton, cur_skel_indx,
+                              transcr.strand_heights, transcr.exact_time_order,
+                              transcr.batch_orig),
+                    lambda: transcriber.transcribe_skeleton(skeleton, protocol, transcr, cur_skel_indx))
+                skel_indx += 1
+            case InstanceBounds(_) as instance_bound:
+                fragment_cache.emit(
+                    transcr, f"inst_{instance_bound.instance_name}",
+                    node_hash(version, protocol, instance_bound, transcr.instance_skeletons,
+                              transcr.symmetry_breaking, transcr.exact_time_order),
+                    lambda: transcriber.transcribe_instance(instance_bound, protocol, transcr))
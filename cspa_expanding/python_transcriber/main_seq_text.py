@@ -1,49 +1,18 @@
 import argparse
+from type_and_helpers import DEF_PROT_STR, DEF_SKEL_STR, ParseException
 import parser
 import re
 import io
 import sexpdata
 
+import sexp_reader
+import parse_cache
+import spec_metrics
+import profiling
 import transcribe_seq_text
 from pathlib import Path
 
 
-def get_root_s_expr_lst(txt: str):
-    """the sexpdata library can only parse one s-expr by itself,multiple
-    s-expr must be present as an array or similar,hence this adds a wrapper
-    around that to find all s-expr"""
-    brkt_count = 0
-    brkt_started = False
-    prev_indx = 0
-    strs_so_far = []
-    for indx, chr in enumerate(txt):
-        if chr == '(':
-            brkt_count += 1
-            brkt_started = True
-        elif chr == ')':
-            brkt_count = brkt_count - 1
-        if brkt_count == 0 and brkt_started:
-            cur_s_expr_str = txt[prev_indx:(indx + 1)]
-            prev_indx = indx + 1
-            brkt_started = False
-            strs_so_far.append(cur_s_expr_str)
-    return strs_so_far
-
-
-def load_cspa_as_s_expr_new(file):
-    """using get_root_s_expr_lst to parse multiple s-expr in one file"""
-    result = []
-    for _ in file:
-        break
-    str1 = file.read()
-    lst = get_root_s_expr_lst(str1)
-    for elm in lst:
-        #print("processed element")
-        #print(elm)
-        #print("="*8)
-        result.append(sexpdata.loads(elm))
-    return result
-
 #TODO: should strip lang and ipen has not been tested att all and might not be useful
 # consider removing later
 def re_match_full_str(re_expr:re.Pattern,txt:str):
@@ -51,34 +20,51 @@ def re_match_full_str(re_expr:re.Pattern,txt:str):
     return (match_obj is not None) and (match_obj.span()[1] == len(txt))
 
 File = io.TextIOWrapper
-def main(cpsa_file:File,destination_forge_file:File,base_file:File,extra_func_file:File,run_forge_file:File,should_strip_lang_and_open:bool,visualization_script_path:str|None):
-    s_expr_lst = load_cspa_as_s_expr_new(cpsa_file)
-    protocol = parser.parse_protocol(s_expr_lst[0])
-    skeletons = [
-        parser.parse_skeleton(s_expr, protocol) for s_expr in s_expr_lst[1:]
-    ]
-    transcribe_obj = transcribe_seq_text.Transcribe_obj(destination_forge_file)
-    transcribe_obj.import_file(base_file)
-    transcribe_obj.import_file(extra_func_file)
-    transcribe_seq_text.transcribe_protocol(protocol, transcribe_obj)
-    for skel_indx, skeleton in enumerate(skeletons):
-        transcribe_seq_text.transcribe_skeleton(skeleton, protocol,
-                                           transcribe_obj, skel_indx)
-    if should_strip_lang_and_open:
-        # TODO add support for comments also here
-        open_regex = re.compile(r"[\s]*open[\s]*\".*\"[\s]*\n")
-        lang_forge_regex = re.compile(r"[\s]*#lang[\s]*forge[\s]*\n")
-        option_regex = r"[\s]*option[\s]*run_sterling[\s]*\".*\"[\s]*\n"
-        option_regex = re.compile(option_regex)
-        for line in run_forge_file:
-            if re_match_full_str(open_regex,line) or re_match_full_str(lang_forge_regex,line):
-                continue
-            if re_match_full_str(option_regex,line):
-                transcribe_obj.print_to_file(f"option run_sterling \"{visualization_script_path}\"\n")
-                continue
-            transcribe_obj.print_to_file(line)
-    else:
-        transcribe_obj.import_file(run_forge_file)
+def main(cpsa_file:File,destination_forge_file:File,base_file:File,extra_func_file:File,run_forge_file:File,should_strip_lang_and_open:bool,visualization_script_path:str|None,parse_cache_dir:str|None=None,direct_fd:bool=False,complexity_report_path:str|None=None,profile_path:str|None=None,cprofile_path:str|None=None):
+    profiler = profiling.Profiler(profile_path is not None,cprofile_path)
+    with profiler.running():
+        cache = None if parse_cache_dir is None else parse_cache.ParseCache(parse_cache_dir)
+        protocol,skeletons = parse_cache.parse_cpsa_file(cpsa_file,cache,profiler,{
+            DEF_SKEL_STR: parser.parse_skeleton})
+        transcribe_obj = transcribe_seq_text.Transcribe_obj(destination_forge_file,direct_fd)
+        transcribe_obj.profiler = profiler
+        metrics_collector = spec_metrics.MetricsCollector()
+        if complexity_report_path is not None:
+            transcribe_obj.ir.passes.append(metrics_collector)
+        with profiler.phase("write"):
+            transcribe_obj.import_file(base_file)
+            transcribe_obj.import_file(extra_func_file)
+        with profiler.phase("protocol"):
+            transcribe_seq_text.transcribe_protocol(protocol, transcribe_obj)
+        for skel_indx, skeleton in enumerate(skeletons):
+            with profiler.phase(f"skeleton skeleton_{skeleton.protocol_name}_{skel_indx}"):
+                transcribe_seq_text.transcribe_skeleton(skeleton, protocol,
+                                                   transcribe_obj, skel_indx)
+        with profiler.phase("write"):
+            if should_strip_lang_and_open:
+                # TODO add support for comments also here
+                open_regex = re.compile(r"[\s]*open[\s]*\".*\"[\s]*\n")
+                lang_forge_regex = re.compile(r"[\s]*#lang[\s]*forge[\s]*\n")
+                option_regex = r"[\s]*option[\s]*run_sterling[\s]*\".*\"[\s]*\n"
+                option_regex = re.compile(option_regex)
+                for line in run_forge_file:
+                    if re_match_full_str(open_regex,line) or re_match_full_str(lang_forge_regex,line):
+                        continue
+                    if re_match_full_str(option_regex,line):
+                        transcribe_obj.print_to_file(f"option run_sterling \"{visualization_script_path}\"\n")
+                        continue
+                    transcribe_obj.print_to_file(line)
+            else:
+                transcribe_obj.import_file(run_forge_file)
+            transcribe_obj.flush()
+    if complexity_report_path is not None:
+        metrics_collector.write_report(complexity_report_path)
+        print(f"complexity of {len(metrics_collector.metrics)} predicates written to {complexity_report_path}")
+    if profile_path is not None:
+        profiler.write_report(profile_path)
+        print(f"phase timings written to {profile_path}")
+    if cprofile_path is not None:
+        print(f"cProfile stats written to {cprofile_path}")
 
 def path_rel_to_script(path):
     script_path = Path(__file__).parent
@@ -99,6 +85,17 @@ if __name__ == "__main__":
     argument_parser.add_argument("--strip_lang_open_from_run_file",
                                  action='store_true')
     argument_parser.add_argument("--visualization_script_path",type=str)
+    argument_parser.add_argument("--parse_cache_dir",type=str,
+                                 help="directory used to cache parsed protocols, skeletons and instances between runs")
+    argument_parser.add_argument("--direct_fd_output",action='store_true',
+                                 help="write the buffered output straight to the file descriptor of the destination file")
+    argument_parser.add_argument("--complexity_report",type=str,metavar="JSON_PATH",
+                                 help="write quantifier, nesting, ^next and *next closure, learnt_term_by and line counts of every emitted predicate to this file")
+    argument_parser.add_argument("--profile",type=str,metavar="JSON_PATH",
+                                 help="write the wall time and peak traced memory of reading, parsing, every role, skeleton and instance and writing to this file as a tree")
+    argument_parser.add_argument("--cprofile_dump",type=str,metavar="STATS_PATH",
+                                 help="also run the transcription under cProfile and dump the stats here, read them with pstats or snakeviz")
+
     args = argument_parser.parse_args()
     base_file_path = path_rel_to_script( "./base_with_seq_text.frg" )
     extra_func_path = path_rel_to_script( "./extra_funcs.frg" )
@@ -116,7 +113,7 @@ if __name__ == "__main__":
             with open(base_file_path) as base_file:
                 with open(extra_func_path) as extra_func_file:
                     with open(run_forge_file_path) as run_forge_file:
-                        main(cpsa_file,destination_forge_file,base_file,extra_func_file,run_forge_file,should_strip_lang_and_open,visualization_script)
+                        main(cpsa_file,destination_forge_file,base_file,extra_func_file,run_forge_file,should_strip_lang_and_open,visualization_script,args.parse_cache_dir,direct_fd=args.direct_fd_output,complexity_report_path=args.complexity_report,profile_path=args.profile,cprofile_path=args.cprofile_dump)
                         print(f"finish transcribing to {destination_forge_file_name}")
 
 # added comment here to test commit all command
@@ -1,63 +1,20 @@
 import argparse
 from typing import List
-from type_and_helpers import DEF_ALT_INST_BOUNDS, DEF_INST_BOUNDS, DEF_SKEL_STR, AltInstanceBounds, InstanceBounds, ParseException, Skeleton, get_str_from_symbol, match_type_and_str
+from type_and_helpers import DEF_ALT_INST_BOUNDS, DEF_INST_BOUNDS, DEF_PROT_STR, DEF_SKEL_STR, AltInstanceBounds, InstanceBounds, ParseException, Skeleton, get_str_from_symbol, match_type_and_str
 import parser
 import re
 import io
 import sexpdata
 
+import sexp_reader
+import parse_cache
+import forge_passes
+import spec_metrics
+import profiling
+import scope_inference
 import new_transcribe_tuple
 from pathlib import Path
 
-def remove_comments(txt):
-    lines = txt.split("\n")
-    comment_seq = ";;"
-    result = []
-    for line in lines:
-        indx = line.find(comment_seq)
-        if indx != -1:
-            result.append(line[:indx])
-        else:
-            result.append(line)
-    return "\n".join(result)
-
-def get_root_s_expr_lst(txt: str):
-    """the sexpdata library can only parse one s-expr by itself,multiple
-    s-expr must be present as an array or similar,hence this adds a wrapper
-    around that to find all s-expr"""
-    txt_no_comment = remove_comments(txt)
-    txt = txt_no_comment
-    brkt_count = 0
-    brkt_started = False
-    prev_indx = 0
-    strs_so_far = []
-    for indx, chr in enumerate(txt):
-        if chr == '(':
-            brkt_count += 1
-            brkt_started = True
-        elif chr == ')':
-            brkt_count = brkt_count - 1
-        if brkt_count == 0 and brkt_started:
-            cur_s_expr_str = txt[prev_indx:(indx + 1)]
-            prev_indx = indx + 1
-            brkt_started = False
-            strs_so_far.append(cur_s_expr_str)
-    return strs_so_far
-
-
-def load_cspa_as_s_expr_new(file):
-    """using get_root_s_expr_lst to parse multiple s-expr in one file"""
-    result = []
-    for _ in file:
-        break
-    str1 = file.read()
-    lst = get_root_s_expr_lst(str1)
-    for elm in lst:
-        #print("processed element")
-        #print(elm)
-        #print("="*8)
-        result.append(sexpdata.loads(elm))
-    return result
 
 #TODO: should strip lang and ipen has not been tested att all and might not be useful
 # consider removing later
@@ -66,55 +23,86 @@ def re_match_full_str(re_expr:re.Pattern,txt:str):
     return (match_obj is not None) and (match_obj.span()[1] == len(txt))
 
 File = io.TextIOWrapper
-def main(cpsa_file:File,destination_forge_file:File,base_file:File,extra_func_file:File,run_forge_file:File,should_strip_lang_and_open:bool,visualization_script_path:str|None):
-    s_expr_lst = load_cspa_as_s_expr_new(cpsa_file)
-    protocol = parser.parse_protocol(s_expr_lst[0])
-    skeletons:List[Skeleton|InstanceBounds|AltInstanceBounds] = []
-
-    for s_expr in s_expr_lst[1:]:
-        if type(s_expr) == sexpdata.Symbol:
-            raise ParseException(f"Expected defskeleton and definstance clause not simple string {s_expr}")
-        clause_type = get_str_from_symbol(s_expr[0],"defskeleton/definstance")
-        if clause_type == DEF_SKEL_STR:
-            skeletons.append(parser.parse_skeleton(s_expr,protocol))
-        elif clause_type == DEF_INST_BOUNDS:
-            skeletons.append(parser.parse_instance(s_expr,protocol))
-        elif clause_type == DEF_ALT_INST_BOUNDS:
-            skeletons.append(parser.parse_alt_instance(s_expr,protocol))
-        else:
-            raise ParseException(f"Expected {DEF_SKEL_STR} or {DEF_INST_BOUNDS}")
-
-    transcribe_obj = new_transcribe_tuple.Transcribe_obj(destination_forge_file)
-    transcribe_obj.import_file(base_file)
-    transcribe_obj.import_file(extra_func_file)
-    new_transcribe_tuple.transcribe_protocol(protocol, transcribe_obj)
-
-    skel_indx = 0
-    for skel_or_instance in skeletons:
-        match skel_or_instance:
-            case Skeleton(_) as skeleton:
-                new_transcribe_tuple.transcribe_skeleton(skeleton,protocol,transcribe_obj,skel_indx)
-                skel_indx += 1
-            case InstanceBounds(_) as instance_bound:
-                # new_transcribe.transcribe_instance(instance_bound,protocol,transcribe_obj)
-                raise ParseException(f"For tuple expect alt instance bound")
-            case AltInstanceBounds(_) as alt_instance_bound:
-                new_transcribe_tuple.transcribe_instance(alt_instance_bound,protocol,transcribe_obj)
-    if should_strip_lang_and_open:
-        # TODO add support for comments also here
-        open_regex = re.compile(r"[\s]*open[\s]*\".*\"[\s]*\n")
-        lang_forge_regex = re.compile(r"[\s]*#lang[\s]*forge[\s]*\n")
-        option_regex = r"[\s]*option[\s]*run_sterling[\s]*\".*\"[\s]*\n"
-        option_regex = re.compile(option_regex)
-        for line in run_forge_file:
-            if re_match_full_str(open_regex,line) or re_match_full_str(lang_forge_regex,line):
-                continue
-            if re_match_full_str(option_regex,line):
-                transcribe_obj.print_to_file(f"option run_sterling \"{visualization_script_path}\"\n")
-                continue
-            transcribe_obj.print_to_file(line)
-    else:
-        transcribe_obj.import_file(run_forge_file)
+def main(cpsa_file:File,destination_forge_file:File,base_file:File,extra_func_file:File,run_forge_file:File,should_strip_lang_and_open:bool,visualization_script_path:str|None,parse_cache_dir:str|None=None,direct_fd:bool=False,inline_lets:bool=False,share_subexprs:bool=False,infer_instance_name:str|None=None,slice_roles:bool=False,complexity_report_path:str|None=None,profile_path:str|None=None,cprofile_path:str|None=None):
+    profiler = profiling.Profiler(profile_path is not None,cprofile_path)
+    with profiler.running():
+        cache = None if parse_cache_dir is None else parse_cache.ParseCache(parse_cache_dir)
+        protocol,skeletons = parse_cache.parse_cpsa_file(cpsa_file,cache,profiler,{
+            DEF_SKEL_STR: parser.parse_skeleton,
+            DEF_INST_BOUNDS: parser.parse_instance,
+            DEF_ALT_INST_BOUNDS: parser.parse_alt_instance})
+        with profiler.phase("scope_inference"):
+            live_roles = scope_inference.used_roles(protocol,skeletons) if slice_roles else None
+            if infer_instance_name is not None:
+                skeletons.append(scope_inference.infer_alt_instance(infer_instance_name,protocol,skeletons,live_roles))
+            # enc-depth/tuple-length only decide index ranges, never emit more than needed
+            skeletons = [scope_inference.tighten_index_bounds(skel,protocol,skeletons) if isinstance(skel,AltInstanceBounds) else skel
+                         for skel in skeletons]
+
+        transcribe_obj = new_transcribe_tuple.Transcribe_obj(destination_forge_file,direct_fd)
+        transcribe_obj.profiler = profiler
+        let_inliner = forge_passes.LetInliner()
+        if inline_lets:
+            transcribe_obj.ir.passes.append(let_inliner)
+        subexpr_hoister = forge_passes.CommonSubexprHoister()
+        if share_subexprs:
+            transcribe_obj.ir.passes.append(subexpr_hoister)
+        # last so it measures what is printed
+        metrics_collector = spec_metrics.MetricsCollector()
+        if complexity_report_path is not None:
+            transcribe_obj.ir.passes.append(metrics_collector)
+        if live_roles is not None:
+            transcribe_obj.dead_roles = [role.role_name for role in protocol.role_arr if role.role_name not in live_roles]
+            if len(transcribe_obj.dead_roles) != 0:
+                print(f"roles unreachable from the skeletons and instances: {' '.join(transcribe_obj.dead_roles)}")
+        with profiler.phase("write"):
+            transcribe_obj.import_file(base_file)
+            transcribe_obj.import_file(extra_func_file)
+        with profiler.phase("protocol"):
+            new_transcribe_tuple.transcribe_protocol(protocol, transcribe_obj)
+
+        skel_indx = 0
+        for skel_or_instance in skeletons:
+            match skel_or_instance:
+                case Skeleton(_) as skeleton:
+                    with profiler.phase(f"skeleton skeleton_{skeleton.protocol_name}_{skel_indx}"):
+                        new_transcribe_tuple.transcribe_skeleton(skeleton,protocol,transcribe_obj,skel_indx)
+                    skel_indx += 1
+                case InstanceBounds(_) as instance_bound:
+                    # new_transcribe.transcribe_instance(instance_bound,protocol,transcribe_obj)
+                    raise ParseException(f"For tuple expect alt instance bound")
+                case AltInstanceBounds(_) as alt_instance_bound:
+                    with profiler.phase(f"instance {alt_instance_bound.instance_name}"):
+                        new_transcribe_tuple.transcribe_instance(alt_instance_bound,protocol,transcribe_obj)
+        with profiler.phase("write"):
+            if should_strip_lang_and_open:
+                # TODO add support for comments also here
+                open_regex = re.compile(r"[\s]*open[\s]*\".*\"[\s]*\n")
+                lang_forge_regex = re.compile(r"[\s]*#lang[\s]*forge[\s]*\n")
+                option_regex = r"[\s]*option[\s]*run_sterling[\s]*\".*\"[\s]*\n"
+                option_regex = re.compile(option_regex)
+                for line in run_forge_file:
+                    if re_match_full_str(open_regex,line) or re_match_full_str(lang_forge_regex,line):
+                        continue
+                    if re_match_full_str(option_regex,line):
+                        transcribe_obj.print_to_file(f"option run_sterling \"{visualization_script_path}\"\n")
+                        continue
+                    transcribe_obj.print_to_file(line)
+            else:
+                transcribe_obj.import_file(run_forge_file)
+            transcribe_obj.flush()
+    if inline_lets:
+        print(f"let inlining removed {let_inliner.removed} bindings")
+    if share_subexprs:
+        print(f"shared {subexpr_hoister.hoisted} repeated expressions")
+    if complexity_report_path is not None:
+        metrics_collector.write_report(complexity_report_path)
+        print(f"complexity of {len(metrics_collector.metrics)} predicates written to {complexity_report_path}")
+    if profile_path is not None:
+        profiler.write_report(profile_path)
+        print(f"phase timings written to {profile_path}")
+    if cprofile_path is not None:
+        print(f"cProfile stats written to {cprofile_path}")
 
 def path_rel_to_script(path):
     script_path = Path(__file__).parent
@@ -136,6 +124,24 @@ if __name__ == "__main__":
     argument_parser.add_argument("--strip_lang_open_from_run_file",
                                  action='store_true')
     argument_parser.add_argument("--visualization_script_path",type=str)
+    argument_parser.add_argument("--parse_cache_dir",type=str,
+                                 help="directory used to cache parsed protocols, skeletons and instances between runs")
+    argument_parser.add_argument("--direct_fd_output",action='store_true',
+                                 help="write the buffered output straight to the file descriptor of the destination file")
+    argument_parser.add_argument("--inline_lets",action='store_true',
+                                 help="inline let bindings that are used once or fixed by an equality and drop unused ones")
+    argument_parser.add_argument("--cse",action='store_true',
+                                 help="bind key and message expressions repeated inside a role predicate once")
+    argument_parser.add_argument("--infer_instance",type=str,metavar="INSTANCE_NAME",
+                                 help="also emit an instance with the smallest bounds that admit an honest run of the skeletons")
+    argument_parser.add_argument("--slice_roles",action='store_true',
+                                 help="only transcribe the roles the skeletons and instances can reach, the others are left without strands")
+    argument_parser.add_argument("--complexity_report",type=str,metavar="JSON_PATH",
+                                 help="write quantifier, nesting, ^next and *next closure, learnt_term_by and line counts of every emitted predicate to this file")
+    argument_parser.add_argument("--profile",type=str,metavar="JSON_PATH",
+                                 help="write the wall time and peak traced memory of reading, parsing, every role, skeleton and instance and writing to this file as a tree")
+    argument_parser.add_argument("--cprofile_dump",type=str,metavar="STATS_PATH",
+                                 help="also run the transcription under cProfile and dump the stats here, read them with pstats or snakeviz")
 
     args = argument_parser.parse_args()
     base_file_path = None
@@ -156,5 +162,5 @@ if __name__ == "__main__":
             with open(base_file_path) as base_file:
                 with open(extra_func_path) as extra_func_file:
                     with open(run_forge_file_path) as run_forge_file:
-                        main(cpsa_file,destination_forge_file,base_file,extra_func_file,run_forge_file,should_strip_lang_and_open,visualization_script)
+                        main(cpsa_file,destination_forge_file,base_file,extra_func_file,run_forge_file,should_strip_lang_and_open,visualization_script,args.parse_cache_dir,direct_fd=args.direct_fd_output,inline_lets=args.inline_lets,share_subexprs=args.cse,infer_instance_name=args.infer_instance,slice_roles=args.slice_roles,complexity_report_path=args.complexity_report,profile_path=args.profile,cprofile_path=args.cprofile_dump)
                         print(f"finish transcribing to {destination_forge_file_name}")
@@ -1,19 +1,56 @@
 from collections import defaultdict
 import io
 from abc import abstractmethod
+from contextlib import contextmanager
 from typing import List, Tuple, override
 from enum import Enum
 
 from type_and_helpers import *
+from forge_writer import ForgeWriter
+from forge_ir import *
+from profiling import Profiler
 
 
+TIMESLOT_ORDER_SIG = "TimeslotOrder"
+TIMESLOT_ORDER_FIELD = "TimeslotOrder_later"
+
 class Transcribe_obj:
 
-    def __init__(self, file: io.TextIOWrapper) -> None:
+    def __init__(self, file: io.TextIOWrapper, direct_fd: bool = False) -> None:
         self.space_lvl = 0
         self.fresh_num = 0
         self.space_str = " " * 2
         self.file = file
+        self.writer = ForgeWriter(file, self.space_str, direct_fd=direct_fd)
+        self.ir = IRBuilder(self.writer)
+        # role name -> heights of the prefix predicates emitted for it
+        self.strand_heights: Dict[str, List[int]] = {}
+        # skeletons whose variables are fixed to atoms in every inst block
+        self.instance_skeletons: List[Skeleton] = []
+        # emit the SymmetryOrder sig, break_symmetry and their inst bounds
+        self.symmetry_breaking = False
+        # "later than" goes through the TimeslotOrder relation fixed by the
+        # inst block instead of ^next, every predicate using it also says it
+        # is ^next so runs not using the inst stay sound
+        self.exact_time_order = False
+        # one call to a shared helper for all non-orig/uniq-orig terms of a
+        # skeleton or role instead of a quantifier per term
+        self.batch_orig = False
+        # roles the skeletons and instances cannot reach, they keep their sig
+        # but their exec predicate only says there are no strands of them
+        self.dead_roles: List[str] = []
+        # phases of main.py --profile, each role is timed as its own phase
+        self.profiler = Profiler()
+
+    def later_timeslots(self, timeslot_expr: str) -> str:
+        if self.exact_time_order:
+            return f"{timeslot_expr}.({TIMESLOT_ORDER_SIG}.{TIMESLOT_ORDER_FIELD})"
+        return f"{timeslot_expr}.(^next)"
+
+    def emit_time_order_constraint(self) -> None:
+        """ties TimeslotOrder to ^next, with the inst bound it holds for free"""
+        if self.exact_time_order:
+            self.emit(Eq(f"{TIMESLOT_ORDER_SIG}.{TIMESLOT_ORDER_FIELD}", "^next"))
 
     def get_fresh_num(self):
         self.fresh_num += 1
@@ -26,33 +63,39 @@ class Transcribe_obj:
         self.space_lvl -= 1
 
     def print_to_file(self, txt, add_space=True):
+        if self.ir.is_open():
+            self.emit(Blank() if txt == "\n" else Raw(txt.removesuffix("\n")))
+            return
         if txt == "\n":
             add_space = False
-        if add_space:
-            print(self.space_lvl * self.space_str, end="", file=self.file)
-        print(txt, end="", file=self.file)
+        self.writer.write(txt, self.space_lvl if add_space else 0)
+
+    def emit(self, node: Node):
+        """adds node to the block being built, or prints it straight away
+        if it is a top level declaration"""
+        self.ir.emit(node, self.space_lvl)
 
     def import_file(self, other_forge_file: io.TextIOWrapper):
-        for line in other_forge_file:
-            self.print_to_file(line)
+        self.writer.write_file(other_forge_file, self.space_lvl)
+
+    def flush(self):
+        """writes out everything still buffered, has to be called once
+        transcription is done"""
+        self.writer.flush()
+
+    @contextmanager
+    def capture(self):
+        """redirects everything printed inside the with block to a StringIO
+        instead of the destination file, used to record emitted fragments"""
+        with self.writer.capture() as captured:
+            yield captured
 
 #TODO: can change signature modifier to use an enum instead of a plain string
 # like below
     def write_sig(self, sig_name: str, parent_sig_name: None | str,
                   field_name_type: List[Tuple[str,
                                               str]], sig_modifier: str | None):
-        parent_sig_name = "" if parent_sig_name is None else f"extends {parent_sig_name} "
-        sig_modifier = "" if sig_modifier is None else sig_modifier + " "
-        self.print_to_file(
-            f"{sig_modifier}sig {sig_name} {parent_sig_name}{{\n")
-        self.start_block()
-        for field_name, field_type in field_name_type[:-1]:
-            self.print_to_file(f"{field_name} : {field_type},\n")
-        field_name, field_type = field_name_type[-1]
-        self.print_to_file(f"{field_name} : {field_type}\n")
-
-        self.end_block()
-        self.print_to_file("}\n")
+        self.emit(Sig(sig_name, parent_sig_name, field_name_type, sig_modifier))
 
     # def write_new_seq_constraint(self,seq_expr:str,seq_terms:List[NonCatTerm],send_recv:SendRecv,timeslot_expr:str,sig_context:"RoleOrSkelTranscrContext"):
     #     indices_str = "+".join([str(i) for i in range(len(seq_terms))])
@@ -120,10 +163,10 @@ class Transcribe_obj:
         seq_component_exprs = [f"({seq_expr})[{indx}]" for indx in range(len(seq_terms))]
 
         indices_str = "+".join([str(i) for i in range(len(seq_terms))])
-        self.print_to_file(f"inds[{seq_expr}] = {indices_str}\n")
+        self.emit(Eq(f"inds[{seq_expr}]", indices_str))
         with LetClauseContext(seq_component_names,seq_component_exprs,self):
             all_seq_components = " + ".join([f"{indx}->{comp_name}" for indx,comp_name in enumerate(seq_component_names)])
-            self.print_to_file(f"{seq_expr} = {all_seq_components}\n")
+            self.emit(Eq(seq_expr, all_seq_components))
             for comp_name,comp_term in zip(seq_component_names,seq_terms):
                 transcribe_non_cat(comp_name,comp_term,send_recv,timeslot_expr,sig_context)
 
@@ -169,14 +212,14 @@ class QuantiferEnum(Enum):
 class PredicateContext:
     pred_name: str
     transcr: Transcribe_obj
+    params: List[Tuple[str, str]] | None = None
 
     def __enter__(self):
-        self.transcr.print_to_file(f"pred {self.pred_name} {{\n")
-        self.transcr.start_block()
+        params = [] if self.params is None else self.params
+        self.transcr.ir.open_block(Pred(self.pred_name, params=params))
 
     def __exit__(self, exc_type, exc_value, traceback):
-        self.transcr.end_block()
-        self.transcr.print_to_file(f"}}\n")
+        self.transcr.ir.close_block(self.transcr.space_lvl)
 
 @dataclass
 class LetClauseContext:
@@ -187,26 +230,19 @@ class LetClauseContext:
     def __enter__(self):
         if len(self.var_name) != len(self.var_expression):
             raise ParseException("For let clause should have equal number of variable names and expressions")
-        for var_name,var_expression in zip(self.var_name,self.var_expression):
-            self.transcr.print_to_file(f"let {var_name}  = {var_expression} | {{\n")
-        self.transcr.start_block()
+        self.transcr.ir.open_block(Let(list(zip(self.var_name,self.var_expression))))
 
     def __exit__(self,exc_type,exc_value,traceback):
-        num_blocks = len(self.var_name)
-        close_str = "}" * num_blocks
-        self.transcr.end_block()
-        self.transcr.print_to_file(close_str + "\n")
+        self.transcr.ir.close_block(self.transcr.space_lvl)
 
 @dataclass
 class InstanceContext:
     instance_name:str
     transcr:Transcribe_obj
     def __enter__(self):
-        self.transcr.print_to_file(f"inst {self.instance_name} {{\n")
-        self.transcr.start_block()
+        self.transcr.ir.open_block(Inst(self.instance_name))
     def __exit__(self,exc_type,exc_value,traceback):
-        self.transcr.end_block()
-        self.transcr.print_to_file(f"}}\n")
+        self.transcr.ir.close_block(self.transcr.space_lvl)
 @dataclass
 class TimeslotContext:
     timeslot_names: List[str]
@@ -216,21 +252,13 @@ class TimeslotContext:
     def __enter__(self):
         cur_set = "Timeslot"
         for timeslot_name in self.timeslot_names:
-            self.transcr.print_to_file(f"some {timeslot_name} : {cur_set} {{\n")
-            if self.nested_indent:
-                self.transcr.start_block()
-            cur_set = f"{timeslot_name}.(^next)"
-        if not self.nested_indent:
-            self.transcr.start_block()
+            self.transcr.ir.open_block(Quant("some", [timeslot_name], cur_set,
+                                             bar=False, stacked=not self.nested_indent))
+            cur_set = self.transcr.later_timeslots(timeslot_name)
 
     def __exit__(self,exc_type,exc_value,traceback):
-        if self.nested_indent:
-            for _ in self.timeslot_names:
-                self.transcr.end_block()
-                self.transcr.print_to_file(f"}}\n")
-        else:
-            self.transcr.end_block()
-            self.transcr.print_to_file("}"*len(self.timeslot_names)+"\n")
+        for _ in self.timeslot_names:
+            self.transcr.ir.close_block(self.transcr.space_lvl)
 @dataclass
 class QuantifierPredicate:
     quantifer_enum: QuantiferEnum
@@ -239,25 +267,19 @@ class QuantifierPredicate:
     transcr: Transcribe_obj
 
     def __enter__(self):
-        variables_str = ','.join(self.var_names)
-        self.transcr.print_to_file(
-            f"{self.quantifer_enum} {variables_str} : {self.set_name} | {{\n")
-        self.transcr.start_block()
+        self.transcr.ir.open_block(Quant(str(self.quantifer_enum), self.var_names, self.set_name))
 
     def __exit__(self, exc_type, exc_value, traceback):
-        self.transcr.end_block()
-        self.transcr.print_to_file(f"}}\n")
+        self.transcr.ir.close_block(self.transcr.space_lvl)
 
 @dataclass
 class ImpliesPredicate:
     pre_condition:str
     transcr: Transcribe_obj
     def __enter__(self):
-        self.transcr.print_to_file(f"{self.pre_condition} => {{\n")
-        self.transcr.start_block()
+        self.transcr.ir.open_block(Implies(self.pre_condition))
     def __exit__(self,exc_type,exc_value,traceback):
-        self.transcr.end_block()
-        self.transcr.print_to_file(f"}}\n")
+        self.transcr.ir.close_block(self.transcr.space_lvl)
 
 @dataclass
 class SigContext:
@@ -458,7 +480,7 @@ def transcribe_enc(elm_expr: str, enc_term: EncTerm,send_recv:SendRecv ,timeslot
             term_str = sig_context.get_inv_key(enc_term.key)
             match sig_context:
                 case RoleTranscribeContext(_):
-                    transcr.print_to_file(f"learnt_term_by[{term_str},{sig_context.role_var_name}.agent,{timeslot_expr}]\n")
+                    transcr.emit(Call("learnt_term_by",[term_str,f"{sig_context.role_var_name}.agent",timeslot_expr]))
                 case SkeletonTranscribeContext(_):
                     pass
     transcr.write_new_seq_constraint(data_expr,enc_term.data,send_recv,timeslot_expr,sig_context)
@@ -466,13 +488,12 @@ def transcribe_enc(elm_expr: str, enc_term: EncTerm,send_recv:SendRecv ,timeslot
 
 def transcribe_hash(elm_expr: str,hash_term:HashTerm,send_recv:SendRecv,timeslot_expr:str,sig_context:RoleOrSkelTranscrContext):
     transcr = sig_context.get_transcr()
-    transcr.print_to_file(f"{elm_expr} in Hashed\n")
+    transcr.emit(In(elm_expr,"Hashed"))
     hash_of_expr = f"({elm_expr}).hash_of"
     transcribe_non_cat(hash_of_expr,hash_term.hash_of,send_recv,timeslot_expr,sig_context)
 
 def transcribe_base_term(elm_expr:str,msg:BaseTerm,send_recv:SendRecv,role_context:SigContext):
-    constraint_expr = f"{elm_expr} = {role_context.get_base_term_str(msg)}\n"
-    role_context.get_transcr().print_to_file(constraint_expr)
+    role_context.get_transcr().emit(Eq(elm_expr,role_context.get_base_term_str(msg)))
 
 def transcribe_non_cat(elm_expr: str, msg: NonCatTerm,send_recv:SendRecv,timeslot_expr:str,
                        role_context: RoleOrSkelTranscrContext):
@@ -493,9 +514,9 @@ def transcribe_indv_trace(role: Role, indx: int,
     role_var_name = role_context.role_var_name
     match send_recv:
         case SendRecv.SEND:
-            transcr.print_to_file(f"t{indx}.sender = {role_var_name}\n")
+            transcr.emit(Eq(f"t{indx}.sender",role_var_name))
         case SendRecv.RECV:
-            transcr.print_to_file(f"t{indx}.receiver = {role_var_name}\n")
+            transcr.emit(Eq(f"t{indx}.receiver",role_var_name))
     match mesg:
         case CatTerm(_) as cat:
             transcr.write_new_seq_constraint(f"(t{indx}.data)",cat.data,send_recv,f"t{indx}",role_context)
@@ -526,7 +547,7 @@ def transcribe_freshly_gen_constr(role:Role,role_context:RoleTranscribeContext):
 
     for indx,variables in var_first_occur.items():
         freshly_gen_tuples = " + ".join([f"({role_context.acess_variable(var.var_name)})->t{indx}" for var in variables])
-        role_context.transcr.print_to_file(f"({freshly_gen_tuples}) in ({role_context.get_agent()}).generated_times\n")
+        role_context.transcr.emit(In(f"({freshly_gen_tuples})",f"({role_context.get_agent()}).generated_times"))
 
 def transcribe_trace(role: Role, role_context: RoleTranscribeContext):
     trace_len = len(role.trace)
@@ -554,18 +575,21 @@ def transcribe_trace(role: Role, role_context: RoleTranscribeContext):
         transcribe_freshly_gen_constr(role,role_context)
         all_timeslots_set = "+".join(timeslot_names)
         role_var_name = role_context.role_var_name
-        transcr.print_to_file(f"{all_timeslots_set} = sender.{role_var_name} + receiver.{role_var_name}\n")
+        transcr.emit(Eq(all_timeslots_set,f"sender.{role_var_name} + receiver.{role_var_name}"))
         for i in range(len(role.trace)):
             transcribe_indv_trace(role,i,role_context)
-            role_context.get_transcr().print_to_file("\n")
+            role_context.get_transcr().emit(Blank())
 
     # for _ in timeslot_names:
     #     transcr.end_block()
     #     transcr.print_to_file(f"}}\n")
 def transcribe_most_role_constr(role:Role,role_context:RoleTranscribeContext):
     role_constratins = role.role_constraints
+    non_origs: List[NonOrig] = []
     for constraint in role_constratins:
         match constraint:
+            case NonOrig(_) as non_orig if role_context.transcr.batch_orig:
+                non_origs.append(non_orig)
             case NonOrig(_) as non_orig:
                 transcribe_non_orig(non_orig,role_context)
             case UniqOrig(_) as uniq_orig:
@@ -576,30 +600,175 @@ def transcribe_most_role_constr(role:Role,role_context:RoleTranscribeContext):
                 #this case has to be present inside the code where
                 #existential quantification over timeslots takes place
                 pass
-
-def transcribe_role(role: Role, role_context: RoleTranscribeContext):
+    transcribe_batched_orig(NON_ORIG_HELPER,non_origs,role_context)
+
+def prefix_pred_name(role_sig_name: str, height: int):
+    return f"exec_{role_sig_name}_prefix_{height}"
+
+def role_prefix(role: Role, height: int) -> Role:
+    """role restricted to the first height events of its trace, constraints
+    on variables that only appear later in the trace are dropped"""
+    prefix_trace = role.trace[:height]
+    def in_prefix(term) -> bool:
+        match term:
+            case Variable(_):
+                return var_first_occur_in_trace(prefix_trace, term) is not None
+        return True
+    prefix_constraints = []
+    for constraint in role.role_constraints:
+        match constraint:
+            case FreshlyGenConstraint(_):
+                terms = [term for term in constraint.terms if in_prefix(term)]
+                if len(terms) != 0:
+                    prefix_constraints.append(FreshlyGenConstraint(terms))
+            case UniqOrig(_):
+                terms = [term for term in constraint.terms if in_prefix(term)]
+                if len(terms) != 0:
+                    prefix_constraints.append(UniqOrig(terms))
+            case _:
+                prefix_constraints.append(constraint)
+    return Role(role.role_name, role.var_map, prefix_trace, prefix_constraints)
+
+def partial_strand_heights(protocol: Protocol,
+                           skeletons: List[Skeleton | InstanceBounds | AltInstanceBounds]) -> Dict[str, List[int]]:
+    """role name -> sorted heights of the defstrands in skeletons that are
+    shorter than the trace of the role, heights that are not shorter are
+    treated as the whole trace"""
+    heights: Dict[str, set] = defaultdict(set)
+    for skeleton in skeletons:
+        if not isinstance(skeleton, Skeleton):
+            continue
+        for constraint in skeleton.constraints_list:
+            match constraint:
+                case Strand(_) as strand:
+                    role = protocol.role_obj_of_name(strand.role_name)
+                    if role is None:
+                        raise ParseException(f"defstrand of unknown role {strand.role_name}")
+                    if strand.trace_len < 1:
+                        raise ParseException(f"defstrand height must be atleast 1 not {strand.trace_len}")
+                    if strand.trace_len < len(role.trace):
+                        heights[strand.role_name].add(strand.trace_len)
+    return {role_name: sorted(role_heights) for role_name,role_heights in heights.items()}
+
+def transcribe_role(role: Role, role_context: RoleTranscribeContext,
+                    prefix_heights: List[int] | None = None):
+    """with prefix_heights every strand of the role has to execute either
+    the whole trace or one of the prefixes, each prefix gets its own
+    predicate taking the strand so skeleton strands can pick their height"""
     role_sig_name = role_context.role_sig_name
     transcr = role_context.transcr
     transcribe_role_to_sig(role, role_sig_name, transcr)
 
+    if role.role_name in transcr.dead_roles:
+        with PredicateContext(transcr=transcr, pred_name=f"exec_{role_sig_name}"):
+            transcr.emit(Raw(f"no {role_sig_name}"))
+        return
+
+    if prefix_heights is None or len(prefix_heights) == 0:
+        with PredicateContext(transcr=transcr, pred_name=f"exec_{role_sig_name}"):
+            transcr.emit_time_order_constraint()
+            with QuantifierPredicate(QuantiferEnum.ALL,
+                                     [role_context.role_var_name], role_sig_name,
+                                     transcr):
+                transcribe_most_role_constr(role,role_context)
+                transcribe_trace(role, role_context)
+        return
+
+    all_heights = prefix_heights + [len(role.trace)]
+    for height in all_heights:
+        prefix_role = role_prefix(role, height)
+        with PredicateContext(prefix_pred_name(role_sig_name, height), transcr,
+                              [(role_context.role_var_name, role_sig_name)]):
+            transcr.emit_time_order_constraint()
+            transcribe_most_role_constr(prefix_role,role_context)
+            transcribe_trace(prefix_role, role_context)
+
     with PredicateContext(transcr=transcr, pred_name=f"exec_{role_sig_name}"):
         with QuantifierPredicate(QuantiferEnum.ALL,
                                  [role_context.role_var_name], role_sig_name,
                                  transcr):
-            transcribe_most_role_constr(role,role_context)
-            transcribe_trace(role, role_context)
+            prefix_calls = [constraint_text(Call(prefix_pred_name(role_sig_name, height),
+                                                 [role_context.role_var_name]))
+                            for height in all_heights]
+            transcr.emit(Raw(" or ".join(prefix_calls)))
 
 
-def transcribe_protocol(protocol: Protocol, transcr: Transcribe_obj):
+def transcribe_protocol(protocol: Protocol, transcr: Transcribe_obj,
+                        strand_heights: Dict[str, List[int]] | None = None):
     """Function to transcribe the protocol object returned by the parser
-    contains nested functions to parse sub components like roles,signatures"""
+    contains nested functions to parse sub components like roles,signatures.
+    strand_heights is the result of partial_strand_heights"""
+    transcr.strand_heights = {} if strand_heights is None else strand_heights
     for role in protocol.role_arr:
-        transcribe_role(
-            role,
-            transcr.create_role_context(
-                role, protocol,
-                transcr.role_var_name_in_prot_pred(role.role_name,
-                                                   protocol.protocol_name)))
+        with transcr.profiler.phase(f"role {role.role_name}"):
+            transcribe_role(
+                role,
+                transcr.create_role_context(
+                    role, protocol,
+                    transcr.role_var_name_in_prot_pred(role.role_name,
+                                                       protocol.protocol_name)),
+                transcr.strand_heights.get(role.role_name))
+    if transcr.exact_time_order:
+        transcribe_timeslot_order_sig(transcr)
+    if transcr.batch_orig:
+        transcribe_orig_helpers(transcr)
+    if transcr.symmetry_breaking:
+        transcribe_symmetry_breaking(protocol, transcr)
+
+
+def transcribe_timeslot_order_sig(transcr: Transcribe_obj):
+    transcr.write_sig(TIMESLOT_ORDER_SIG, None,
+                      [(TIMESLOT_ORDER_FIELD, f"set {TIMESLOT_SIG} -> {TIMESLOT_SIG}")], "one")
+
+
+SYMMETRY_SIG = "SymmetryOrder"
+
+def symmetric_sigs(protocol: Protocol) -> List[str]:
+    """role sigs and the sigs of nonces generated by the protocol, every atom
+    of these is interchangeable with the others of the same sig in an inst"""
+    var_types = {var.var_type for role in protocol.role_arr for var in role.var_map.values()}
+    nonce_sigs = [sig_name for var_type, sig_name in [(MsgTypes.TEXT, TEXT_SIG), (MsgTypes.SKEY, SKEY_SIG)]
+                  if var_type in var_types]
+    return [get_role_sig_name(role, protocol) for role in protocol.role_arr] + nonce_sigs
+
+def symmetry_field_name(sig_name: str) -> str:
+    return f"{SYMMETRY_SIG}_{sig_name}"
+
+def transcribe_symmetry_breaking(protocol: Protocol, transcr: Transcribe_obj):
+    """the inst block fixes SymmetryOrder to relate every atom of a
+    symmetric sig to the next one, break_symmetry then asks strands related by
+    it to start in that order and nonces related by it to be generated in
+    that order. Atoms without events or never generated come last"""
+    role_sig_names = [get_role_sig_name(role, protocol) for role in protocol.role_arr]
+    sig_names = symmetric_sigs(protocol)
+    transcr.write_sig(SYMMETRY_SIG, None,
+                      [(symmetry_field_name(sig_name), f"set {sig_name} -> {sig_name}") for sig_name in sig_names],
+                      "one")
+    with PredicateContext("break_symmetry", transcr):
+        transcr.emit_time_order_constraint()
+        for sig_name in sig_names:
+            with QuantifierPredicate(QuantiferEnum.ALL, ["a1", "a2"], sig_name, transcr):
+                with ImpliesPredicate(f"a1->a2 in {SYMMETRY_SIG}.{symmetry_field_name(sig_name)}", transcr):
+                    if sig_name in role_sig_names:
+                        times = lambda atom: f"(sender + receiver).{atom}"
+                    else:
+                        times = lambda atom: f"{atom}.(name.generated_times)"
+                    with QuantifierPredicate(QuantiferEnum.ALL, ["t2"], times("a2"), transcr):
+                        later = "t1.*next" if not transcr.exact_time_order else f"t1 + {transcr.later_timeslots('t1')}"
+                        transcr.emit(Raw(f"some t1 : {times('a1')} | t2 in {later}"))
+
+def transcribe_symmetry_bounds(instance_bound: InstanceBounds, prot: Protocol, transcr: Transcribe_obj):
+    transcr.emit(Eq(SYMMETRY_SIG, f"`{SYMMETRY_SIG}0"))
+    role_counts = {get_role_sig_name(role, prot): instance_bound.role_counts[role.role_name]
+                   for role in prot.role_arr}
+    for sig_name in symmetric_sigs(prot):
+        atom_count = role_counts[sig_name] if sig_name in role_counts else instance_bound.sig_counts[sig_name]
+        field_name = symmetry_field_name(sig_name)
+        if atom_count < 2:
+            transcr.emit(Raw(f"no {field_name}"))
+            continue
+        order_tpls = " + ".join([f"`{sig_name}{indx}->`{sig_name}{indx+1}" for indx in range(atom_count - 1)])
+        transcr.emit(Eq(field_name, f"`{SYMMETRY_SIG}0 -> ({order_tpls})"))
 
 
 def transcribe_skeleton_to_sig(skeleton: Skeleton,protocol:Protocol, skeleton_sig_name: str,
@@ -632,7 +801,14 @@ def transcribe_strand(strand: Strand,
                 strand_var.var_name)
             skeleton_var_str = skeleton_transcr_context.acess_variable(
                 skeleton_var_name)
-            transcr.print_to_file(f"{strand_var_str} = {skeleton_var_str}\n")
+            transcr.emit(Eq(strand_var_str,skeleton_var_str))
+        # once the role has prefix predicates a strand only runs the whole
+        # trace if asked to
+        role_trace_len = len(role_transcr_context.role.trace)
+        if strand.role_name in transcr.strand_heights:
+            height = min(strand.trace_len, role_trace_len)
+            transcr.emit(Call(prefix_pred_name(role_transcr_context.role_sig_name, height),
+                              [role_transcr_context.role_var_name]))
 
 
 #TODO: Can simplifly functions related to transcribing publick key privk and others since they are very small
@@ -643,9 +819,26 @@ def transcribe_non_orig(non_orig: NonOrig,
         base_term_str = skeleton_transcr_context.get_base_term_str(base_term)
         with QuantifierPredicate(QuantiferEnum.NO, ["aStrand"], "strand",
                                  transcr):
-            transcr.print_to_file(
-                f"originates[aStrand,{base_term_str}] or generates [aStrand,{base_term_str}]\n"
-            )
+            transcr.emit(Raw(f"originates[aStrand,{base_term_str}] or generates [aStrand,{base_term_str}]"))
+
+NON_ORIG_HELPER = "non_orig_terms"
+
+def transcribe_orig_helpers(transcr: Transcribe_obj):
+    """the first message a term is a subterm of originates it on its sender,
+    so no strand originates a term exactly when it is not a subterm of any
+    message, that needs the subterm closure once for all terms. uniq-orig
+    stays per term, `one aStrand` has to be expanded for every term anyway
+    so a helper quantifying over the terms would not save anything"""
+    transcr.emit(Pred(NON_ORIG_HELPER, [
+        Raw("no ds & (subterm[Int.(Timeslot.data)] + (strand.agent).generated_times.Timeslot)")
+    ], [("ds", "set mesg")]))
+
+def transcribe_batched_orig(helper_name: str, orig_constraints: List[NonOrig],
+                            sig_context: RoleOrSkelTranscrContext):
+    term_strs = [sig_context.get_base_term_str(base_term)
+                 for orig_constraint in orig_constraints for base_term in orig_constraint.terms]
+    if len(term_strs) != 0:
+        sig_context.transcr.emit(Call(helper_name, [" + ".join(term_strs)]))
 
 def transcribe_uniq_orig(uniq_orig: UniqOrig,
                          skeleton_transcr_context: RoleOrSkelTranscrContext):
@@ -656,13 +849,11 @@ def transcribe_uniq_orig(uniq_orig: UniqOrig,
             case SkeletonTranscribeContext(_):
                 with QuantifierPredicate(QuantiferEnum.ONE, ["aStrand"], "strand",
                                          transcr):
-                    transcr.print_to_file(
-                        f"originates[aStrand,{base_term_str}] or generates [aStrand,{base_term_str}]\n"
-                    )
+                    transcr.emit(Raw(f"originates[aStrand,{base_term_str}] or generates [aStrand,{base_term_str}]"))
             case RoleTranscribeContext(_) as role_transcr:
                 #TODO: modify uniq-orig to only take in terms that can be generated
                 strand_name = role_transcr.get_agent()
-                transcr.print_to_file(f"(generated_times.Timeslot).({base_term_str}) = {strand_name}\n")
+                transcr.emit(Eq(f"(generated_times.Timeslot).({base_term_str})",strand_name))
                 # with QuantifierPredicate(QuantiferEnum.ONE, ["aStrand"], "strand",
                 #                          transcr):
                 #     transcr.print_to_file(
@@ -674,7 +865,7 @@ def transcribe_not_eq(not_eq:NotEqConstraint,
     transcr = skeleton_transcr_context.transcr
     term1_str = skeleton_transcr_context.get_base_term_str(not_eq.term1)
     term2_str = skeleton_transcr_context.get_base_term_str(not_eq.term2)
-    transcr.print_to_file(f"{term1_str} != {term2_str}\n")
+    transcr.emit(NotEq(term1_str,term2_str))
 
 def transcribe_indv_trace_constraint(skeleton:Skeleton,indv_trace_constraint:IndvSendRecvInConstraint,timeslot_name:str,transcr:Transcribe_obj,skel_transcr_context:SkeletonTranscribeContext):
     send_recv = indv_trace_constraint.trace_type
@@ -682,9 +873,9 @@ def transcribe_indv_trace_constraint(skeleton:Skeleton,indv_trace_constraint:Ind
     message = indv_trace_constraint.message
     match send_recv:
         case SendRecv.SEND:
-            transcr.print_to_file(f"{timeslot_name}.sender = {skel_transcr_context.acess_variable(send_recv_strand)}\n")
+            transcr.emit(Eq(f"{timeslot_name}.sender",skel_transcr_context.acess_variable(send_recv_strand)))
         case SendRecv.RECV:
-            transcr.print_to_file(f"{timeslot_name}.receiver = {skel_transcr_context.acess_variable(send_recv_strand)}\n")
+            transcr.emit(Eq(f"{timeslot_name}.receiver",skel_transcr_context.acess_variable(send_recv_strand)))
     data_in_timeslot = None
     match message:
         case CatTerm(data):
@@ -705,11 +896,12 @@ def transcribe_trace_constraint(trace_constraint:TraceConstraint,
 
     timeslot_names = [f"t_{i}" for i in range(trace_len)]
     with PredicateContext(trace_pred_name,transcr):
+        transcr.emit_time_order_constraint()
         with TimeslotContext(timeslot_names,transcr,False):
             for timeslot_name,indv_trace_constraint in zip(timeslot_names,indv_trace_constraints):
                 transcribe_indv_trace_constraint(skeleton,indv_trace_constraint,
                                                  timeslot_name,transcr,skel_transcr_context)
-                transcr.print_to_file("\n")
+                transcr.emit(Blank())
 
     return trace_pred_name
 def transcribe_skeleton_to_predicate(skeleton: Skeleton, skel_num: int,
@@ -733,6 +925,7 @@ def transcribe_skeleton_to_predicate(skeleton: Skeleton, skel_num: int,
                                                           transcr,protocol,skel_transcr_context)
         trace_pred_names.append(cur_trace_pred_name)
 
+    non_origs: List[NonOrig] = []
     with PredicateContext(skeleton_pred_name, transcr):
         strand_num = 0
         for constranint in non_trace_constraints:
@@ -748,6 +941,8 @@ def transcribe_skeleton_to_predicate(skeleton: Skeleton, skel_num: int,
                     transcribe_strand(strand, skel_transcr_context,
                                       role_context)
                     strand_num += 1
+                case NonOrig(_) as non_orig if transcr.batch_orig:
+                    non_origs.append(non_orig)
                 case NonOrig(_) as non_orig:
                     transcribe_non_orig(non_orig, skel_transcr_context)
                 case UniqOrig(_) as uniq_org:
@@ -755,8 +950,9 @@ def transcribe_skeleton_to_predicate(skeleton: Skeleton, skel_num: int,
                 case NotEqConstraint(_) as not_eq:
                     transcribe_not_eq(not_eq,skel_transcr_context)
 
+        transcribe_batched_orig(NON_ORIG_HELPER,non_origs,skel_transcr_context)
         for trace_pred_name in trace_pred_names:
-            transcr.print_to_file(trace_pred_name + "\n")
+            transcr.emit(Call(trace_pred_name))
 
 
 def transcribe_skeleton(skeleton: Skeleton, protocol: Protocol,
@@ -777,58 +973,112 @@ def write_bound_expressions(cur_node:str,instance_bound:InstanceBounds,transcr:T
         non_zero_count_subtype = list(filter(lambda sub: (instance_counts[sub] != 0),cur_node_subs))
         if cur_node in subtypes_are_exhaustive:
             subtype_sigs = " + ".join(non_zero_count_subtype)
-            transcr.print_to_file(f"{cur_node} = {subtype_sigs}\n")
+            transcr.emit(Eq(cur_node,subtype_sigs))
         else:
             child_sigs = non_zero_count_subtype
             total_child_elms = sum([instance_counts[child] for child in child_sigs])
             extra_no_elms = instance_counts[cur_node] - total_child_elms
             extra_elms = [f"`{cur_node}{indx}" for indx in range(extra_no_elms)]
             total_elms = " + ".join(extra_elms + child_sigs)
-            transcr.print_to_file(f"{cur_node} = {total_elms}\n")
+            transcr.emit(Eq(cur_node,total_elms))
     else:
         cur_count = instance_counts[cur_node]
         if cur_count != 0:
             sig_elements = " + ".join([f"`{cur_node}{indx}" for indx in range(instance_counts[cur_node])])
-            transcr.print_to_file(f"{cur_node} = {sig_elements}\n")
+            transcr.emit(Eq(cur_node,sig_elements))
+
+def transcribe_skeleton_bounds(skeleton:Skeleton,skel_num:int,instance_bound:InstanceBounds,prot:Protocol,transcr:Transcribe_obj):
+    """gives the one sig of the skeleton its atom and points each name, text
+    and skey field at an atom of its own and each strand field at a strand
+    atom of its role, akey and mesg fields are left to the solver. This
+    assumes the skeleton variables of one type are pairwise distinct and that
+    no name variable is the attacker"""
+    skeleton_sig_name = f"skeleton_{skeleton.protocol_name}_{skel_num}"
+    skeleton_atom = f"`{skeleton_sig_name}0"
+    # the last name atom is Attacker0
+    available_atoms = {
+        MsgTypes.NAME: (NAME_SIG,instance_bound.sig_counts[NAME_SIG] - 1),
+        MsgTypes.TEXT: (TEXT_SIG,instance_bound.sig_counts[TEXT_SIG]),
+        MsgTypes.SKEY: (SKEY_SIG,instance_bound.sig_counts[SKEY_SIG])
+    }
+    used_atoms:Dict[str,int] = defaultdict(int)
+    def next_atom(sig_name:str,atom_count:int) -> str:
+        atom_indx = used_atoms[sig_name]
+        if atom_indx >= atom_count:
+            raise ParseException(f"instance {instance_bound.instance_name} has {atom_count} {sig_name} atoms for the variables of {skeleton_sig_name} but more are needed")
+        used_atoms[sig_name] += 1
+        return f"`{sig_name}{atom_indx}"
+
+    transcr.emit(Eq(skeleton_sig_name,skeleton_atom))
+    for var_name,var in skeleton.non_strand_vars_map.items():
+        if var.var_type not in available_atoms:
+            continue
+        atom = next_atom(*available_atoms[var.var_type])
+        transcr.emit(Eq(f"{skeleton_sig_name}_{var_name}",f"{skeleton_atom} -> {atom}"))
+    for var_name,role_obj_type in skeleton.strand_vars_map.items():
+        role_sig_name = rolesig_of_role_obj_type(prot,role_obj_type)
+        role_count = instance_bound.role_counts[role_obj_type.removeprefix("role_")]
+        atom = next_atom(role_sig_name,role_count)
+        transcr.emit(Eq(f"{skeleton_sig_name}_{var_name}",f"{skeleton_atom} -> {atom}"))
 
 def transcribe_instance(instance_bound:InstanceBounds,prot:Protocol,transcr:Transcribe_obj):
     with InstanceContext(instance_bound.instance_name,transcr):
         write_bound_expressions(MESG_SIG,instance_bound,transcr)
-        transcr.print_to_file("\n")
+        transcr.emit(Blank())
         write_bound_expressions(TIMESLOT_SIG,instance_bound,transcr)
-        transcr.print_to_file("\n")
+        transcr.emit(Blank())
 
         sig_counts = instance_bound.sig_counts
         #write depth bound for plaintext
         #set values for pairs and owners relation
         possible_seq_len = "+".join([str(i) for i in range(instance_bound.encryption_depth)])
-        transcr.print_to_file(f"plaintext in {CIPHER_SIG} -> ({possible_seq_len}) -> {MESG_SIG}\n")
-        transcr.print_to_file("\n")
-        transcr.print_to_file(f"KeyPairs = `KeyPairs0\n")
+        transcr.emit(In("plaintext",f"{CIPHER_SIG} -> ({possible_seq_len}) -> {MESG_SIG}"))
+        transcr.emit(Blank())
+        transcr.emit(Eq("KeyPairs","`KeyPairs0"))
         pubk_count,privk_count,name_count = sig_counts[PUBK_SIG],sig_counts[PRIVK_SIG],sig_counts[NAME_SIG]
         if pubk_count != privk_count or pubk_count != name_count or privk_count != name_count:
             raise ParseException(f"pubk,privk and name bounds are {pubk_count},{privk_count},{name_count} are not all equal currently only supporting instances where they are all equal")
 
         #keypairs pairs tuples
         pubk_privk_tpls = " + ".join([f"`{PRIVK_SIG}{i}->`{PUBK_SIG}{i}" for i in range(pubk_count)])
-        transcr.print_to_file(f"pairs = KeyPairs -> ({pubk_privk_tpls})\n")
+        transcr.emit(Eq("pairs",f"KeyPairs -> ({pubk_privk_tpls})"))
 
         key_owner_tpls = " + ".join([f"`{PRIVK_SIG}{i}->`name{i}" for i in range(name_count-1)] + [f"`{PRIVK_SIG}{name_count-1}->`Attacker0"])
-        transcr.print_to_file(f"owners = KeyPairs -> ({key_owner_tpls})\n")
-        transcr.print_to_file(f"no ltks\n")
-        transcr.print_to_file("\n")
+        transcr.emit(Eq("owners",f"KeyPairs -> ({key_owner_tpls})"))
+        transcr.emit(Raw("no ltks"))
+        transcr.emit(Blank())
         #next relation on Timeslot
         num_timeslots = sig_counts[TIMESLOT_SIG]
         time_next_tpls = " + ".join([f"`{TIMESLOT_SIG}{indx}->`{TIMESLOT_SIG}{indx+1}" for indx in range(num_timeslots-1)])
-        transcr.print_to_file(f"next = {time_next_tpls}\n")
-
-        transcr.print_to_file("\n")
+        # a single timeslot has no successor
+        transcr.emit(Eq("next",time_next_tpls) if num_timeslots > 1 else Raw("no next"))
+        if transcr.exact_time_order:
+            # every pair of earlier and later timeslot so no closure is needed
+            transcr.emit(Eq(TIMESLOT_ORDER_SIG,f"`{TIMESLOT_ORDER_SIG}0"))
+            time_order_tpls = " + ".join([f"`{TIMESLOT_SIG}{indx}->`{TIMESLOT_SIG}{later_indx}"
+                                          for indx in range(num_timeslots) for later_indx in range(indx+1,num_timeslots)])
+            if num_timeslots > 1:
+                transcr.emit(Eq(TIMESLOT_ORDER_FIELD,f"`{TIMESLOT_ORDER_SIG}0 -> ({time_order_tpls})"))
+            else:
+                transcr.emit(Raw(f"no {TIMESLOT_ORDER_FIELD}"))
+
+        transcr.emit(Blank())
         role_sig_names = {role.role_name: get_role_sig_name(role,prot) for role in prot.role_arr}
         for role_name,role_sig_name in role_sig_names.items():
             cur_count = instance_bound.role_counts[role_name]
+            if cur_count == 0:
+                transcr.emit(Raw(f"no {role_sig_name}"))
+                continue
             cur_role_elms = " + ".join([f"`{role_sig_name}{i}" for i in range(cur_count)])
-            transcr.print_to_file(f"{role_sig_name} = {cur_role_elms}\n")
-        transcr.print_to_file(f"AttackerStrand = `AttackerStrand0\n")
+            transcr.emit(Eq(role_sig_name,cur_role_elms))
+        transcr.emit(Eq("AttackerStrand","`AttackerStrand0"))
         all_strands = " + ".join(list(role_sig_names.values()) + [ "AttackerStrand" ])
-        transcr.print_to_file(f"strand = {all_strands}\n")
+        transcr.emit(Eq("strand",all_strands))
+
+        for skel_num,skeleton in enumerate(transcr.instance_skeletons):
+            transcr.emit(Blank())
+            transcribe_skeleton_bounds(skeleton,skel_num,instance_bound,prot,transcr)
+        if transcr.symmetry_breaking:
+            transcr.emit(Blank())
+            transcribe_symmetry_bounds(instance_bound,prot,transcr)
 
@@ -5,15 +5,25 @@ from typing import List, Tuple, override
 from enum import Enum
 
 from type_and_helpers import *
+from forge_writer import ForgeWriter
+from forge_ir import *
+from profiling import Profiler
 
 
 class Transcribe_obj:
 
-    def __init__(self, file: io.TextIOWrapper) -> None:
+    def __init__(self, file: io.TextIOWrapper, direct_fd: bool = False) -> None:
         self.space_lvl = 0
         self.fresh_num = 0
         self.space_str = " " * 2
         self.file = file
+        self.writer = ForgeWriter(file, self.space_str, direct_fd=direct_fd)
+        self.ir = IRBuilder(self.writer)
+        # roles the skeletons and instances cannot reach, they keep their sig
+        # but their exec predicate only says there are no strands of them
+        self.dead_roles: List[str] = []
+        # phases of main_tuple.py --profile, each role is timed as its own phase
+        self.profiler = Profiler()
 
     def get_fresh_num(self):
         self.fresh_num += 1
@@ -26,33 +36,32 @@ class Transcribe_obj:
         self.space_lvl -= 1
 
     def print_to_file(self, txt, add_space=True):
+        if self.ir.is_open():
+            self.emit(Blank() if txt == "\n" else Raw(txt.removesuffix("\n")))
+            return
         if txt == "\n":
             add_space = False
-        if add_space:
-            print(self.space_lvl * self.space_str, end="", file=self.file)
-        print(txt, end="", file=self.file)
+        self.writer.write(txt, self.space_lvl if add_space else 0)
+
+    def emit(self, node: Node):
+        """adds node to the block being built, or prints it straight away
+        if it is a top level declaration"""
+        self.ir.emit(node, self.space_lvl)
 
     def import_file(self, other_forge_file: io.TextIOWrapper):
-        for line in other_forge_file:
-            self.print_to_file(line)
+        self.writer.write_file(other_forge_file, self.space_lvl)
+
+    def flush(self):
+        """writes out everything still buffered, has to be called once
+        transcription is done"""
+        self.writer.flush()
 
 #TODO: can change signature modifier to use an enum instead of a plain string
 # like below
     def write_sig(self, sig_name: str, parent_sig_name: None | str,
                   field_name_type: List[Tuple[str,
                                               str]], sig_modifier: str | None):
-        parent_sig_name = "" if parent_sig_name is None else f"extends {parent_sig_name} "
-        sig_modifier = "" if sig_modifier is None else sig_modifier + " "
-        self.print_to_file(
-            f"{sig_modifier}sig {sig_name} {parent_sig_name}{{\n")
-        self.start_block()
-        for field_name, field_type in field_name_type[:-1]:
-            self.print_to_file(f"{field_name} : {field_type},\n")
-        field_name, field_type = field_name_type[-1]
-        self.print_to_file(f"{field_name} : {field_type}\n")
-
-        self.end_block()
-        self.print_to_file("}\n")
+        self.emit(Sig(sig_name, parent_sig_name, field_name_type, sig_modifier))
 
     # def write_new_seq_constraint(self,seq_expr:str,seq_terms:List[NonCatTerm],send_recv:SendRecv,timeslot_expr:str,sig_context:"RoleOrSkelTranscrContext"):
     #     indices_str = "+".join([str(i) for i in range(len(seq_terms))])
@@ -124,10 +133,10 @@ class Transcribe_obj:
         seq_component_exprs = [f"({seq_expr})[{indx}]" for indx in range(len(seq_terms))]
 
         indices_str = "+".join([str(i) for i in range(len(seq_terms))])
-        self.print_to_file(f"inds[{seq_expr}] = {indices_str}\n")
+        self.emit(Eq(f"inds[{seq_expr}]", indices_str))
         with LetClauseContext(seq_component_names,seq_component_exprs,self):
             all_seq_components = " + ".join([f"{indx}->{comp_name}" for indx,comp_name in enumerate(seq_component_names)])
-            self.print_to_file(f"{seq_expr} = {all_seq_components}\n")
+            self.emit(Eq(seq_expr, all_seq_components))
             for comp_name,comp_term in zip(seq_component_names,seq_terms):
                 transcribe_msg(comp_name,comp_term,send_recv,timeslot_expr,sig_context)
 
@@ -175,12 +184,10 @@ class PredicateContext:
     transcr: Transcribe_obj
 
     def __enter__(self):
-        self.transcr.print_to_file(f"pred {self.pred_name} {{\n")
-        self.transcr.start_block()
+        self.transcr.ir.open_block(Pred(self.pred_name))
 
     def __exit__(self, exc_type, exc_value, traceback):
-        self.transcr.end_block()
-        self.transcr.print_to_file(f"}}\n")
+        self.transcr.ir.close_block(self.transcr.space_lvl)
 
 @dataclass
 class LetClauseContext:
@@ -191,26 +198,19 @@ class LetClauseContext:
     def __enter__(self):
         if len(self.var_name) != len(self.var_expression):
             raise ParseException("For let clause should have equal number of variable names and expressions")
-        for var_name,var_expression in zip(self.var_name,self.var_expression):
-            self.transcr.print_to_file(f"let {var_name}  = {var_expression} | {{\n")
-        self.transcr.start_block()
+        self.transcr.ir.open_block(Let(list(zip(self.var_name,self.var_expression))))
 
     def __exit__(self,exc_type,exc_value,traceback):
-        num_blocks = len(self.var_name)
-        close_str = "}" * num_blocks
-        self.transcr.end_block()
-        self.transcr.print_to_file(close_str + "\n")
+        self.transcr.ir.close_block(self.transcr.space_lvl)
 
 @dataclass
 class InstanceContext:
     instance_name:str
     transcr:Transcribe_obj
     def __enter__(self):
-        self.transcr.print_to_file(f"inst {self.instance_name} {{\n")
-        self.transcr.start_block()
+        self.transcr.ir.open_block(Inst(self.instance_name))
     def __exit__(self,exc_type,exc_value,traceback):
-        self.transcr.end_block()
-        self.transcr.print_to_file(f"}}\n")
+        self.transcr.ir.close_block(self.transcr.space_lvl)
 @dataclass
 class TimeslotContext:
     timeslot_names: List[str]
@@ -220,21 +220,13 @@ class TimeslotContext:
     def __enter__(self):
         cur_set = "Timeslot"
         for timeslot_name in self.timeslot_names:
-            self.transcr.print_to_file(f"some {timeslot_name} : {cur_set} {{\n")
-            if self.nested_indent:
-                self.transcr.start_block()
+            self.transcr.ir.open_block(Quant("some", [timeslot_name], cur_set,
+                                             bar=False, stacked=not self.nested_indent))
             cur_set = f"{timeslot_name}.(^next)"
-        if not self.nested_indent:
-            self.transcr.start_block()
 
     def __exit__(self,exc_type,exc_value,traceback):
-        if self.nested_indent:
-            for _ in self.timeslot_names:
-                self.transcr.end_block()
-                self.transcr.print_to_file(f"}}\n")
-        else:
-            self.transcr.end_block()
-            self.transcr.print_to_file("}"*len(self.timeslot_names)+"\n")
+        for _ in self.timeslot_names:
+            self.transcr.ir.close_block(self.transcr.space_lvl)
 @dataclass
 class QuantifierPredicate:
     quantifer_enum: QuantiferEnum
@@ -243,25 +235,19 @@ class QuantifierPredicate:
     transcr: Transcribe_obj
 
     def __enter__(self):
-        variables_str = ','.join(self.var_names)
-        self.transcr.print_to_file(
-            f"{self.quantifer_enum} {variables_str} : {self.set_name} | {{\n")
-        self.transcr.start_block()
+        self.transcr.ir.open_block(Quant(str(self.quantifer_enum), self.var_names, self.set_name))
 
     def __exit__(self, exc_type, exc_value, traceback):
-        self.transcr.end_block()
-        self.transcr.print_to_file(f"}}\n")
+        self.transcr.ir.close_block(self.transcr.space_lvl)
 
 @dataclass
 class ImpliesPredicate:
     pre_condition:str
     transcr: Transcribe_obj
     def __enter__(self):
-        self.transcr.print_to_file(f"{self.pre_condition} => {{\n")
-        self.transcr.start_block()
+        self.transcr.ir.open_block(Implies(self.pre_condition))
     def __exit__(self,exc_type,exc_value,traceback):
-        self.transcr.end_block()
-        self.transcr.print_to_file(f"}}\n")
+        self.transcr.ir.close_block(self.transcr.space_lvl)
 
 @dataclass
 class SigContext:
@@ -462,7 +448,7 @@ def transcribe_enc(elm_expr: str, enc_term: EncTerm,send_recv:SendRecv ,timeslot
             term_str = sig_context.get_inv_key(enc_term.key)
             match sig_context:
                 case RoleTranscribeContext(_):
-                    transcr.print_to_file(f"learnt_term_by[{term_str},{sig_context.role_var_name}.agent,{timeslot_expr}]\n")
+                    transcr.emit(Call("learnt_term_by",[term_str,f"{sig_context.role_var_name}.agent",timeslot_expr]))
                 case SkeletonTranscribeContext(_):
                     pass
     transcr.write_new_seq_constraint(data_expr,enc_term.data,send_recv,timeslot_expr,sig_context)
@@ -477,7 +463,7 @@ def transcribe_enc_no_tpl(elm_expr:str,enc_no_tpl:EncTermNoTpl,send_recv:SendRec
             term_str = sig_context.get_inv_key(enc_no_tpl.key)
             match sig_context:
                 case RoleTranscribeContext(_):
-                    transcr.print_to_file(f"learnt_term_by[{term_str},{sig_context.role_var_name}.agent,{timeslot_expr}]\n")
+                    transcr.emit(Call("learnt_term_by",[term_str,f"{sig_context.role_var_name}.agent",timeslot_expr]))
                 case SkeletonTranscribeContext(_):
                     pass
     data_expr = f"({elm_expr}).plaintext"
@@ -490,8 +476,7 @@ def transcribe_hash(elm_expr: str,hash_term:HashTerm,send_recv:SendRecv,timeslot
     transcribe_msg(hash_of_expr,hash_term.hash_of,send_recv,timeslot_expr,sig_context)
 
 def transcribe_base_term(elm_expr:str,msg:BaseTerm,send_recv:SendRecv,role_context:SigContext):
-    constraint_expr = f"{elm_expr} = {role_context.get_base_term_str(msg)}\n"
-    role_context.get_transcr().print_to_file(constraint_expr)
+    role_context.get_transcr().emit(Eq(elm_expr,role_context.get_base_term_str(msg)))
 
 def transcribe_cat(elm_expr:str,msg:CatTerm,send_recv:SendRecv,timeslot_expr:str,
                    role_context: RoleOrSkelTranscrContext):
@@ -522,9 +507,9 @@ def transcribe_indv_trace(role: Role, indx: int,
     role_var_name = role_context.role_var_name
     match send_recv:
         case SendRecv.SEND:
-            transcr.print_to_file(f"t{indx}.sender = {role_var_name}\n")
+            transcr.emit(Eq(f"t{indx}.sender",role_var_name))
         case SendRecv.RECV:
-            transcr.print_to_file(f"t{indx}.receiver = {role_var_name}\n")
+            transcr.emit(Eq(f"t{indx}.receiver",role_var_name))
 
     transcribe_msg(f"(t{indx}.data)",mesg,send_recv,f"t{indx}",role_context)
 
@@ -554,7 +539,7 @@ def transcribe_freshly_gen_constr(role:Role,role_context:RoleTranscribeContext):
 
     if len(freshly_gen_tuples_arr) != 0:
         freshly_gen_tuples = " + ".join(freshly_gen_tuples_arr)
-        role_context.transcr.print_to_file(f"({freshly_gen_tuples}) in ({role_context.get_agent()}).generated_times\n")
+        role_context.transcr.emit(In(f"({freshly_gen_tuples})",f"({role_context.get_agent()}).generated_times"))
 
 def transcribe_trace(role: Role, role_context: RoleTranscribeContext):
     trace_len = len(role.trace)
@@ -582,10 +567,10 @@ def transcribe_trace(role: Role, role_context: RoleTranscribeContext):
         transcribe_freshly_gen_constr(role,role_context)
         all_timeslots_set = "+".join(timeslot_names)
         role_var_name = role_context.role_var_name
-        transcr.print_to_file(f"{all_timeslots_set} = sender.{role_var_name} + receiver.{role_var_name}\n")
+        transcr.emit(Eq(all_timeslots_set,f"sender.{role_var_name} + receiver.{role_var_name}"))
         for i in range(len(role.trace)):
             transcribe_indv_trace(role,i,role_context)
-            role_context.get_transcr().print_to_file("\n")
+            role_context.get_transcr().emit(Blank())
 
     # for _ in timeslot_names:
     #     transcr.end_block()
@@ -610,6 +595,11 @@ def transcribe_role(role: Role, role_context: RoleTranscribeContext):
     transcr = role_context.transcr
     transcribe_role_to_sig(role, role_sig_name, transcr)
 
+    if role.role_name in transcr.dead_roles:
+        with PredicateContext(transcr=transcr, pred_name=f"exec_{role_sig_name}"):
+            transcr.emit(Raw(f"no {role_sig_name}"))
+        return
+
     with PredicateContext(transcr=transcr, pred_name=f"exec_{role_sig_name}"):
         with QuantifierPredicate(QuantiferEnum.ALL,
                                  [role_context.role_var_name], role_sig_name,
@@ -622,12 +612,13 @@ def transcribe_protocol(protocol: Protocol, transcr: Transcribe_obj):
     """Function to transcribe the protocol object returned by the parser
     contains nested functions to parse sub components like roles,signatures"""
     for role in protocol.role_arr:
-        transcribe_role(
-            role,
-            transcr.create_role_context(
-                role, protocol,
-                transcr.role_var_name_in_prot_pred(role.role_name,
-                                                   protocol.protocol_name)))
+        with transcr.profiler.phase(f"role {role.role_name}"):
+            transcribe_role(
+                role,
+                transcr.create_role_context(
+                    role, protocol,
+                    transcr.role_var_name_in_prot_pred(role.role_name,
+                                                       protocol.protocol_name)))
 
 
 def transcribe_skeleton_to_sig(skeleton: Skeleton,protocol:Protocol, skeleton_sig_name: str,
@@ -660,7 +651,7 @@ def transcribe_strand(strand: Strand,
                 strand_var.var_name)
             skeleton_var_str = skeleton_transcr_context.acess_variable(
                 skeleton_var_name)
-            transcr.print_to_file(f"{strand_var_str} = {skeleton_var_str}\n")
+            transcr.emit(Eq(strand_var_str,skeleton_var_str))
 
 
 #TODO: Can simplifly functions related to transcribing publick key privk and others since they are very small
@@ -671,9 +662,7 @@ def transcribe_non_orig(non_orig: NonOrig,
         base_term_str = skeleton_transcr_context.get_base_term_str(base_term)
         with QuantifierPredicate(QuantiferEnum.NO, ["aStrand"], "strand",
                                  transcr):
-            transcr.print_to_file(
-                f"originates[aStrand,{base_term_str}] or generates [aStrand,{base_term_str}]\n"
-            )
+            transcr.emit(Raw(f"originates[aStrand,{base_term_str}] or generates [aStrand,{base_term_str}]"))
 
 def transcribe_uniq_orig(uniq_orig: UniqOrig,
                          skeleton_transcr_context: RoleOrSkelTranscrContext):
@@ -684,13 +673,11 @@ def transcribe_uniq_orig(uniq_orig: UniqOrig,
             case SkeletonTranscribeContext(_):
                 with QuantifierPredicate(QuantiferEnum.ONE, ["aStrand"], "strand",
                                          transcr):
-                    transcr.print_to_file(
-                        f"originates[aStrand,{base_term_str}] or generates [aStrand,{base_term_str}]\n"
-                    )
+                    transcr.emit(Raw(f"originates[aStrand,{base_term_str}] or generates [aStrand,{base_term_str}]"))
             case RoleTranscribeContext(_) as role_transcr:
                 #TODO: modify uniq-orig to only take in terms that can be generated
                 strand_name = role_transcr.get_agent()
-                transcr.print_to_file(f"(generated_times.Timeslot).({base_term_str}) = {strand_name}\n")
+                transcr.emit(Eq(f"(generated_times.Timeslot).({base_term_str})",strand_name))
                 # with QuantifierPredicate(QuantiferEnum.ONE, ["aStrand"], "strand",
                 #                          transcr):
                 #     transcr.print_to_file(
@@ -702,7 +689,7 @@ def transcribe_not_eq(not_eq:NotEqConstraint,
     transcr = skeleton_transcr_context.transcr
     term1_str = skeleton_transcr_context.get_base_term_str(not_eq.term1)
     term2_str = skeleton_transcr_context.get_base_term_str(not_eq.term2)
-    transcr.print_to_file(f"{term1_str} != {term2_str}\n")
+    transcr.emit(NotEq(term1_str,term2_str))
 
 def transcribe_indv_trace_constraint(skeleton:Skeleton,indv_trace_constraint:IndvSendRecvInConstraint,timeslot_name:str,transcr:Transcribe_obj,skel_transcr_context:SkeletonTranscribeContext):
     send_recv = indv_trace_constraint.trace_type
@@ -710,9 +697,9 @@ def transcribe_indv_trace_constraint(skeleton:Skeleton,indv_trace_constraint:Ind
     message = indv_trace_constraint.message
     match send_recv:
         case SendRecv.SEND:
-            transcr.print_to_file(f"{timeslot_name}.sender = {skel_transcr_context.acess_variable(send_recv_strand)}\n")
+            transcr.emit(Eq(f"{timeslot_name}.sender",skel_transcr_context.acess_variable(send_recv_strand)))
         case SendRecv.RECV:
-            transcr.print_to_file(f"{timeslot_name}.receiver = {skel_transcr_context.acess_variable(send_recv_strand)}\n")
+            transcr.emit(Eq(f"{timeslot_name}.receiver",skel_transcr_context.acess_variable(send_recv_strand)))
     data_in_timeslot = None
     match message:
         case CatTerm(data):
@@ -736,7 +723,7 @@ def transcribe_trace_constraint(trace_constraint:TraceConstraint,
             for timeslot_name,indv_trace_constraint in zip(timeslot_names,indv_trace_constraints):
                 transcribe_indv_trace_constraint(skeleton,indv_trace_constraint,
                                                  timeslot_name,transcr,skel_transcr_context)
-                transcr.print_to_file("\n")
+                transcr.emit(Blank())
 
     return trace_pred_name
 def transcribe_skeleton_to_predicate(skeleton: Skeleton, skel_num: int,
@@ -783,7 +770,7 @@ def transcribe_skeleton_to_predicate(skeleton: Skeleton, skel_num: int,
                     transcribe_not_eq(not_eq,skel_transcr_context)
 
         for trace_pred_name in trace_pred_names:
-            transcr.print_to_file(trace_pred_name + "\n")
+            transcr.emit(Call(trace_pred_name))
 
 
 def transcribe_skeleton(skeleton: Skeleton, protocol: Protocol,
@@ -800,7 +787,7 @@ def write_bound_expressions(cur_node:str,instance_bound:AltInstanceBounds,transc
     cur_count = instance_counts[cur_node]
     if cur_count == 0:
         #temp fix to work with model without sig Hashed
-        transcr.print_to_file(f"no {cur_node}\n")
+        transcr.emit(Raw(f"no {cur_node}"))
         return
     if cur_node in alt_subtypes:
         cur_node_subs = alt_subtypes[cur_node]
@@ -809,43 +796,43 @@ def write_bound_expressions(cur_node:str,instance_bound:AltInstanceBounds,transc
         non_zero_count_subtype = list(filter(lambda sub: (instance_counts[sub] != 0),cur_node_subs))
         if cur_node in subtypes_are_exhaustive:
             subtype_sigs = " + ".join(non_zero_count_subtype)
-            transcr.print_to_file(f"{cur_node} = {subtype_sigs}\n")
+            transcr.emit(Eq(cur_node,subtype_sigs))
         else:
             child_sigs = non_zero_count_subtype
             total_child_elms = sum([instance_counts[child] for child in child_sigs])
             extra_no_elms = instance_counts[cur_node] - total_child_elms
             extra_elms = [f"`{cur_node}{indx}" for indx in range(extra_no_elms)]
             total_elms = " + ".join(extra_elms + child_sigs)
-            transcr.print_to_file(f"{cur_node} = {total_elms}\n")
+            transcr.emit(Eq(cur_node,total_elms))
     else:
         sig_elements = " + ".join([f"`{cur_node}{indx}" for indx in range(instance_counts[cur_node])])
-        transcr.print_to_file(f"{cur_node} = {sig_elements}\n")
+        transcr.emit(Eq(cur_node,sig_elements))
 
 def transcribe_instance(instance_bound:AltInstanceBounds,prot:Protocol,transcr:Transcribe_obj):
     def comps_rel_bound(sig_counts:Dict[str,int]):
         possible_seq_len = "+".join([str(i) for i in range(instance_bound.tuple_length)])
-        transcr.print_to_file(f"components in tuple -> ({possible_seq_len}) -> (Key + name + text + Ciphertext + tuple + Hashed)\n")
-        transcr.print_to_file(f"KeyPairs = `KeyPairs0\n")
+        transcr.emit(In("components",f"tuple -> ({possible_seq_len}) -> (Key + name + text + Ciphertext + tuple + Hashed)"))
+        transcr.emit(Eq("KeyPairs","`KeyPairs0"))
     def microtick_bound(sig_counts:Dict[str,int]):
         microtick_bound = instance_bound.encryption_depth + 1
         microtick_instances = " + ".join([f"`{MICROTICK_SIG}{i}" for i in range(microtick_bound)])
-        transcr.print_to_file(f"{MICROTICK_SIG} = {microtick_instances}\n")
+        transcr.emit(Eq(MICROTICK_SIG,microtick_instances))
     def akey_bound(sig_counts:Dict[str,int]):
         pubk_count,privk_count,name_count = sig_counts[PUBK_SIG],sig_counts[PRIVK_SIG],sig_counts[NAME_SIG]
         if pubk_count == privk_count and privk_count == 0:
-            transcr.print_to_file(f"no {PUBK_SIG}\n")
-            transcr.print_to_file(f"no {PRIVK_SIG}\n")
+            transcr.emit(Raw(f"no {PUBK_SIG}"))
+            transcr.emit(Raw(f"no {PRIVK_SIG}"))
         elif pubk_count != name_count or privk_count != name_count or pubk_count != privk_count:
             raise ParseException(f"Only dealing with cases where pubk,privk zero or pubk,privk and name bounds all the same")
         else:
             pubk_privk_tpls = " + ".join([f"`{PRIVK_SIG}{i}->`{PUBK_SIG}{i}" for i in range(pubk_count)])
-            transcr.print_to_file(f"pairs = KeyPairs -> ({pubk_privk_tpls})\n")
+            transcr.emit(Eq("pairs",f"KeyPairs -> ({pubk_privk_tpls})"))
 
             key_owner_tpls = " + ".join([f"`{PRIVK_SIG}{i}->`name{i}" for i in range(name_count-1)] + [f"`{PRIVK_SIG}{name_count-1}->`Attacker0"])
-            transcr.print_to_file(f"owners = KeyPairs -> ({key_owner_tpls})\n")
+            transcr.emit(Eq("owners",f"KeyPairs -> ({key_owner_tpls})"))
         if not instance_bound.have_ltks:
-            transcr.print_to_file(f"no ltks\n")
-        transcr.print_to_file("\n")
+            transcr.emit(Raw("no ltks"))
+        transcr.emit(Blank())
     def ltk_bound(sig_counts:Dict[str,int]):
         if instance_bound.have_ltks:
             name_count,skey_count = sig_counts[NAME_SIG],sig_counts[SKEY_SIG]
@@ -862,7 +849,7 @@ def transcribe_instance(instance_bound:AltInstanceBounds,prot:Protocol,transcr:T
                     ltk_tpls.append(f"{name1}->{name2}->`skey{skey_indx}")
                     skey_indx += 1
             ltk_rel_elms = " + ".join(ltk_tpls)
-            transcr.print_to_file(f"`KeyPairs0.ltks = {ltk_rel_elms}\n")
+            transcr.emit(Eq("`KeyPairs0.ltks",ltk_rel_elms))
     def inv_key_bound(sig_counts:Dict[str,int]):
         pubk_count,privk_count,skey_count = sig_counts[PUBK_SIG],sig_counts[PRIVK_SIG],sig_counts[SKEY_SIG]
         if pubk_count != privk_count:
@@ -871,38 +858,41 @@ def transcribe_instance(instance_bound:AltInstanceBounds,prot:Protocol,transcr:T
         pubk_privk_tpls = [f"`{PUBK_SIG}{i}->`{PRIVK_SIG}{i} + `{PRIVK_SIG}{i}->`{PUBK_SIG}{i}" for i in range(pubk_count)]
         skey_tpls = [f"`{SKEY_SIG}{i}->`{SKEY_SIG}{i}" for i in range(skey_count)]
         key_tpls = " + ".join(pubk_privk_tpls + skey_tpls)
-        transcr.print_to_file(f"`KeyPairs0.inv_key_helper = {key_tpls}\n")
+        transcr.emit(Eq("`KeyPairs0.inv_key_helper",key_tpls))
     def next_rels_bound(sig_counts:Dict[str,int]):
         microtick_bound = instance_bound.encryption_depth + 1
         num_timeslots = sig_counts[TIMESLOT_SIG]
         time_next_tpls = " + ".join([f"`{TIMESLOT_SIG}{indx}->`{TIMESLOT_SIG}{indx+1}" for indx in range(num_timeslots-1)])
-        transcr.print_to_file(f"next = {time_next_tpls}\n")
+        transcr.emit(Eq("next",time_next_tpls))
         #mt_next relation on microticks
         microtick_next_tpls = " + ".join([f"`{MICROTICK_SIG}{indx} -> `{MICROTICK_SIG}{indx+1}" for indx in range(microtick_bound - 1)])
-        transcr.print_to_file(f"mt_next = {microtick_next_tpls}\n")
-        transcr.print_to_file("\n")
+        transcr.emit(Eq("mt_next",microtick_next_tpls))
+        transcr.emit(Blank())
 
-        transcr.print_to_file(f"generated_times in name -> (Key + text) -> Timeslot\n")
+        transcr.emit(In("generated_times","name -> (Key + text) -> Timeslot"))
     def strand_bounds():
         role_sig_names = {role.role_name: get_role_sig_name(role,prot) for role in prot.role_arr}
         for role_name,role_sig_name in role_sig_names.items():
             cur_count = instance_bound.role_counts[role_name]
+            if cur_count == 0:
+                transcr.emit(Raw(f"no {role_sig_name}"))
+                continue
             cur_role_elms = " + ".join([f"`{role_sig_name}{i}" for i in range(cur_count)])
-            transcr.print_to_file(f"{role_sig_name} = {cur_role_elms}\n")
-        transcr.print_to_file(f"AttackerStrand = `AttackerStrand0\n")
+            transcr.emit(Eq(role_sig_name,cur_role_elms))
+        transcr.emit(Eq("AttackerStrand","`AttackerStrand0"))
         all_strands = " + ".join(list(role_sig_names.values()) + [ "AttackerStrand" ])
-        transcr.print_to_file(f"strand = {all_strands}\n")
+        transcr.emit(Eq("strand",all_strands))
 
     def hashed_bounds(sig_counts:Dict[str,int]):
         hash_count = sig_counts[HASH_SIG]
         #protocols being modeled at the moment are only really hashing texts
-        transcr.print_to_file(f"hash_of in Hashed -> text\n")
+        transcr.emit(In("hash_of","Hashed -> text"))
 
     with InstanceContext(instance_bound.instance_name,transcr):
         write_bound_expressions(MESG_SIG,instance_bound,transcr)
-        transcr.print_to_file("\n")
+        transcr.emit(Blank())
         write_bound_expressions(TIMESLOT_SIG,instance_bound,transcr)
-        transcr.print_to_file("\n")
+        transcr.emit(Blank())
 
         #write depth bound for plaintext
         #set values for pairs and owners relation
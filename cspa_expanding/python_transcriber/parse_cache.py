@@ -0,0 +1,134 @@
+import hashlib
+import io
+import os
+import pickle
+import tempfile
+from functools import cache
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence, Tuple, TypeVar
+
+import sexpdata
+
+import parser
+import sexp_reader
+from profiling import Profiler
+from sexp_reader import SourceForm
+from type_and_helpers import DEF_PROT_STR, ParseException, Protocol, get_str_from_symbol
+
+# bump when the layout of the cache entries changes, changes to the parser
+# itself are picked up through parser_version
+PARSE_CACHE_VERSION = 1
+PARSER_SOURCE_FILES = ["parser.py", "type_and_helpers.py"]
+
+T = TypeVar("T")
+
+
+@cache
+def parser_version() -> str:
+    """hash of the parser sources so that cached Protocol/Skeleton objects are
+    invalidated whenever the parser or the classes it builds change"""
+    hasher = hashlib.sha256()
+    script_path = Path(__file__).parent
+    for file_name in PARSER_SOURCE_FILES:
+        hasher.update((script_path / file_name).read_bytes())
+    return hasher.hexdigest()
+
+
+class ParseCache:
+    """directory of pickled parse results keyed by the source text of the
+    top level form (and the forms it depends on) plus the parser version"""
+
+    def __init__(self, cache_dir: str | Path) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    def key_for(self, parse_func_name: str, form: SourceForm,
+                depends_on: Sequence[SourceForm]) -> str:
+        hasher = hashlib.sha256()
+        for part in [str(PARSE_CACHE_VERSION), parser_version(), parse_func_name,
+                     form.text] + [dep.text for dep in depends_on]:
+            hasher.update(part.encode())
+            hasher.update(b"\0")
+        return hasher.hexdigest()
+
+    def entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.pickle"
+
+    def load(self, key: str):
+        """returns the cached object or None if missing or unreadable"""
+        try:
+            with open(self.entry_path(key), "rb") as entry_file:
+                return pickle.load(entry_file)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return None
+
+    def store(self, key: str, obj) -> None:
+        """writes to a temporary file first so concurrent runs sharing the
+        cache directory never see a partially written entry"""
+        path = self.entry_path(key)
+        path.parent.mkdir(exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                pickle.dump(obj, tmp_file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def parse(self, form: SourceForm, parse_func: Callable[..., T], *args,
+              depends_on: Sequence[SourceForm] = ()) -> T:
+        key = self.key_for(parse_func.__name__, form, depends_on)
+        result = self.load(key)
+        if result is not None:
+            self.hits += 1
+            return result
+        self.misses += 1
+        result = parse_func(form.s_expr, *args)
+        self.store(key, result)
+        return result
+
+
+def parse_form(parse_cache: ParseCache | None, form: SourceForm,
+               parse_func: Callable[..., T], *args,
+               depends_on: Sequence[SourceForm] = ()) -> T:
+    """calls parse_func(form.s_expr,*args) going through parse_cache if one is
+    given, depends_on lists the forms whose text the result also depends on
+    (the defprotocol for skeletons and instances)"""
+    if parse_cache is None:
+        return parse_func(form.s_expr, *args)
+    return parse_cache.parse(form, parse_func, *args, depends_on=depends_on)
+
+
+def parse_cpsa_file(cpsa_file: io.TextIOBase, parse_cache: ParseCache | None, profiler: Profiler,
+                    clause_parsers: Dict[str, Callable]) -> Tuple[Protocol, List]:
+    """the protocol of a CPSA file and the parsed forms after it in order,
+    clause_parsers maps the clause types allowed after the defprotocol to
+    their parse function"""
+    if profiler.enabled:
+        # reading and splitting are only done up front to time them apart,
+        # otherwise forms are read one at a time as they are parsed
+        with profiler.phase("read"):
+            cpsa_txt = cpsa_file.read()
+        with profiler.phase("sexp_parse"):
+            forms = iter(list(sexp_reader.load_cspa_source_forms(io.StringIO(cpsa_txt))))
+    else:
+        forms = sexp_reader.load_cspa_source_forms(cpsa_file)
+    prot_form = next(forms, None)
+    if prot_form is None:
+        raise ParseException(f"Expected {DEF_PROT_STR} clause at the start of the file")
+    with profiler.phase("ast"):
+        protocol = parse_form(parse_cache, prot_form, parser.parse_protocol)
+        clauses = []
+        for form in forms:
+            s_expr = form.s_expr
+            if type(s_expr) == sexpdata.Symbol:
+                raise ParseException(f"Expected one of {' '.join(clause_parsers)} clauses not simple string {s_expr}")
+            clause_type = get_str_from_symbol(s_expr[0], "/".join(clause_parsers))
+            if clause_type not in clause_parsers:
+                raise ParseException(f"Expected one of {' '.join(clause_parsers)} not {clause_type}")
+            clauses.append(parse_form(parse_cache, form, clause_parsers[clause_type], protocol,
+                                      depends_on=[prot_form]))
+    return protocol, clauses
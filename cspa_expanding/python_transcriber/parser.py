@@ -4,28 +4,6 @@ from functools import reduce
 import sexpdata
 
 
-def get_root_s_expr_lst(txt: str):
-    """the sexpdata library can only parse one s-expr by itself,multiple
-    s-expr must be present as an array or similar,hence this adds a wrapper
-    around that to find all s-expr"""
-    brkt_count = 0
-    brkt_started = False
-    prev_indx = 0
-    strs_so_far = []
-    for indx, chr in enumerate(txt):
-        if chr == '(':
-            brkt_count += 1
-            brkt_started = True
-        elif chr == ')':
-            brkt_count = brkt_count - 1
-        if brkt_count == 0 and brkt_started:
-            cur_s_expr_str = txt[prev_indx:(indx + 1)]
-            prev_indx = indx + 1
-            brkt_started = False
-            strs_so_far.append(cur_s_expr_str)
-    return strs_so_far
-
-
 def parse_vars_list(s_expr, var_map: VarMap) -> None:
     """this functions parses a list of variables parses expressions
     like (a b name) found inside a vars clause"""
@@ -36,7 +14,7 @@ def parse_vars_list(s_expr, var_map: VarMap) -> None:
     data_type = str_to_vartype(data_type_str)
     for elm in s_expr[:-1]:
         cur_var_str = get_str_from_symbol(elm, "variable name")
-        cur_var = Variable(cur_var_str, data_type)
+        cur_var = make_term(Variable, cur_var_str, data_type)
         if cur_var_str in var_map:
             raise ParseException(f"Repeated variable name {cur_var_str}")
         var_map[cur_var_str] = cur_var
@@ -67,7 +45,7 @@ def parse_skeleton_vars_list(s_expr,role_obj_types:List[str],non_strand_var_map:
         raise ParseException(f"Expected variable type to be msg_data like {msg_data_types} or strand types {role_obj_types} not {data_type}")
     for variable_name in variable_names:
         if is_msg_data:
-            non_strand_var_map[variable_name] = Variable(variable_name,str_to_vartype(data_type))
+            non_strand_var_map[variable_name] = make_term(Variable,variable_name,str_to_vartype(data_type))
         else:
             strand_var_map[variable_name] = data_type
 
@@ -109,9 +87,9 @@ def parse_key_term(s_expr, var_map: VarMap) -> KeyTerm:
         agent_name = get_str_from_symbol(s_expr[1], "agent name")
         get_var(agent_name, var_map)
         if key_category == PUBK_STR:
-            return PubkTerm(agent_name=agent_name)
+            return make_term(PubkTerm, agent_name)
         else:
-            return PrivkTerm(agent_name=agent_name)
+            return make_term(PrivkTerm, agent_name)
     elif key_category == LTK_STR:
         if len(s_expr) != 3:
             raise ParseException(
@@ -121,7 +99,7 @@ def parse_key_term(s_expr, var_map: VarMap) -> KeyTerm:
         get_var(agent1_name, var_map)
         agent2_name = get_str_from_symbol(s_expr[2], "agent name")
         get_var(agent2_name, var_map)
-        return LtkTerm(agent1_name=agent1_name, agent2_name=agent2_name)
+        return make_term(LtkTerm, agent1_name, agent2_name)
     else:
         raise ParseException(
             f"Unrecognised key category {key_category} in {s_expr}")
@@ -145,7 +123,7 @@ def parse_seq_term(s_expr,var_dict:VarMap) -> Message:
                 non_cat_data.append(msg_subterm)
             case _:
                 raise ParseException(f"Expected EncTerm,LtkTerm,PubkTerm,PrivkTermf or seq not {msg_subterm}")
-    return SeqTerm(non_cat_data)
+    return make_term(SeqTerm, non_cat_data)
 
 def parse_hash_term(s_expr,var_dict:VarMap) -> Message:
     if len(s_expr) != 2:
@@ -157,7 +135,7 @@ def parse_hash_term(s_expr,var_dict:VarMap) -> Message:
         case CatTerm(_):
             raise ParseException(f"Currently cannot have CatTerm inside hash term here yet")
         case _:
-            return HashTerm(hash_of)
+            return make_term(HashTerm, hash_of)
 
 def parse_message_term(s_expr, var_dict: VarMap) -> Message:
     if is_symbol_type(s_expr):
@@ -185,14 +163,14 @@ def parse_message_term(s_expr, var_dict: VarMap) -> Message:
             for subterm_sexpr in s_expr[1:-1]
         ]
         key = parse_key_term(s_expr[-1], var_dict)
-        return EncTerm(data, key=key)
+        return make_term(EncTerm, data, key)
     elif message_category == ENC_NO_TPL_STR:
         if len(s_expr) != 3:
             raise ParseException(f"Expected exaclty 3 terms for the s-expression enc_no_tpl,variable name,key but ength is {len(s_expr)}")
 
         contents = parse_message_term(s_expr[1],var_dict)
         key = parse_key_term(s_expr[2],var_dict)
-        return EncTermNoTpl(contents,key)
+        return make_term(EncTermNoTpl, contents, key)
     elif message_category == CAT_STR:
         if len(s_expr) < 2:
             raise ParseException(f"Cannot have empty message")
@@ -200,7 +178,7 @@ def parse_message_term(s_expr, var_dict: VarMap) -> Message:
             parse_message_term(subterm_sexp, var_dict)
             for subterm_sexp in s_expr[1:]
         ]
-        return CatTerm(data)
+        return make_term(CatTerm, data)
     elif message_category == SEQ_STR:
         return parse_seq_term(s_expr,var_dict)
     elif message_category == HASH_STR:
@@ -392,7 +370,7 @@ def var_in_msg_term(variable:Variable,msg_term:Message) -> bool:
         case Variable(_) as var:
             return variable == var
         case EncTerm(_) as enc:
-            return reduce(func_or,map(var_in_msg_lam,enc.data + [enc.key]))
+            return reduce(func_or,map(var_in_msg_lam,[*enc.data,enc.key]))
         case EncTermNoTpl(_) as enc_no_tpl:
             return enc_no_tpl.data == variable
         case CatTerm(_) as cat:
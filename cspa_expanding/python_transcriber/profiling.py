@@ -0,0 +1,120 @@
+import cProfile
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import List
+
+# Wall time and peak traced memory of the phases of one transcription, kept as
+# a tree so the time of every role, skeleton and instance shows up under the
+# phase it belongs to. A disabled profiler costs one attribute lookup per
+# phase, so the transcribers always go through one.
+
+
+@dataclass
+class PhaseRecord:
+    name: str
+    seconds: float = 0.0
+    # highest memory traced by tracemalloc at any point during the phase
+    peak_kb: float = 0.0
+    # a phase entered more than once under the same parent is added up
+    calls: int = 0
+    children: List["PhaseRecord"] = field(default_factory=list)
+
+    def child(self, name: str) -> "PhaseRecord":
+        for record in self.children:
+            if record.name == name:
+                return record
+        record = PhaseRecord(name)
+        self.children.append(record)
+        return record
+
+
+@dataclass
+class OpenPhase:
+    record: PhaseRecord
+    start: float
+    # peak of the finished parts of the phase, tracemalloc only keeps one
+    # peak so it is reset whenever a nested phase starts
+    peak_bytes: int = 0
+
+
+class Profiler:
+    """times nested phases with phase(name), start and finish wrap the whole
+    run. With a cprofile_path the run is also profiled by cProfile and the
+    stats are dumped there"""
+
+    def __init__(self, enabled: bool = False, cprofile_path: str | None = None) -> None:
+        self.enabled = enabled
+        self.cprofile_path = cprofile_path
+        self.root = PhaseRecord("total")
+        self.open_phases: List[OpenPhase] = []
+        self.started_tracing = False
+        self.cprofile: cProfile.Profile | None = None
+
+    def start(self) -> None:
+        if self.cprofile_path is not None:
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+        if not self.enabled:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+        self.enter(self.root)
+
+    def finish(self) -> None:
+        if self.enabled:
+            self.exit()
+            if self.started_tracing:
+                tracemalloc.stop()
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            self.cprofile.dump_stats(self.cprofile_path)
+
+    @contextmanager
+    def running(self):
+        """start and finish around a whole run, also when it raises so no
+        tracing or cProfile is left on in the process"""
+        self.start()
+        try:
+            yield
+        finally:
+            self.finish()
+
+    def enter(self, record: PhaseRecord) -> None:
+        if len(self.open_phases) != 0:
+            _, peak = tracemalloc.get_traced_memory()
+            parent = self.open_phases[-1]
+            parent.peak_bytes = max(parent.peak_bytes, peak)
+        tracemalloc.reset_peak()
+        self.open_phases.append(OpenPhase(record, time.perf_counter()))
+
+    def exit(self) -> None:
+        open_phase = self.open_phases.pop()
+        _, peak = tracemalloc.get_traced_memory()
+        peak = max(open_phase.peak_bytes, peak)
+        record = open_phase.record
+        record.seconds += time.perf_counter() - open_phase.start
+        record.peak_kb = max(record.peak_kb, peak / 1024)
+        record.calls += 1
+        if len(self.open_phases) != 0:
+            parent = self.open_phases[-1]
+            parent.peak_bytes = max(parent.peak_bytes, peak)
+
+    @contextmanager
+    def phase(self, name: str):
+        if not self.enabled or len(self.open_phases) == 0:
+            yield
+            return
+        self.enter(self.open_phases[-1].record.child(name))
+        try:
+            yield
+        finally:
+            self.exit()
+
+    def write_report(self, report_path: str | Path) -> None:
+        with open(report_path, "w") as report_file:
+            json.dump(asdict(self.root), report_file, indent=2)
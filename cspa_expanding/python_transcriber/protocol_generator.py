@@ -0,0 +1,174 @@
+import argparse
+import io
+from dataclasses import dataclass, fields
+from typing import Dict, List
+
+import parser
+import scope_inference
+import scope_sweep
+import sexp_reader
+
+# Writes synthetic CPSA protocols whose size is set by a handful of knobs, so
+# transcription time, spec size and solver time can be measured along each of
+# them. The roles form a ring: on even steps a role sends to the next role,
+# on odd steps it receives what the previous role sent one step earlier, so
+# every receive matches a send and an honest run exists. Nonce j belongs to
+# role j mod roles, a role only sends its own nonces and the ones it received,
+# so each nonce has one originator and can be uniq-orig. With an instance every
+# key is a public key since definstance bounds have no ltks.
+
+
+@dataclass
+class GeneratorParams:
+    roles: int = 2
+    trace_length: int = 2
+    enc_depth: int = 1
+    tuple_width: int = 2
+    nonces: int = 2
+    skeleton_constraints: int = 3
+    with_instance: bool = False
+
+    def protocol_name(self) -> str:
+        return (f"gen_r{self.roles}_t{self.trace_length}_d{self.enc_depth}_w{self.tuple_width}"
+                f"_n{self.nonces}_c{self.skeleton_constraints}")
+
+    def validate(self) -> None:
+        for param_name in ["roles", "tuple_width", "nonces", "skeleton_constraints"]:
+            if getattr(self, param_name) < 1:
+                raise ValueError(f"{param_name} has to be at least 1 not {getattr(self, param_name)}")
+        # parse_trace wants at least two events
+        if self.trace_length < 2:
+            raise ValueError(f"trace_length has to be at least 2 not {self.trace_length}")
+        if self.enc_depth < 0:
+            raise ValueError(f"enc_depth can not be negative, got {self.enc_depth}")
+
+
+def participant(role_indx: int) -> str:
+    return f"p{role_indx}"
+
+
+def nonce(nonce_indx: int) -> str:
+    return f"n{nonce_indx}"
+
+
+def sent_items(params: GeneratorParams) -> List[Dict[int, List[str]]]:
+    """role -> step -> the tuple_width atoms the role sends at that step, taken
+    round robin from its own nonces, the nonces it received so far and the
+    participants"""
+    sent: List[Dict[int, List[str]]] = [{} for _ in range(params.roles)]
+    for step in range(0, params.trace_length, 2):
+        for role_indx in range(params.roles):
+            # what the previous role sent on earlier steps has been received
+            received = [item for prev_step, prev_items in sent[(role_indx - 1) % params.roles].items()
+                        if prev_step < step for item in prev_items]
+            atoms = ([nonce(indx) for indx in range(params.nonces)
+                      if indx % params.roles == role_indx or nonce(indx) in received] +
+                     [participant(indx) for indx in range(params.roles)])
+            sent[role_indx][step] = [atoms[(role_indx + step + indx) % len(atoms)]
+                                     for indx in range(params.tuple_width)]
+    return sent
+
+
+def message(params: GeneratorParams, items: List[str], sender: int) -> str:
+    """what role sender sends with items wrapped in enc_depth encryptions. The
+    innermost and every other level use the long term key of sender and
+    receiver, the rest the public key of the receiver. With an instance every
+    level uses the public key"""
+    receiver = (sender + 1) % params.roles
+    if params.enc_depth == 0:
+        return items[0] if len(items) == 1 else f"(cat {' '.join(items)})"
+    msg_txt = " ".join(items)
+    for level in range(params.enc_depth):
+        key = (f"(ltk {participant(sender)} {participant(receiver)})" if level % 2 == 0 and not params.with_instance
+               else f"(pubk {participant(receiver)})")
+        msg_txt = f"(enc {msg_txt} {key})"
+        # every outer encryption carries one more atom next to the inner one
+        if level != params.enc_depth - 1:
+            msg_txt = f"{msg_txt} {items[level % len(items)]}"
+    return msg_txt
+
+
+def vars_decl(params: GeneratorParams) -> str:
+    names = " ".join([participant(indx) for indx in range(params.roles)])
+    texts = " ".join([nonce(indx) for indx in range(params.nonces)])
+    return f"(vars ({names} name) ({texts} text))"
+
+
+def role_name(role_indx: int) -> str:
+    return f"R{role_indx}"
+
+
+def role_txt(params: GeneratorParams, sent: List[Dict[int, List[str]]], role_indx: int) -> str:
+    sender = (role_indx - 1) % params.roles
+    events = []
+    for step in range(params.trace_length):
+        if step % 2 == 0:
+            events.append(f"(send {message(params, sent[role_indx][step], role_indx)})")
+        else:
+            events.append(f"(recv {message(params, sent[sender][step - 1], sender)})")
+    events_txt = "\n            ".join(events)
+    return (f"    (defrole {role_name(role_indx)}\n"
+            f"        {vars_decl(params)}\n"
+            f"        (trace\n            {events_txt}\n        )\n    )")
+
+
+def skeleton_constraints(params: GeneratorParams, sent: List[Dict[int, List[str]]]) -> List[str]:
+    """skeleton_constraints clauses, the first always fixes a full strand of
+    the first role. The rest go round robin through uniq-orig nonces,
+    non-orig keys and strands of the other roles and repeat once those run
+    out. Only nonces that are sent at all are uniq-orig, their owner is the
+    one role originating them"""
+    var_bindings = " ".join([f"({var} {var})" for var in
+                             [participant(indx) for indx in range(params.roles)] +
+                             [nonce(indx) for indx in range(params.nonces)]])
+    strands = [f"(defstrand {role_name(indx)} {params.trace_length} {var_bindings})" for indx in range(params.roles)]
+    sent_atoms = {item for role_sent in sent for items in role_sent.values() for item in items}
+    uniq_nonces = [nonce(indx) for indx in range(params.nonces) if nonce(indx) in sent_atoms]
+    ltk_keys = [] if params.with_instance else [
+        f"(non-orig (ltk {participant(indx)} {participant((indx + 1) % params.roles)}))"
+        for indx in range(params.roles)]
+    pool = ([f"(uniq-orig {nonce_name})" for nonce_name in uniq_nonces] +
+            [f"(non-orig (privk {participant(indx)}))" for indx in range(params.roles)] +
+            ltk_keys + strands[1:])
+    return [strands[0]] + [pool[indx % len(pool)] for indx in range(params.skeleton_constraints - 1)]
+
+
+def generate_protocol(params: GeneratorParams) -> str:
+    """full CPSA file text, with a definstance of the smallest bounds for an
+    honest run when params.with_instance is set"""
+    params.validate()
+    prot_name = params.protocol_name()
+    sent = sent_items(params)
+    roles_txt = "\n".join([role_txt(params, sent, role_indx) for role_indx in range(params.roles)])
+    constraints_txt = "\n    ".join(skeleton_constraints(params, sent))
+    txt = (f"#lang forge/domains/crypto\n"
+           f"(defprotocol {prot_name} basic\n{roles_txt}\n)\n"
+           f"(defskeleton {prot_name}\n    {vars_decl(params)}\n    {constraints_txt}\n)\n")
+    if params.with_instance:
+        forms = list(sexp_reader.load_cspa_forms(io.StringIO(txt)))
+        protocol = parser.parse_protocol(forms[0])
+        skeleton = parser.parse_skeleton(forms[1], protocol)
+        instance = scope_inference.infer_instance(f"{prot_name}_bounds", protocol, [skeleton])
+        txt += scope_sweep.instance_to_cpsa(instance) + "\n"
+    return txt
+
+
+if __name__ == "__main__":
+    argument_parser = argparse.ArgumentParser(
+        prog="protocol_generator",
+        description="write a synthetic CPSA protocol of a given size")
+    defaults = GeneratorParams()
+    for param in fields(GeneratorParams):
+        if param.type == bool or param.type == "bool":
+            argument_parser.add_argument(f"--{param.name}", action='store_true')
+        else:
+            argument_parser.add_argument(f"--{param.name}", type=int, default=getattr(defaults, param.name))
+    argument_parser.add_argument("--output", type=str, default=None,
+                                 help="file to write, defaults to <protocol name>.rkt")
+    args = argument_parser.parse_args()
+
+    params = GeneratorParams(**{param.name: getattr(args, param.name) for param in fields(GeneratorParams)})
+    output_path = args.output if args.output is not None else f"{params.protocol_name()}.rkt"
+    with open(output_path, "w") as output_file:
+        output_file.write(generate_protocol(params))
+    print(f"wrote {output_path}")
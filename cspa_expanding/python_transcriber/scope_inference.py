@@ -0,0 +1,382 @@
+import warnings
+from collections import defaultdict
+from dataclasses import replace
+from typing import Dict, Iterator, List, Set
+
+from type_and_helpers import *
+
+# Computes the smallest sig counts that still admit an honest run of the
+# skeletons, so definstance/defaltinstance clauses do not have to be written
+# by hand. A value is counted once by the strand that originates it, that is
+# the first strand to send it without having received it before, the attacker
+# is assumed to only forward what it has seen.
+
+
+def subterms(msg: Message) -> Iterator[Message]:
+    """msg and every term nested inside it, outermost first"""
+    yield msg
+    match msg:
+        case EncTerm(data, key):
+            for data_term in data:
+                yield from subterms(data_term)
+            yield from subterms(key)
+        case EncTermNoTpl(data, key):
+            yield from subterms(data)
+            yield from subterms(key)
+        case CatTerm(data) | SeqTerm(data):
+            for data_term in data:
+                yield from subterms(data_term)
+        case HashTerm(hash_of):
+            yield from subterms(hash_of)
+
+
+def protocol_terms(protocol: Protocol) -> Iterator[Message]:
+    for role in protocol.role_arr:
+        for _, msg in role.trace:
+            yield from subterms(msg)
+
+
+def message_terms(protocol: Protocol, skeletons: List[Skeleton]) -> Iterator[Message]:
+    """terms of the role traces and of the deftrace clauses of skeletons"""
+    yield from protocol_terms(protocol)
+    for skeleton in skeletons:
+        for constraint in skeleton.constraints_list:
+            if isinstance(constraint, TraceConstraint):
+                for trace_elm in constraint.trace_elms:
+                    yield from subterms(trace_elm.message)
+
+
+def uses_ltks(protocol: Protocol, skeletons: List[Skeleton]) -> bool:
+    return any([isinstance(term, LtkTerm) for term in message_terms(protocol, skeletons)])
+
+
+def terms_could_match(term1: Message, term2: Message) -> bool:
+    """whether some assignment of the variables makes the two terms equal,
+    variables of different roles are never assumed to be the same"""
+    match term1, term2:
+        case Variable(_, MsgTypes.MESG), _:
+            return True
+        case _, Variable(_, MsgTypes.MESG):
+            return True
+        case Variable(_, var_type1), Variable(_, var_type2):
+            return var_type1 == var_type2
+        case Variable(_, MsgTypes.AKEY), PubkTerm(_) | PrivkTerm(_):
+            return True
+        case PubkTerm(_) | PrivkTerm(_), Variable(_, MsgTypes.AKEY):
+            return True
+        case Variable(_, MsgTypes.SKEY), LtkTerm(_):
+            return True
+        case LtkTerm(_), Variable(_, MsgTypes.SKEY):
+            return True
+        case EncTerm(data1, key1), EncTerm(data2, key2):
+            return (len(data1) == len(data2) and terms_could_match(key1, key2) and
+                    all([terms_could_match(sub1, sub2) for sub1, sub2 in zip(data1, data2)]))
+        case EncTermNoTpl(data1, key1), EncTermNoTpl(data2, key2):
+            return terms_could_match(data1, data2) and terms_could_match(key1, key2)
+        case (CatTerm(data1), CatTerm(data2)) | (SeqTerm(data1), SeqTerm(data2)):
+            return (len(data1) == len(data2) and
+                    all([terms_could_match(sub1, sub2) for sub1, sub2 in zip(data1, data2)]))
+        case HashTerm(hash_of1), HashTerm(hash_of2):
+            return terms_could_match(hash_of1, hash_of2)
+        case (LtkTerm(_), LtkTerm(_)) | (PubkTerm(_), PubkTerm(_)) | (PrivkTerm(_), PrivkTerm(_)):
+            return True
+    return False
+
+
+def sealed_terms(role: Role, send_recv: SendRecv) -> List[Message]:
+    """encryptions and hashes the role sends or receives, the attacker can
+    take apart and put together everything else by itself"""
+    return [term for trace_send_recv, msg in role.trace if trace_send_recv == send_recv
+            for term in subterms(msg) if isinstance(term, EncTerm | EncTermNoTpl | HashTerm)]
+
+
+def exposed_terms(msg: Message) -> Iterator[Message]:
+    """msg and the terms nested inside it that whoever can open it learns,
+    keys of encryptions are only used and the insides of hashes are hidden"""
+    yield msg
+    match msg:
+        case EncTerm(data, _) | CatTerm(data) | SeqTerm(data):
+            for data_term in data:
+                yield from exposed_terms(data_term)
+        case EncTermNoTpl(data, _):
+            yield from exposed_terms(data)
+
+
+def sent_keys(role: Role) -> List[Message]:
+    """long term keys and akey/skey variables the role sends as terms of
+    their own and not only to encrypt with"""
+    return [term for send_recv, msg in role.trace if send_recv == SendRecv.SEND
+            for term in exposed_terms(msg)
+            if isinstance(term, LtkTerm | PubkTerm | PrivkTerm) or
+            (isinstance(term, Variable) and term.var_type in [MsgTypes.AKEY, MsgTypes.SKEY])]
+
+
+def encryption_keys(role: Role) -> List[Message]:
+    """keys of the encryptions the role sends or receives"""
+    return [term.key for send_recv in [SendRecv.SEND, SendRecv.RECV]
+            for term in sealed_terms(role, send_recv) if isinstance(term, EncTerm | EncTermNoTpl)]
+
+
+def keys_could_match(sent_key: Message, used_key: Message) -> bool:
+    """whether sending sent_key can give away used_key or its inverse"""
+    if isinstance(sent_key, PubkTerm | PrivkTerm) and isinstance(used_key, PubkTerm | PrivkTerm):
+        return True
+    return terms_could_match(sent_key, used_key)
+
+
+def used_roles(protocol: Protocol,
+               skeletons: List[Skeleton | InstanceBounds | AltInstanceBounds]) -> List[str]:
+    """names of the roles that can take part in runs of the skeletons and
+    instances in protocol order. A role is used when a skeleton has strands
+    or strand variables of it or an instance gives it atoms. It is also used
+    when it sends an encryption or hash that matches one a used role
+    receives, since the attacker might not be able to make that one, or when
+    it receives one a used role sends, since it might give the attacker the
+    contents. Sending a key that might be one a used role encrypts with
+    makes a role used too, the attacker can then open or make those
+    encryptions. Without any skeleton or instance every role counts as used"""
+    role_names = [role.role_name for role in protocol.role_arr]
+    if len(skeletons) == 0:
+        return role_names
+    used: Set[str] = set()
+    for skeleton in skeletons:
+        match skeleton:
+            case Skeleton(_):
+                used.update([role_obj_type.removeprefix("role_")
+                             for role_obj_type in skeleton.strand_vars_map.values()])
+                used.update([constraint.role_name for constraint in skeleton.constraints_list
+                             if isinstance(constraint, Strand)])
+            case InstanceBounds(_) | AltInstanceBounds(_):
+                used.update([role_name for role_name, role_count in skeleton.role_counts.items()
+                             if role_count > 0])
+    changed = True
+    while changed:
+        changed = False
+        received = [term for role in protocol.role_arr if role.role_name in used
+                    for term in sealed_terms(role, SendRecv.RECV)]
+        sent = [term for role in protocol.role_arr if role.role_name in used
+                for term in sealed_terms(role, SendRecv.SEND)]
+        keys = [key for role in protocol.role_arr if role.role_name in used
+                for key in encryption_keys(role)]
+        for role in protocol.role_arr:
+            if role.role_name in used:
+                continue
+            if any([terms_could_match(role_sent, used_recv) for role_sent in sealed_terms(role, SendRecv.SEND)
+                    for used_recv in received]) or \
+               any([terms_could_match(used_sent, role_recv) for role_recv in sealed_terms(role, SendRecv.RECV)
+                    for used_sent in sent]) or \
+               any([keys_could_match(role_key, used_key) for role_key in sent_keys(role)
+                    for used_key in keys]):
+                used.add(role.role_name)
+                changed = True
+    return [role_name for role_name in role_names if role_name in used]
+
+
+def strand_heights(protocol: Protocol, skeletons: List[Skeleton],
+                   roles: List[str] | None = None) -> Dict[str, List[int]]:
+    """role name -> heights of the strands of that role in the run. A skeleton
+    has as many strands of a role as it has strand variables or defstrands of
+    it, where a strand without a defstrand runs the whole trace. Every role
+    in roles (all of them by default) gets at least one full strand since
+    exec_<role> has to have a strand to talk about, the others get none"""
+    run_heights: Dict[str, List[int]] = {}
+    for role in protocol.role_arr:
+        role_len = len(role.trace)
+        if roles is not None and role.role_name not in roles:
+            run_heights[role.role_name] = []
+            continue
+        role_heights = [role_len]
+        for skeleton in skeletons:
+            strand_var_count = list(skeleton.strand_vars_map.values()).count(f"role_{role.role_name}")
+            defstrand_heights = [min(constraint.trace_len, role_len) for constraint in skeleton.constraints_list
+                                 if isinstance(constraint, Strand) and constraint.role_name == role.role_name]
+            skel_heights = defstrand_heights + [role_len] * max(0, strand_var_count - len(defstrand_heights))
+            skel_heights.sort(reverse=True)
+            # keep the longest strand seen in any skeleton at each position
+            for indx, height in enumerate(skel_heights):
+                if indx < len(role_heights):
+                    role_heights[indx] = max(role_heights[indx], height)
+                else:
+                    role_heights.append(height)
+        run_heights[role.role_name] = role_heights
+    return run_heights
+
+
+def originated_terms(role: Role, height: int) -> List[Message]:
+    """terms the first height events of a strand of role send without
+    having received them earlier, each distinct term once"""
+    received: Set[str] = set()
+    originated: Dict[str, Message] = {}
+    for send_recv, msg in role.trace[:height]:
+        for term in subterms(msg):
+            term_str = repr(term)
+            match send_recv:
+                case SendRecv.RECV:
+                    received.add(term_str)
+                case SendRecv.SEND:
+                    if term_str not in received and term_str not in originated:
+                        originated[term_str] = term
+    return list(originated.values())
+
+
+def count_originated(protocol: Protocol, run_heights: Dict[str, List[int]],
+                     alt_tuples: bool) -> Dict[str, int]:
+    counts: Dict[str, int] = defaultdict(int)
+    for role_name, role_heights in run_heights.items():
+        role = protocol.role_obj_of_name(role_name)
+        for height in role_heights:
+            for term in originated_terms(role, height):
+                match term:
+                    case Variable(_, MsgTypes.TEXT):
+                        counts[TEXT_SIG] += 1
+                    case Variable(_, MsgTypes.SKEY):
+                        counts[SKEY_SIG] += 1
+                    case EncTerm(_):
+                        counts[CIPHER_SIG] += 1
+                        # the plaintext of an enc is a tuple of its own
+                        counts[TUPLE_SIG] += 1 if alt_tuples else 0
+                    case EncTermNoTpl(_):
+                        counts[CIPHER_SIG] += 1
+                    case HashTerm(_):
+                        counts[HASH_SIG] += 1
+                    case CatTerm(_):
+                        counts[TUPLE_SIG] += 1 if alt_tuples else 0
+    return counts
+
+
+def max_var_count(protocol: Protocol, skeletons: List[Skeleton], var_type: MsgTypes) -> int:
+    """most variables of var_type declared by any one role or skeleton, a run
+    needs at least that many distinct values"""
+    var_maps = [role.var_map for role in protocol.role_arr] + \
+        [skeleton.non_strand_vars_map for skeleton in skeletons]
+    return max([0] + [len([var for var in var_map.values() if var.var_type == var_type])
+                      for var_map in var_maps])
+
+
+def max_plaintext_length(protocol: Protocol, skeletons: List[Skeleton]) -> int:
+    """longest plaintext sequence, the indices new_transcribe needs in the
+    plaintext relation"""
+    return max([1] + [len(term.data) for term in message_terms(protocol, skeletons)
+                      if isinstance(term, EncTerm)])
+
+
+def max_tuple_length(protocol: Protocol, skeletons: List[Skeleton]) -> int:
+    """longest tuple, cat and seq terms are tuples and so is the plaintext of
+    an enc, the indices new_transcribe_tuple needs in the components relation"""
+    return max([1] + [len(term.data) for term in message_terms(protocol, skeletons)
+                      if isinstance(term, EncTerm | CatTerm | SeqTerm)])
+
+
+def check_index_bound(instance_name: str, bound_name: str, bound: int, needed: int) -> int:
+    """the index bound to emit, a looser bound than needed only makes the
+    plaintext/components relations bigger so it is tightened"""
+    if bound > needed:
+        warnings.warn(f"{bound_name} {bound} of instance {instance_name} is looser than the longest "
+                      f"term in the protocol and skeletons which needs {needed}, using {needed}")
+        return needed
+    if bound < needed:
+        warnings.warn(f"{bound_name} {bound} of instance {instance_name} is smaller than the longest "
+                      f"term in the protocol and skeletons which needs {needed}, runs using those terms are excluded")
+    return bound
+
+
+def tighten_index_bounds(instance_bound: InstanceBounds | AltInstanceBounds, protocol: Protocol,
+                         skeletons: List[Skeleton | InstanceBounds | AltInstanceBounds]) -> InstanceBounds | AltInstanceBounds:
+    """copy of instance_bound whose enc-depth (plaintext indices) or
+    tuple-length (components indices) is no larger than the protocol needs"""
+    skeletons = [skeleton for skeleton in skeletons if isinstance(skeleton, Skeleton)]
+    match instance_bound:
+        case InstanceBounds(instance_name):
+            needed = max_plaintext_length(protocol, skeletons)
+            encryption_depth = check_index_bound(instance_name, ENC_DEPTH_BOUND,
+                                                 instance_bound.encryption_depth, needed)
+            return replace(instance_bound, encryption_depth=encryption_depth)
+        case AltInstanceBounds(instance_name):
+            needed = max_tuple_length(protocol, skeletons)
+            tuple_length = check_index_bound(instance_name, TUPLE_LENGTH_BOUND,
+                                             instance_bound.tuple_length, needed)
+            return replace(instance_bound, tuple_length=tuple_length)
+    return instance_bound
+
+
+def enc_nesting_depth(msg: Message) -> int:
+    match msg:
+        case EncTerm(data, _):
+            return 1 + max([0] + [enc_nesting_depth(data_term) for data_term in data])
+        case EncTermNoTpl(data, _):
+            return 1 + enc_nesting_depth(data)
+        case CatTerm(data) | SeqTerm(data):
+            return max([0] + [enc_nesting_depth(data_term) for data_term in data])
+        case HashTerm(hash_of):
+            return enc_nesting_depth(hash_of)
+    return 0
+
+
+def infer_sig_counts(protocol: Protocol, skeletons: List[Skeleton],
+                     run_heights: Dict[str, List[int]], alt: bool,
+                     have_ltks: bool) -> Dict[str, int]:
+    originated = count_originated(protocol, run_heights, alt)
+    sig_counts: Dict[str, int] = {}
+    sig_counts[TIMESLOT_SIG] = sum([sum(role_heights) for role_heights in run_heights.values()])
+    sig_counts[NAME_SIG] = max_var_count(protocol, skeletons, MsgTypes.NAME) + 1
+    sig_counts[CIPHER_SIG] = originated[CIPHER_SIG]
+    sig_counts[TEXT_SIG] = max(originated[TEXT_SIG], max_var_count(protocol, skeletons, MsgTypes.TEXT))
+    sig_counts[HASH_SIG] = originated[HASH_SIG]
+
+    uses_akeys = max_var_count(protocol, skeletons, MsgTypes.AKEY) > 0 or any(
+        [isinstance(term, PubkTerm | PrivkTerm) for term in protocol_terms(protocol)])
+    # new_transcribe always gives every name a key pair
+    key_pair_count = sig_counts[NAME_SIG] if uses_akeys or not alt else 0
+    sig_counts[PUBK_SIG] = sig_counts[PRIVK_SIG] = key_pair_count
+    sig_counts[AKEY_SIG] = 2 * key_pair_count
+    ltk_count = 0
+    if have_ltks:
+        name_count = sig_counts[NAME_SIG]
+        ltk_count = (name_count * (name_count - 1)) // 2
+    sig_counts[SKEY_SIG] = ltk_count + max(originated[SKEY_SIG],
+                                           max_var_count(protocol, skeletons, MsgTypes.SKEY))
+    sig_counts[KEY_SIG] = sig_counts[AKEY_SIG] + sig_counts[SKEY_SIG]
+    sig_counts[ATTACKER_SIG] = 1
+    if alt:
+        sig_counts[TUPLE_SIG] = originated[TUPLE_SIG]
+    mesg_subtypes = alt_subtypes[MESG_SIG] if alt else subtypes[MESG_SIG]
+    sig_counts[MESG_SIG] = sum([sig_counts[subtype] for subtype in mesg_subtypes])
+
+    sig_names = ALT_SIG_NAMES if alt else SIG_NAMES
+    return {sig_name: sig_counts[sig_name] for sig_name in sig_names}
+
+
+def infer_instance(instance_name: str, protocol: Protocol,
+                   skeletons: List[Skeleton | InstanceBounds | AltInstanceBounds],
+                   roles: List[str] | None = None) -> InstanceBounds:
+    """bounds for new_transcribe, enc-depth is the longest plaintext. Only
+    the roles in roles get strands. new_transcribe instances have no ltks so
+    protocols using ltk are refused, no run of them fits those bounds"""
+    skeletons = [skeleton for skeleton in skeletons if isinstance(skeleton, Skeleton)]
+    if uses_ltks(protocol, skeletons):
+        raise ParseException(f"protocol {protocol.protocol_name} uses ltk but definstance bounds have no ltks, "
+                             f"infer a defaltinstance with {HAVE_LTKS} for new_transcribe_tuple instead")
+    run_heights = strand_heights(protocol, skeletons, roles)
+    sig_counts = infer_sig_counts(protocol, skeletons, run_heights, False, False)
+    role_counts = {role_name: len(role_heights) for role_name, role_heights in run_heights.items()}
+    instance_bound = InstanceBounds(instance_name, sig_counts, role_counts,
+                                    max_plaintext_length(protocol, skeletons))
+    instance_bound.validate(protocol)
+    return instance_bound
+
+
+def infer_alt_instance(instance_name: str, protocol: Protocol,
+                       skeletons: List[Skeleton | InstanceBounds | AltInstanceBounds],
+                       roles: List[str] | None = None) -> AltInstanceBounds:
+    """bounds for new_transcribe_tuple, here enc-depth is how deep encryptions
+    are nested since that decides the number of microticks"""
+    skeletons = [skeleton for skeleton in skeletons if isinstance(skeleton, Skeleton)]
+    have_ltks = uses_ltks(protocol, skeletons)
+    run_heights = strand_heights(protocol, skeletons, roles)
+    sig_counts = infer_sig_counts(protocol, skeletons, run_heights, True, have_ltks)
+    role_counts = {role_name: len(role_heights) for role_name, role_heights in run_heights.items()}
+    enc_depth = max([1] + [enc_nesting_depth(msg) for role in protocol.role_arr for _, msg in role.trace])
+    instance_bound = AltInstanceBounds(instance_name, sig_counts, role_counts, enc_depth,
+                                       max_tuple_length(protocol, skeletons), have_ltks)
+    instance_bound.validate(protocol)
+    return instance_bound
@@ -0,0 +1,227 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import shlex
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, replace
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import main
+import main_tuple
+import parser
+import scope_inference
+import sexp_reader
+import solver_runner
+from type_and_helpers import *
+
+# Grows the bounds of one instance step by step, transcribes the protocol
+# with every bound and hands the result to a solver until one of them is
+# SAT. Every scope point is written to its own file and keeps the name of the
+# starting instance, so run commands saying `for <name>` work unchanged.
+
+DEFAULT_STEPS = {TIMESLOT_SIG: 2, TEXT_SIG: 1}
+DEFAULT_ALT_STEPS = {TIMESLOT_SIG: 2, TEXT_SIG: 1, TUPLE_SIG: 1}
+
+Runner = Callable[[str], solver_runner.SolverResult]
+
+
+@dataclass
+class ScopePoint:
+    step: int
+    sig_counts: Dict[str, int]
+    role_counts: Dict[str, int]
+    forge_file_path: str
+    transcribe_seconds: float
+    status: str = "NOT_RUN"
+    solve_seconds: float = 0.0
+
+
+def grow_instance(instance: InstanceBounds | AltInstanceBounds, steps: Dict[str, int],
+                  times: int) -> InstanceBounds | AltInstanceBounds:
+    """copy of instance with times * step added to every sig or role named in
+    steps. Parents that are exactly the sum of their subtypes (mesg, Key,
+    akey) are recomputed, as new_transcribe needs name, PublicKey and
+    PrivateKey to match those grow together with name"""
+    sig_counts = dict(instance.sig_counts)
+    role_counts = dict(instance.role_counts)
+    for name, step in steps.items():
+        if name in role_counts:
+            role_counts[name] += step * times
+        elif name in sig_counts:
+            sig_counts[name] += step * times
+            if name == NAME_SIG and instance.sig_counts[PUBK_SIG] == instance.sig_counts[NAME_SIG]:
+                sig_counts[PUBK_SIG] += step * times
+                sig_counts[PRIVK_SIG] += step * times
+        else:
+            raise ParseException(f"can only grow sigs or roles of instance {instance.instance_name} not {name}")
+    all_subtypes = alt_subtypes if isinstance(instance, AltInstanceBounds) else subtypes
+    for parent in reversed(subtypes_are_exhaustive):
+        sig_counts[parent] = sum([sig_counts[subtype] for subtype in all_subtypes[parent]])
+    return replace(instance, sig_counts=sig_counts, role_counts=role_counts)
+
+
+def instance_to_cpsa(instance: InstanceBounds | AltInstanceBounds) -> str:
+    """definstance/defaltinstance form parse_instance/parse_alt_instance read
+    back into an equal object"""
+    pairs = [(role_name, count) for role_name, count in instance.role_counts.items()]
+    pairs += [(sig_name, count) for sig_name, count in instance.sig_counts.items()]
+    pairs.append((ENC_DEPTH_BOUND, instance.encryption_depth))
+    form_name = DEF_INST_BOUNDS
+    flags = ""
+    if isinstance(instance, AltInstanceBounds):
+        form_name = DEF_ALT_INST_BOUNDS
+        pairs.append((TUPLE_LENGTH_BOUND, instance.tuple_length))
+        flags = f" ({HAVE_LTKS})" if instance.have_ltks else ""
+    pairs_str = " ".join([f"({key} {val})" for key, val in pairs])
+    return f"({form_name} {instance.instance_name} {pairs_str}{flags})"
+
+
+def split_cpsa_source(cpsa_txt: str) -> Tuple[str, List[sexp_reader.SourceForm]]:
+    """the #lang line and every top level form of a CPSA file"""
+    cpsa_file = io.StringIO(cpsa_txt)
+    forms = list(sexp_reader.load_cspa_source_forms(cpsa_file))
+    return cpsa_txt[:cpsa_txt.find("\n") + 1], forms
+
+
+def is_instance_form(form: sexp_reader.SourceForm) -> bool:
+    if type(form.s_expr) != list or len(form.s_expr) == 0:
+        return False
+    return get_str_from_symbol(form.s_expr[0], "top level form") in (DEF_INST_BOUNDS, DEF_ALT_INST_BOUNDS)
+
+
+def start_instance(cpsa_txt: str, alt: bool, instance_name: str | None,
+                   infer_instance_name: str | None) -> InstanceBounds | AltInstanceBounds:
+    """the definstance named instance_name, or the smallest bounds
+    scope_inference finds for the skeletons when infer_instance_name is given"""
+    _, forms = split_cpsa_source(cpsa_txt)
+    protocol = parser.parse_protocol(forms[0].s_expr)
+    skeletons: List[Skeleton | InstanceBounds | AltInstanceBounds] = []
+    instances: List[InstanceBounds | AltInstanceBounds] = []
+    for form in forms[1:]:
+        if not is_instance_form(form):
+            skeletons.append(parser.parse_skeleton(form.s_expr, protocol))
+        elif get_str_from_symbol(form.s_expr[0], "instance") == DEF_ALT_INST_BOUNDS:
+            instances.append(parser.parse_alt_instance(form.s_expr, protocol))
+        else:
+            instances.append(parser.parse_instance(form.s_expr, protocol))
+    if infer_instance_name is not None:
+        infer_func = scope_inference.infer_alt_instance if alt else scope_inference.infer_instance
+        return infer_func(infer_instance_name, protocol, skeletons + instances)
+    instance_type = AltInstanceBounds if alt else InstanceBounds
+    for instance in instances:
+        if isinstance(instance, instance_type) and instance.instance_name == instance_name:
+            return instance
+    raise ParseException(f"no instance {instance_name} in {[instance.instance_name for instance in instances]}")
+
+
+def transcribe_point(cpsa_txt: str, instance: InstanceBounds | AltInstanceBounds,
+                     run_forge_txt: str, destination_path: Path, alt: bool) -> None:
+    """transcribes the protocol and skeletons of cpsa_txt with instance as
+    the only instance"""
+    lang_line, forms = split_cpsa_source(cpsa_txt)
+    point_cpsa_txt = lang_line + "\n".join([form.text for form in forms if not is_instance_form(form)] +
+                                           [instance_to_cpsa(instance)]) + "\n"
+    transcriber_main = main_tuple.main if alt else main.main
+    base_file_name = "base_with_seq_and_tuple_micro.frg" if alt else "base_with_seq.frg"
+    with contextlib.redirect_stdout(io.StringIO()):
+        with open(destination_path, "w") as destination_forge_file:
+            with open(main.path_rel_to_script(base_file_name)) as base_file:
+                with open(main.path_rel_to_script("./extra_funcs.frg")) as extra_func_file:
+                    transcriber_main(io.StringIO(point_cpsa_txt), destination_forge_file, base_file,
+                                     extra_func_file, io.StringIO(run_forge_txt), False, None)
+
+
+def sweep(cpsa_txt: str, run_forge_txt: str, start: InstanceBounds | AltInstanceBounds,
+          steps: Dict[str, int], max_steps: int, output_dir: str | Path, runner: Runner,
+          jobs: int = 1) -> List[ScopePoint]:
+    """solves scope points 0..max_steps, jobs of them at a time, and stops
+    after the first batch with a SAT point. Points are transcribed one after
+    another as that is quick, only the solvers run concurrently"""
+    alt = isinstance(start, AltInstanceBounds)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    points: List[ScopePoint] = []
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        for batch_start in range(0, max_steps + 1, jobs):
+            batch: List[ScopePoint] = []
+            for step in range(batch_start, min(batch_start + jobs, max_steps + 1)):
+                instance = grow_instance(start, steps, step)
+                destination_path = output_dir / f"{start.instance_name}_scope_{step}.frg"
+                transcribe_start = time.perf_counter()
+                transcribe_point(cpsa_txt, instance, run_forge_txt, destination_path, alt)
+                batch.append(ScopePoint(step, instance.sig_counts, instance.role_counts, str(destination_path),
+                                        time.perf_counter() - transcribe_start))
+            for point, result in zip(batch, executor.map(lambda point: runner(point.forge_file_path), batch)):
+                point.status = result.status
+                point.solve_seconds = result.seconds
+            points.extend(batch)
+            if any([point.status == "SAT" for point in batch]):
+                break
+    return points
+
+
+def parse_steps(step_strs: List[str]) -> Dict[str, int]:
+    steps = {}
+    for step_str in step_strs:
+        name, _, amount = step_str.partition("=")
+        steps[name] = int(amount)
+    return steps
+
+
+if __name__ == "__main__":
+    argument_parser = argparse.ArgumentParser(
+        prog="scope_sweep",
+        description="grow the bounds of an instance until the solver finds a run, recording the time per scope")
+    argument_parser.add_argument("cpsa_file_path")
+    argument_parser.add_argument("run_forge_file_path")
+    start_group = argument_parser.add_mutually_exclusive_group(required=True)
+    start_group.add_argument("--instance", type=str, help="definstance of the file to start from")
+    start_group.add_argument("--infer_instance", type=str, metavar="INSTANCE_NAME",
+                             help="start from the smallest bounds that admit an honest run of the skeletons")
+    argument_parser.add_argument("--tuple", action='store_true',
+                                 help="use main_tuple.py and defaltinstance bounds")
+    argument_parser.add_argument("--step", action='append', default=[], metavar="SIG=AMOUNT",
+                                 help="how much a sig or role grows per scope point, defaults to Timeslot=2 text=1 (and tuple=1)")
+    argument_parser.add_argument("--max_steps", type=int, default=5,
+                                 help="last scope point tried")
+    argument_parser.add_argument("--jobs", type=int, default=1,
+                                 help="number of scope points solved at once")
+    argument_parser.add_argument("--solver_cmd", type=str, default="racket",
+                                 help="command the forge file path is appended to, any executable works")
+    argument_parser.add_argument("--timeout", type=float, default=None,
+                                 help="wall clock seconds after which a solver is killed")
+    argument_parser.add_argument("--memory_limit_mb", type=int, default=None)
+    argument_parser.add_argument("--output_dir", type=str, default="scope_sweep")
+    argument_parser.add_argument("--report", type=str, default=None,
+                                 help="json file for the results, defaults to report.json in the output directory")
+    args = argument_parser.parse_args()
+
+    with open(args.cpsa_file_path) as cpsa_file:
+        cpsa_txt = cpsa_file.read()
+    with open(args.run_forge_file_path) as run_forge_file:
+        run_forge_txt = run_forge_file.read()
+    start = start_instance(cpsa_txt, args.tuple, args.instance, args.infer_instance)
+    steps = parse_steps(args.step) if len(args.step) != 0 else (DEFAULT_ALT_STEPS if args.tuple else DEFAULT_STEPS)
+    solver_cmd = shlex.split(args.solver_cmd)
+
+    def run_point(forge_file_path: str) -> solver_runner.SolverResult:
+        return solver_runner.run_solver(solver_runner.SolverJob(forge_file_path), solver_cmd,
+                                        args.timeout, args.memory_limit_mb)
+
+    points = sweep(cpsa_txt, run_forge_txt, start, steps, args.max_steps, args.output_dir, run_point, args.jobs)
+    report_path = args.report if args.report is not None else os.path.join(args.output_dir, "report.json")
+    with open(report_path, "w") as report_file:
+        json.dump({"start": asdict(start), "steps": steps, "points": [asdict(point) for point in points]},
+                  report_file, indent=2)
+    for point in points:
+        print(f"step {point.step:>3}  {point.status:<8} transcribe {point.transcribe_seconds:7.3f}s  "
+              f"solve {point.solve_seconds:8.3f}s  Timeslot {point.sig_counts[TIMESLOT_SIG]}")
+    sat_points = [point for point in points if point.status == "SAT"]
+    if len(sat_points) != 0:
+        print(f"first SAT at step {sat_points[0].step}: {sat_points[0].forge_file_path}")
+    else:
+        print(f"no SAT up to step {points[-1].step}")
@@ -0,0 +1,155 @@
+import io
+import re
+from dataclasses import dataclass
+from typing import Iterator, List
+
+import sexpdata
+
+from type_and_helpers import ParseException, Sexp
+
+# one alternative per token kind, leading whitespace is consumed together with
+# the token so the loop below only runs once per token instead of once per
+# character, comments and string literals are matched whole so brackets inside
+# them are never counted
+_TOKEN_RE = re.compile(r"""
+    \s*
+    (?:
+        (?P<comment>;[^\n]*)
+      | (?P<open>\()
+      | (?P<close>\))
+      | (?P<string>"(?:[^"\\]|\\.)*")
+      | (?P<atom>[^\s()";]+)
+    )
+""", re.VERBOSE | re.DOTALL)
+
+_STRING_ESCAPE_RE = re.compile(r"\\(.)", re.DOTALL)
+
+# same conversions sexpdata.loads applies to atoms with its default options,
+# kept identical so parser.parse_* see the same values as before
+NIL_ATOM = "nil"
+TRUE_ATOM = "t"
+
+
+def atom_to_value(token: str):
+    """converts an atom token to the value sexpdata would have produced"""
+    if token == NIL_ATOM:
+        return []
+    if token == TRUE_ATOM:
+        return True
+    try:
+        return int(token)
+    except ValueError:
+        pass
+    try:
+        return float(token)
+    except ValueError:
+        return sexpdata.Symbol(token)
+
+
+def unquote_string(token: str) -> str:
+    """strips the surrounding quotes of a string literal and resolves
+    backslash escapes"""
+    return _STRING_ESCAPE_RE.sub(r"\1", token[1:-1])
+
+
+@dataclass
+class SourceForm:
+    """a top level s-expr together with where it was found in the source,
+    offsets are in bytes and lines are 1 based, both relative to the start
+    of the file"""
+    s_expr: Sexp
+    text: str
+    start_offset: int
+    end_offset: int
+    start_line: int
+    end_line: int
+
+
+def iter_source_forms(txt: str, byte_offset: int = 0,
+                      line_offset: int = 0) -> Iterator[SourceForm]:
+    """tokenizes txt in a single pass and yields every top level s-expr as
+    soon as its closing bracket is seen, the s-expr has the same shape as
+    sexpdata.loads (nested lists of Symbol,int,float and str). byte_offset
+    and line_offset are added to the recorded spans when txt does not start
+    at the beginning of the file"""
+    stack: List[list] = []
+    cur: list | None = None
+    form_start = 0
+    # offsets and line numbers are tracked incrementally from the end of the
+    # previous form so the text is only encoded and scanned for newlines once
+    last_indx = 0
+    last_byte = byte_offset
+    last_line = line_offset + 1
+
+    def make_source_form(s_expr, start: int, end: int) -> SourceForm:
+        nonlocal last_indx, last_byte, last_line
+        start_byte = last_byte + len(txt[last_indx:start].encode())
+        start_line = last_line + txt.count("\n", last_indx, start)
+        text = txt[start:end]
+        last_indx = end
+        last_byte = start_byte + len(text.encode())
+        last_line = start_line + text.count("\n")
+        return SourceForm(s_expr, text, start_byte, last_byte, start_line,
+                          last_line)
+
+    pos = 0
+    for match in _TOKEN_RE.finditer(txt):
+        if match.start() != pos:
+            break
+        pos = match.end()
+        kind = match.lastgroup
+        if kind == "comment":
+            continue
+        if kind == "open":
+            if cur is not None:
+                stack.append(cur)
+            else:
+                form_start = pos - 1
+            cur = []
+        elif kind == "close":
+            if cur is None:
+                raise ParseException(
+                    f"unexpected ')' at offset {pos - 1} without matching '('")
+            finished = cur
+            if len(stack) == 0:
+                cur = None
+                yield make_source_form(finished, form_start, pos)
+            else:
+                cur = stack.pop()
+                cur.append(finished)
+        else:
+            token = match.group(kind)
+            value = unquote_string(token) if kind == "string" else atom_to_value(token)
+            if cur is None:
+                yield make_source_form(value, match.start(kind), pos)
+            else:
+                cur.append(value)
+    rest = txt[pos:]
+    if rest.strip() != "":
+        raise ParseException(
+            f"could not tokenize input at offset {pos + len(rest) - len(rest.lstrip())}: {rest.lstrip()[:20]!r}")
+    if cur is not None:
+        raise ParseException(
+            f"expected {len(stack) + 1} more ')' before end of input")
+
+
+def iter_top_level_forms(txt: str) -> Iterator[Sexp]:
+    """same as iter_source_forms but only yields the s-expr of each form"""
+    return (form.s_expr for form in iter_source_forms(txt))
+
+
+def load_cspa_source_forms(file: io.TextIOWrapper) -> Iterator[SourceForm]:
+    """reads a CPSA file and yields its top level forms one at a time,
+    the first line is skipped as it only contains #lang forge/domains/crypto"""
+    first_line = ""
+    for line in file:
+        first_line = line
+        break
+    return iter_source_forms(file.read(), len(first_line.encode()),
+                             first_line.count("\n"))
+
+
+def load_cspa_forms(file: io.TextIOWrapper) -> Iterator[Sexp]:
+    """reads a CPSA file and yields its top level s-expr one at a time,
+    the first line is skipped as it only contains #lang forge/domains/crypto"""
+    return (form.s_expr for form in load_cspa_source_forms(file))
@@ -0,0 +1,254 @@
+import argparse
+import json
+import os
+import re
+import shlex
+import signal
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+# Runs forge (or anything taking a .frg path as its last argument) on many
+# transcribed files at once. Every solver is its own process so a thread per
+# worker is enough to keep the pool busy.
+
+SAT_PATTERN = re.compile(r"\bSat\b")
+UNSAT_PATTERN = re.compile(r"\bUnsat\b")
+MEMORY_ERROR_PATTERN = re.compile(r"out of memory|MemoryError|Cannot allocate memory", re.IGNORECASE)
+# start of a run command, anonymous runs are named after their position
+RUN_HEADER_PATTERN = re.compile(r"^[ \t]*(?:([A-Za-z_][\w']*)[ \t]*:[ \t]*)?run\b", re.MULTILINE)
+# anything else that can start a top level forge declaration
+TOP_LEVEL_PATTERN = re.compile(
+    r"^(?:(?:one|lone|abstract)\s+)*(?:sig|pred|fun|inst|option|test|example|assert|check|open)\b", re.MULTILINE)
+OUTPUT_TAIL_CHARS = 4000
+
+
+@dataclass
+class RunCommand:
+    name: str
+    start_line: int
+    end_line: int
+    # text of the command with its comments blanked out
+    code: str
+
+
+@dataclass
+class SolverJob:
+    forge_file_path: str
+    run_name: str | None = None
+
+
+@dataclass
+class SolverResult:
+    forge_file_path: str
+    run_name: str | None
+    status: str
+    seconds: float
+    returncode: int | None
+    outcomes: List[str] = field(default_factory=list)
+    output: str = ""
+    stderr: str = ""
+
+
+def blank_comments(txt: str) -> str:
+    """txt with every comment replaced by spaces, line breaks are kept so line
+    numbers and offsets still match the original. String literals are skipped
+    so a -- inside a path is not taken as a comment"""
+    out = []
+    indx = 0
+    while indx < len(txt):
+        if txt.startswith("--", indx) or txt.startswith("//", indx):
+            end = txt.find("\n", indx)
+            end = len(txt) if end == -1 else end
+        elif txt.startswith("/*", indx):
+            end = txt.find("*/", indx + 2)
+            end = len(txt) if end == -1 else end + 2
+        elif txt[indx] == "\"":
+            end = txt.find("\"", indx + 1)
+            end = len(txt) if end == -1 else end + 1
+            out.append(txt[indx:end])
+            indx = end
+            continue
+        else:
+            out.append(txt[indx])
+            indx += 1
+            continue
+        out.append(re.sub(r"[^\n]", " ", txt[indx:end]))
+        indx = end
+    return "".join(out)
+
+
+def line_of(txt: str, offset: int) -> int:
+    return txt.count("\n", 0, offset)
+
+
+def find_run_commands(txt: str) -> List[RunCommand]:
+    """every run command outside of comments with the lines it spans, a
+    command ends where the next top level declaration or command starts"""
+    code = blank_comments(txt)
+    headers = list(RUN_HEADER_PATTERN.finditer(code))
+    boundaries = sorted([line_of(code, match_obj.start()) for match_obj in headers] +
+                        [line_of(code, match_obj.start()) for match_obj in TOP_LEVEL_PATTERN.finditer(code)])
+    code_lines = code.split("\n")
+    run_commands = []
+    for indx, match_obj in enumerate(headers):
+        start_line = line_of(code, match_obj.start())
+        end_line = next((boundary for boundary in boundaries if boundary > start_line), len(code.splitlines()))
+        name = match_obj.group(1) if match_obj.group(1) is not None else f"run_{indx}"
+        run_commands.append(RunCommand(name, start_line, end_line,
+                                       "\n".join(code_lines[start_line:end_line])))
+    return run_commands
+
+
+def comment_out_runs(txt: str, should_keep: Callable[[RunCommand], bool]) -> str:
+    """txt with every run command should_keep rejects commented out line by line"""
+    lines = txt.split("\n")
+    for run_command in find_run_commands(txt):
+        if should_keep(run_command):
+            continue
+        for line_indx in range(run_command.start_line, run_command.end_line):
+            lines[line_indx] = "-- " + lines[line_indx]
+    return "\n".join(lines)
+
+
+def isolate_run(txt: str, run_name: str, sterling_off: bool = True) -> str:
+    """txt with every run command except run_name commented out, optionally
+    turning sterling off right before the first command so the solver does
+    not wait for a browser"""
+    run_commands = find_run_commands(txt)
+    if run_name not in [run_command.name for run_command in run_commands]:
+        raise ValueError(f"no run command {run_name}, found {[run_command.name for run_command in run_commands]}")
+    lines = comment_out_runs(txt, lambda run_command: run_command.name == run_name).split("\n")
+    if sterling_off:
+        lines.insert(run_commands[0].start_line, "option run_sterling off")
+    return "\n".join(lines)
+
+
+def plan_jobs(forge_file_paths: List[str], split_runs: bool) -> List[SolverJob]:
+    """one job per file, or one per run command of every file"""
+    jobs = []
+    for forge_file_path in forge_file_paths:
+        if not split_runs:
+            jobs.append(SolverJob(forge_file_path))
+            continue
+        with open(forge_file_path) as forge_file:
+            run_commands = find_run_commands(forge_file.read())
+        jobs.extend([SolverJob(forge_file_path, run_command.name) for run_command in run_commands])
+    return jobs
+
+
+def classify_output(output: str) -> List[str]:
+    """SAT/UNSAT for every result line of the solver output in order"""
+    outcomes = []
+    for line in output.splitlines():
+        if UNSAT_PATTERN.search(line):
+            outcomes.append("UNSAT")
+        elif SAT_PATTERN.search(line):
+            outcomes.append("SAT")
+    return outcomes
+
+
+def memory_limited(solver_cmd: List[str], memory_limit_mb: int) -> List[str]:
+    """solver_cmd started through sh, which limits the address space right
+    before it execs the solver. A preexec_fn would do the same but is not
+    safe with the worker threads running"""
+    return ["sh", "-c", f'ulimit -v {memory_limit_mb * 1024} && exec "$@"', "sh"] + solver_cmd
+
+
+def run_solver(job: SolverJob, solver_cmd: List[str], timeout: float | None = None,
+               memory_limit_mb: int | None = None) -> SolverResult:
+    """runs solver_cmd with the file of the job appended. A job for a single
+    run command gets a copy of the file next to the original, so relative
+    paths keep working, with the other commands commented out. The solver is
+    started in its own session so a timeout kills everything it spawned"""
+    forge_file_path = job.forge_file_path
+    tmp_path = None
+    if job.run_name is not None:
+        with open(job.forge_file_path) as forge_file:
+            isolated_txt = isolate_run(forge_file.read(), job.run_name)
+        original_path = Path(job.forge_file_path)
+        tmp_path = original_path.with_name(f".{original_path.stem}.{job.run_name}.{os.getpid()}.frg")
+        with open(tmp_path, "w") as tmp_file:
+            tmp_file.write(isolated_txt)
+        forge_file_path = str(tmp_path)
+    if memory_limit_mb is not None:
+        solver_cmd = memory_limited(solver_cmd, memory_limit_mb)
+    start = time.perf_counter()
+    try:
+        proc = subprocess.Popen(solver_cmd + [forge_file_path], stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE, text=True, start_new_session=True)
+        try:
+            stdout, stderr = proc.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            os.killpg(proc.pid, signal.SIGKILL)
+            stdout, stderr = proc.communicate()
+            return SolverResult(job.forge_file_path, job.run_name, "TIMEOUT", time.perf_counter() - start,
+                                None, classify_output(stdout), stdout[-OUTPUT_TAIL_CHARS:],
+                                stderr[-OUTPUT_TAIL_CHARS:])
+    finally:
+        if tmp_path is not None:
+            tmp_path.unlink(missing_ok=True)
+    seconds = time.perf_counter() - start
+    outcomes = classify_output(stdout)
+    if proc.returncode != 0:
+        out_of_memory = memory_limit_mb is not None and MEMORY_ERROR_PATTERN.search(stdout + stderr)
+        status = "MEMOUT" if out_of_memory else "ERROR"
+    elif "SAT" in outcomes:
+        status = "SAT"
+    elif len(outcomes) != 0:
+        status = "UNSAT"
+    else:
+        status = "UNKNOWN"
+    return SolverResult(job.forge_file_path, job.run_name, status, seconds, proc.returncode,
+                        outcomes, stdout[-OUTPUT_TAIL_CHARS:], stderr[-OUTPUT_TAIL_CHARS:])
+
+
+def run_all(jobs: List[SolverJob], solver_cmd: List[str], jobs_in_parallel: int | None = None,
+            timeout: float | None = None, memory_limit_mb: int | None = None) -> List[SolverResult]:
+    """results in the order of jobs"""
+    with ThreadPoolExecutor(max_workers=jobs_in_parallel) as executor:
+        return list(executor.map(lambda job: run_solver(job, solver_cmd, timeout, memory_limit_mb), jobs))
+
+
+def write_report(results: List[SolverResult], report_path: str | Path) -> None:
+    with open(report_path, "w") as report_file:
+        json.dump({"results": [asdict(result) for result in results]}, report_file, indent=2)
+
+
+def summary_counts(results: List[SolverResult]) -> List[Tuple[str, int]]:
+    statuses = [result.status for result in results]
+    return [(status, statuses.count(status)) for status in sorted(set(statuses))]
+
+
+if __name__ == "__main__":
+    argument_parser = argparse.ArgumentParser(
+        prog="solver_runner",
+        description="run the solver on many transcribed forge files in parallel and collect the results as json")
+    argument_parser.add_argument("forge_file_paths", nargs="+")
+    argument_parser.add_argument("--solver_cmd", type=str, default="racket",
+                                 help="command the forge file path is appended to, any executable works")
+    argument_parser.add_argument("--split_runs", action='store_true',
+                                 help="solve every run command of a file in its own process")
+    argument_parser.add_argument("--jobs", type=int, default=None,
+                                 help="number of solvers running at once, defaults to the number of cpus")
+    argument_parser.add_argument("--timeout", type=float, default=None,
+                                 help="wall clock seconds after which a solver is killed")
+    argument_parser.add_argument("--memory_limit_mb", type=int, default=None,
+                                 help="address space limit of every solver process")
+    argument_parser.add_argument("--report", type=str, default="solver_report.json")
+    args = argument_parser.parse_args()
+
+    jobs_in_parallel = args.jobs if args.jobs is not None else os.cpu_count()
+    results = run_all(plan_jobs(args.forge_file_paths, args.split_runs), shlex.split(args.solver_cmd),
+                      jobs_in_parallel, args.timeout, args.memory_limit_mb)
+    write_report(results, args.report)
+    for result in results:
+        run_str = "" if result.run_name is None else f" {result.run_name}"
+        print(f"{result.status:<8} {result.seconds:8.3f}s  {result.forge_file_path}{run_str}")
+    print(", ".join([f"{count} {status}" for status, count in summary_counts(results)]) + f", report in {args.report}")
+    if any([result.status in ("ERROR", "MEMOUT") for result in results]):
+        sys.exit(1)
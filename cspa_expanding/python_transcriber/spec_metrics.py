@@ -0,0 +1,107 @@
+import io
+import json
+import re
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict
+
+from forge_ir import *
+from forge_passes import node_exprs
+from forge_writer import ForgeWriter
+
+# Per predicate counts of the constructs that tend to make forge slow, taken
+# from the IR right before it is printed. They are a cheap stand-in for
+# solver time when looking for the predicate to blame for a slow spec.
+
+QUANTIFIERS = ["some", "all", "one", "no"]
+# quantified formulas written straight into an expression, like
+# `some t : Timeslot | ...` inside a Raw node
+_INLINE_QUANT_RE = re.compile(r"\b(some|all|one|no)\s+[\w']+(?:\s*,\s*[\w']+)*\s*:")
+# both the transitive and the reflexive transitive closure of next, like
+# t0.(^next) or the t1.*next symmetry breaking orders strands with
+_NEXT_CLOSURE_RE = re.compile(r"[\^*]\s*next\b")
+_LEARNT_TERM_BY_RE = re.compile(r"\blearnt_term_by\[")
+
+
+@dataclass
+class PredicateMetrics:
+    quantifiers: Dict[str, int] = field(default_factory=lambda: {quantifier: 0 for quantifier in QUANTIFIERS})
+    # deepest chain of quantifier and let blocks, every let binding is a
+    # level of its own as it is printed as its own let
+    max_depth: int = 0
+    next_closures: int = 0
+    learnt_term_by: int = 0
+    lines: int = 0
+
+
+def block_depth(node: Node) -> int:
+    match node:
+        case Quant():
+            own = 1
+        case Let(bindings, _):
+            own = len(bindings)
+        case _:
+            own = 0
+    if not is_block(node):
+        return 0
+    return own + max([0] + [block_depth(child) for child in node.body])
+
+
+def count_quantifiers(node: Node, counts: Dict[str, int]) -> None:
+    if isinstance(node, Quant) and node.quantifier in counts:
+        counts[node.quantifier] += 1
+    if is_block(node):
+        for child in node.body:
+            count_quantifiers(child, counts)
+
+
+def count_calls(node: Node, pred_name: str) -> int:
+    if isinstance(node, Call):
+        return 1 if node.pred_name == pred_name else 0
+    if is_block(node):
+        return sum([count_calls(child, pred_name) for child in node.body])
+    return 0
+
+
+def printed_lines(node: Node) -> int:
+    output = io.StringIO()
+    writer = ForgeWriter(output)
+    ForgePrinter(writer).print_node(node)
+    writer.flush()
+    return output.getvalue().count("\n")
+
+
+def pred_metrics(pred: Pred) -> PredicateMetrics:
+    metrics = PredicateMetrics()
+    count_quantifiers(pred, metrics.quantifiers)
+    exprs = node_exprs(pred)
+    for expr in exprs:
+        for match_obj in _INLINE_QUANT_RE.finditer(expr):
+            metrics.quantifiers[match_obj.group(1)] += 1
+    metrics.max_depth = block_depth(pred)
+    metrics.next_closures = sum([len(_NEXT_CLOSURE_RE.findall(expr)) for expr in exprs])
+    metrics.learnt_term_by = (count_calls(pred, "learnt_term_by") +
+                              sum([len(_LEARNT_TERM_BY_RE.findall(expr)) for expr in exprs]))
+    metrics.lines = printed_lines(pred)
+    return metrics
+
+
+class MetricsCollector:
+    """IR pass that leaves every node as it is and records the metrics of
+    each top level predicate under its name, has to be the last pass so it
+    sees what is printed"""
+
+    def __init__(self) -> None:
+        self.metrics: Dict[str, PredicateMetrics] = {}
+
+    def __call__(self, node: Node) -> Node:
+        if isinstance(node, Pred):
+            self.metrics[node.name] = pred_metrics(node)
+        return node
+
+    def report(self) -> Dict[str, Dict]:
+        return {pred_name: asdict(metrics) for pred_name, metrics in self.metrics.items()}
+
+    def write_report(self, report_path: str | Path) -> None:
+        with open(report_path, "w") as report_file:
+            json.dump(self.report(), report_file, indent=2)
@@ -0,0 +1,91 @@
+import re
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Tuple
+
+import solver_runner
+
+
+def name_pattern(name: str) -> re.Pattern:
+    return re.compile(rf"\b{re.escape(name)}\b")
+
+
+@dataclass
+class SplitRecorder:
+    """keeps a copy of every piece main writes to the destination file so the
+    same text can also be written as one self-contained file per skeleton.
+    Pieces are the header (base files and protocol), the skeletons, the
+    instances and the run file"""
+    transcr: object
+    enabled: bool
+    header: List[str] = field(default_factory=list)
+    skeletons: List[Tuple[str, str]] = field(default_factory=list)
+    instances: List[Tuple[str, str]] = field(default_factory=list)
+    run_txt: str = ""
+
+    @contextmanager
+    def piece(self, kind: str, name: str = ""):
+        """everything written inside the with block is recorded as a piece of
+        kind header, skeleton, instance or run and then written on to the
+        destination unchanged"""
+        if not self.enabled:
+            yield
+            return
+        with self.transcr.capture() as captured:
+            yield
+        txt = captured.getvalue()
+        self.transcr.print_to_file(txt, add_space=False)
+        match kind:
+            case "header":
+                self.header.append(txt)
+            case "skeleton":
+                self.skeletons.append((name, txt))
+            case "instance":
+                self.instances.append((name, txt))
+            case "run":
+                self.run_txt += txt
+            case _:
+                raise ValueError(f"unknown piece kind {kind}")
+
+    def split_files(self, per_instance: bool) -> List[Tuple[str, str]]:
+        """file stem and text of every split file. Each file has the header,
+        one skeleton and, per_instance, one instance. Run commands that do not
+        use the skeleton, or that use any other skeleton or instance, are
+        commented out, a run using no skeleton at all ends up in none of the
+        files. Without per_instance every instance is kept"""
+        header_txt = "".join(self.header)
+        instance_choices = [[instance] for instance in self.instances] if per_instance else [self.instances]
+        if len(instance_choices) == 0:
+            instance_choices = [[]]
+        files = []
+        for skeleton_name, skeleton_txt in self.skeletons:
+            skeleton_pattern = name_pattern(f"constrain_{skeleton_name}")
+            for instances in instance_choices:
+                chosen_names = [instance_name for instance_name, _ in instances]
+                other_names = ([f"constrain_{other_name}" for other_name, _ in self.skeletons
+                                if other_name != skeleton_name] +
+                               [instance_name for instance_name, _ in self.instances
+                                if instance_name not in chosen_names])
+                other_patterns = [name_pattern(other_name) for other_name in other_names]
+
+                def should_keep(run_command: solver_runner.RunCommand) -> bool:
+                    return (skeleton_pattern.search(run_command.code) is not None and
+                            not any([pattern.search(run_command.code) for pattern in other_patterns]))
+
+                run_txt = solver_runner.comment_out_runs(self.run_txt, should_keep)
+                file_stem = "_".join([skeleton_name] + chosen_names) if per_instance else skeleton_name
+                files.append((file_stem, header_txt + skeleton_txt +
+                              "".join([instance_txt for _, instance_txt in instances]) + run_txt))
+        return files
+
+    def write_split_files(self, split_dir: str | Path, per_instance: bool) -> List[Path]:
+        split_dir = Path(split_dir)
+        split_dir.mkdir(parents=True, exist_ok=True)
+        paths = []
+        for file_stem, txt in self.split_files(per_instance):
+            path = split_dir / f"{file_stem}.frg"
+            with open(path, "w") as split_file:
+                split_file.write(txt)
+            paths.append(path)
+        return paths
@@ -0,0 +1,43 @@
+import io
+
+import batch_transcribe
+import main
+from main import path_rel_to_script
+
+PROT_IMPL = path_rel_to_script("../../prot_impl")
+
+
+def test_finds_protocol_folders_and_skips_incomplete_ones():
+    folders, skipped = batch_transcribe.find_protocol_folders(PROT_IMPL)
+    folder_names = [prot_folder.folder_path.name for prot_folder in folders]
+    assert "two_nonce" in folder_names
+    assert [result.folder_name for result in skipped] == ["ltk_decrypt_test"]
+    assert skipped[0].status == "skipped"
+
+
+def test_batch_output_matches_single_folder_run(tmp_path):
+    folders, _ = batch_transcribe.find_protocol_folders(PROT_IMPL)
+    folders = [prot_folder for prot_folder in folders
+               if prot_folder.folder_path.name in ("two_nonce", "kao_chow")]
+    results = batch_transcribe.transcribe_all(folders, "new", jobs=2, output_dir=tmp_path)
+    assert [(result.folder_name, result.status) for result in results] == [("kao_chow", "failed"), ("two_nonce", "ok")]
+    assert "ParseException" in results[0].message
+    assert not (tmp_path / "kao_chow_new_transcr.frg").exists()
+
+    # the same file as running the transcriber on its own
+    destination_forge_file = io.StringIO()
+    with open(folders[1].rkt_file_path) as cpsa_file:
+        with open(path_rel_to_script("./base_with_seq.frg")) as base_file:
+            with open(path_rel_to_script("./extra_funcs.frg")) as extra_func_file:
+                with open(folders[1].run_forge_file_path) as run_forge_file:
+                    main.main(cpsa_file, destination_forge_file, base_file, extra_func_file,
+                              run_forge_file, False, None)
+    assert (tmp_path / "two_nonce_new_transcr.frg").read_text() == destination_forge_file.getvalue()
+
+
+def test_output_dir_is_created(tmp_path):
+    folders, _ = batch_transcribe.find_protocol_folders(PROT_IMPL)
+    two_nonce = [prot_folder for prot_folder in folders if prot_folder.folder_path.name == "two_nonce"][0]
+    result = batch_transcribe.transcribe_folder(two_nonce, "new", tmp_path / "out" / "new")
+    assert result.status == "ok"
+    assert (tmp_path / "out" / "new" / "two_nonce_new_transcr.frg").exists()
@@ -0,0 +1,29 @@
+import io
+
+import benchmark_transcriber
+import parser
+import sexp_reader
+from main import path_rel_to_script
+
+PROT_IMPL = path_rel_to_script("../../prot_impl")
+
+
+def test_scaled_protocol_copies_roles_and_skeletons():
+    seed_txt = (PROT_IMPL / benchmark_transcriber.SCALING_SEED).read_text()
+    forms = list(sexp_reader.load_cspa_forms(io.StringIO(benchmark_transcriber.scaled_protocol(seed_txt, 3))))
+    protocol = parser.parse_protocol(forms[0])
+    assert [role.role_name for role in protocol.role_arr] == ["A", "B", "S", "A_1", "B_1", "S_1", "A_2", "B_2", "S_2"]
+    skeletons = [parser.parse_skeleton(form, protocol) for form in forms[1:]]
+    assert [skeleton.constraints_list[0].role_name for skeleton in skeletons] == ["S", "S_1", "S_2"]
+
+
+def test_every_phase_is_timed(tmp_path):
+    cpsa_path = PROT_IMPL / "two_nonce" / "two_nonce.rkt"
+    result = benchmark_transcriber.benchmark_case(cpsa_path, "", "two_nonce", "tuple", 2, tmp_path)
+    assert result.error is None
+    assert list(result.phases.keys()) == benchmark_transcriber.PHASES
+    assert result.phases["transcribe_instances"] > 0
+    assert result.output_bytes == (tmp_path / "tuple.frg").stat().st_size
+    result = benchmark_transcriber.benchmark_case(PROT_IMPL / "nested_seq_test" / "nested_seq_test.rkt", "",
+                                                  "nested_seq_test", "new", 2, tmp_path)
+    assert "SeqTerm" in result.error
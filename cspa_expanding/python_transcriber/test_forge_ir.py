@@ -0,0 +1,54 @@
+import io
+
+from forge_ir import *
+from forge_writer import ForgeWriter
+
+
+def print_to_str(node):
+    out = io.StringIO()
+    writer = ForgeWriter(out)
+    ForgePrinter(writer).print_node(node)
+    writer.flush()
+    return out.getvalue()
+
+
+def test_stacked_timeslots_and_lets():
+    inner = Quant("some", ["t1"], "t0.(^next)", bar=False, stacked=True,
+                  body=[Let([("a", "x[0]"), ("b", "x[1]")], [Eq("a", "b")]),
+                        Blank(),
+                        Call("learnt_term_by", ["k", "s.agent", "t1"])])
+    pred = Pred("exec_r", [Quant("some", ["t0"], "Timeslot", [inner],
+                                 bar=False, stacked=True)])
+    assert print_to_str(pred) == ("pred exec_r {\n"
+                                  "  some t0 : Timeslot {\n"
+                                  "  some t1 : t0.(^next) {\n"
+                                  "    let a  = x[0] | {\n"
+                                  "    let b  = x[1] | {\n"
+                                  "      a = b\n"
+                                  "    }}\n"
+                                  "\n"
+                                  "    learnt_term_by[k,s.agent,t1]\n"
+                                  "  }}\n"
+                                  "}\n")
+
+
+def test_sig_and_inst():
+    assert print_to_str(Sig("r", "strand", [("r_a", "one name"), ("r_b", "one text")])) == \
+        "sig r extends strand {\n  r_a : one name,\n  r_b : one text\n}\n"
+    assert print_to_str(Inst("i", [In("plaintext", "Ciphertext -> (0) -> mesg"), Raw("no ltks")])) == \
+        "inst i {\n  plaintext in Ciphertext -> (0) -> mesg\n  no ltks\n}\n"
+
+
+def test_builder_applies_passes_to_top_level_nodes():
+    out = io.StringIO()
+    writer = ForgeWriter(out)
+    builder = IRBuilder(writer)
+    builder.passes.append(lambda node: Pred(node.name + "_renamed", node.body))
+    builder.open_block(Pred("p"))
+    builder.open_block(Quant("all", ["s"], "S"))
+    builder.emit(NotEq("s", "s"))
+    builder.close_block()
+    assert out.getvalue() == ""
+    builder.close_block()
+    writer.flush()
+    assert out.getvalue() == "pred p_renamed {\n  all s : S | {\n    s != s\n  }\n}\n"
@@ -0,0 +1,65 @@
+from forge_ir import *
+from forge_passes import CommonSubexprHoister, LetInliner, count_uses
+
+
+def seq_let():
+    return Pred("p", [Eq("inds[(t0.data)]", "0+1"),
+                      Let([("name_1", "((t0.data))[0]"), ("enc_2", "((t0.data))[1]")],
+                          [Eq("(t0.data)", "0->name_1 + 1->enc_2"),
+                           Eq("name_1", "s.a"),
+                           Eq("(enc_2).encryptionKey", "getLTK[s.a,s.b]"),
+                           In("(enc_2).plaintext", "Ciphertext")])])
+
+
+def test_fixed_component_is_replaced_and_equality_dropped():
+    inliner = LetInliner()
+    pred = inliner(seq_let())
+    assert inliner.removed == 1
+    let = pred.body[1]
+    assert let.bindings == [("enc_2", "((t0.data))[1]")]
+    assert let.body[0] == Eq("(t0.data)", "0->s.a + 1->enc_2")
+    assert count_uses("name_1", [pred]) == 0
+    assert Eq("name_1", "s.a") not in let.body
+
+
+def test_single_use_and_unused_bindings():
+    inliner = LetInliner()
+    pred = inliner(Pred("p", [Let([("a", "x.f + y"), ("b", "z")],
+                                  [In("a", "Key"), Eq("w.a", "w.b")])]))
+    assert inliner.removed == 2
+    assert pred.body == [In("(x.f + y)", "Key"), Eq("w.a", "w.b")]
+
+
+def test_equality_not_implied_is_kept_on_the_bound_expression():
+    inliner = LetInliner()
+    pred = inliner(Pred("p", [Let([("k", "(s.data).key")],
+                                  [Eq("k", "getLTK[s.a,s.b]"),
+                                   In("k", "Key")])]))
+    assert pred.body == [Eq("(s.data).key", "getLTK[s.a,s.b]"),
+                         In("getLTK[s.a,s.b]", "Key")]
+
+
+def test_repeated_key_and_data_expressions_are_hoisted():
+    key = "getLTK[s.a,s.b]"
+    timeslot = Quant("some", ["t0"], "Timeslot", bar=False, stacked=True, body=[
+        Eq("inds[(t0.data)]", "0"),
+        Eq("(t0.data)", "0->enc_1"),
+        Eq("(enc_1).encryptionKey", key),
+        Call("learnt_term_by", [key, "s.agent", "t0"])])
+    pred = Pred("exec_r", [Quant("all", ["s"], "r", [timeslot])])
+    hoister = CommonSubexprHoister()
+    pred = hoister(pred)
+    assert hoister.hoisted == 2
+    strand_quant = pred.body[0]
+    assert strand_quant.body[0].bindings == [("cse_2", key)]
+    timeslot = strand_quant.body[0].body[0]
+    let = timeslot.body[0]
+    assert let.bindings == [("cse_1", "(t0.data)")]
+    assert let.body == [Eq("inds[cse_1]", "0"), Eq("cse_1", "0->enc_1"),
+                        Eq("(enc_1).encryptionKey", "cse_2"),
+                        Call("learnt_term_by", ["cse_2", "s.agent", "t0"])]
+
+
+def test_hoisting_only_touches_role_predicates():
+    pred = Pred("constrain_skeleton_p_0", [Eq("a", "getPUBK[x]"), Eq("b", "getPUBK[x]")])
+    assert CommonSubexprHoister()(pred) == pred
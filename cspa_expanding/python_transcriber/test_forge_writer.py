@@ -0,0 +1,36 @@
+import io
+
+from forge_writer import ForgeWriter
+
+
+def test_indentation_and_chunked_flush():
+    out = io.StringIO()
+    writer = ForgeWriter(out, chunk_size=9)
+    writer.write("pred p {\n")
+    assert out.getvalue() == "pred p {\n"
+    writer.write("a = b\n", 2)
+    writer.write("}\n")
+    assert out.getvalue() == "pred p {\n"
+    writer.flush()
+    assert out.getvalue() == "pred p {\n    a = b\n}\n"
+
+
+def test_capture_is_not_flushed():
+    out = io.StringIO()
+    writer = ForgeWriter(out, chunk_size=1)
+    writer.write("x\n")
+    with writer.capture() as captured:
+        writer.write("inner\n", 1)
+    writer.flush()
+    assert captured.getvalue() == "  inner\n"
+    assert out.getvalue() == "x\n"
+
+
+def test_direct_fd(tmp_path):
+    path = tmp_path / "out.frg"
+    with open(path, "w") as out:
+        out.write("#lang forge\n")
+        writer = ForgeWriter(out, direct_fd=True)
+        writer.write_file(io.StringIO("a\n\nb\n"), 1)
+        writer.flush()
+    assert path.read_text() == "#lang forge\n  a\n\n  b\n"
@@ -0,0 +1,65 @@
+import io
+
+import incremental
+import new_transcribe
+import parser
+import sexp_reader
+from type_and_helpers import Skeleton
+
+RKT_FILE = "../../prot_impl/new_otway_rees/new_otway_rees.rkt"
+
+
+def load(txt):
+    forms = list(sexp_reader.iter_top_level_forms(txt))
+    protocol = parser.parse_protocol(forms[0])
+    return protocol, [parser.parse_skeleton(form, protocol) for form in forms[1:]]
+
+
+def transcribe_full(protocol, skeletons):
+    transcr = new_transcribe.Transcribe_obj(io.StringIO())
+    new_transcribe.transcribe_protocol(protocol, transcr)
+    for skel_indx, skeleton in enumerate(skeletons):
+        new_transcribe.transcribe_skeleton(skeleton, protocol, transcr, skel_indx)
+    transcr.flush()
+    return transcr.file.getvalue()
+
+
+def transcribe_cached(protocol, skeletons, cache_path):
+    transcr = new_transcribe.Transcribe_obj(io.StringIO())
+    fragment_cache = incremental.FragmentCache(cache_path)
+    incremental.transcribe_incrementally(new_transcribe, protocol, skeletons,
+                                         transcr, fragment_cache)
+    fragment_cache.save()
+    transcr.flush()
+    transcr.flush()
+    return transcr.file.getvalue(), fragment_cache
+
+
+def test_incremental_matches_full_transcription(tmp_path):
+    with open(RKT_FILE) as rkt_file:
+        rkt_file.readline()
+        txt = rkt_file.read()
+    protocol, skeletons = load(txt)
+    assert all(isinstance(skeleton, Skeleton) for skeleton in skeletons)
+    cache_path = tmp_path / "fragments.json"
+
+    first_txt, first_cache = transcribe_cached(protocol, skeletons, cache_path)
+    assert first_txt == transcribe_full(protocol, skeletons)
+    assert first_cache.reused == []
+
+    second_txt, second_cache = transcribe_cached(protocol, skeletons, cache_path)
+    assert second_txt == first_txt
+    assert second_cache.transcribed == []
+
+
+def test_only_changed_skeleton_is_transcribed(tmp_path):
+    with open(RKT_FILE) as rkt_file:
+        rkt_file.readline()
+        txt = rkt_file.read()
+    protocol, skeletons = load(txt)
+    cache_path = tmp_path / "fragments.json"
+    transcribe_cached(protocol, skeletons, cache_path)
+
+    skeletons[0].constraints_list = skeletons[0].constraints_list[1:]
+    _, fragment_cache = transcribe_cached(protocol, skeletons, cache_path)
+    assert fragment_cache.transcribed == [f"skeleton_{protocol.protocol_name}_0"]
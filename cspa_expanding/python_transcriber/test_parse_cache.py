@@ -0,0 +1,40 @@
+import parser
+import parse_cache
+import sexp_reader
+
+
+def load_forms(rkt_file_path):
+    with open(rkt_file_path) as rkt_file:
+        return list(sexp_reader.load_cspa_source_forms(rkt_file))
+
+
+def parse_all(cache, forms):
+    protocol = parse_cache.parse_form(cache, forms[0], parser.parse_protocol)
+    skeletons = [
+        parse_cache.parse_form(cache, form, parser.parse_skeleton, protocol,
+                               depends_on=[forms[0]]) for form in forms[1:]
+    ]
+    return protocol, skeletons
+
+
+def test_cache_hit_returns_equal_objects(tmp_path):
+    forms = load_forms("../../prot_impl/new_otway_rees/new_otway_rees.rkt")
+    uncached = parse_all(None, forms)
+
+    first_cache = parse_cache.ParseCache(tmp_path)
+    assert parse_all(first_cache, forms) == uncached
+    assert first_cache.hits == 0
+
+    second_cache = parse_cache.ParseCache(tmp_path)
+    assert parse_all(second_cache, forms) == uncached
+    assert second_cache.misses == 0
+    assert second_cache.hits == len(forms)
+
+
+def test_skeleton_key_depends_on_protocol(tmp_path):
+    forms = load_forms("../../prot_impl/new_otway_rees/new_otway_rees.rkt")
+    cache = parse_cache.ParseCache(tmp_path)
+    changed_prot_form = sexp_reader.SourceForm(forms[0].s_expr,
+                                               forms[0].text + " ", 0, 0, 0, 0)
+    key = cache.key_for("parse_skeleton", forms[1], [forms[0]])
+    assert key != cache.key_for("parse_skeleton", forms[1], [changed_prot_form])
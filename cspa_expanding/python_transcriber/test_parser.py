@@ -132,3 +132,27 @@ def test_hash_term_test_parsing():
     helper_for_test_rkt_file(
         r"../../prot_impl/hash_term_test/hash_term_test.rkt"
     )
+
+
+def test_equal_terms_are_shared():
+    import io
+    import pickle
+    import sexp_reader
+    from main import path_rel_to_script
+    from type_and_helpers import EncTerm, LtkTerm, make_term
+    with open(path_rel_to_script("../../prot_impl/new_otway_rees/new_otway_rees.rkt")) as cpsa_file:
+        forms = list(sexp_reader.load_cspa_forms(cpsa_file))
+    protocol = parser.parse_protocol(forms[0])
+    role_a, _, role_s = protocol.role_arr
+    # (enc na a b (ltk a s)) is sent by A and received by S
+    sent = role_a.trace[0][1].data[-1]
+    received = role_s.trace[0][1].data[-2]
+    assert isinstance(sent, EncTerm) and sent is received
+    assert role_a.var_map["a"] is role_s.var_map["a"]
+    assert make_term(LtkTerm, "a", "s") is sent.key
+    skeleton = parser.parse_skeleton(forms[1], protocol)
+    assert skeleton.non_strand_vars_map["a"] is role_a.var_map["a"]
+    # the hash is rebuilt on unpickling and the copy is the canonical term again
+    assert pickle.loads(pickle.dumps(sent)) is sent
+    fresh = EncTerm(list(sent.data), sent.key)
+    assert fresh == sent and hash(fresh) == hash(sent) and fresh is not sent
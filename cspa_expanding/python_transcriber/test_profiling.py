@@ -0,0 +1,51 @@
+import tracemalloc
+
+from profiling import Profiler
+
+
+def test_nested_phases_form_a_tree():
+    profiler = Profiler(True)
+    profiler.start()
+    with profiler.phase("write"):
+        pass
+    with profiler.phase("protocol"):
+        for role_name in ["A", "B"]:
+            with profiler.phase(f"role {role_name}"):
+                big = [0] * 100_000
+                del big
+    with profiler.phase("write"):
+        pass
+    profiler.finish()
+    assert not tracemalloc.is_tracing()
+    root = profiler.root
+    assert [record.name for record in root.children] == ["write", "protocol"]
+    write, protocol = root.children
+    assert write.calls == 2
+    assert [record.name for record in protocol.children] == ["role A", "role B"]
+    # the list of the roles is the largest allocation of the run
+    assert protocol.children[0].peak_kb > 700
+    assert protocol.peak_kb >= protocol.children[0].peak_kb
+    assert root.peak_kb >= protocol.peak_kb
+    assert root.seconds >= protocol.seconds >= sum([record.seconds for record in protocol.children])
+
+
+def test_disabled_profiler_records_nothing():
+    profiler = Profiler()
+    profiler.start()
+    with profiler.phase("protocol"):
+        pass
+    profiler.finish()
+    assert profiler.root.children == []
+    assert not tracemalloc.is_tracing()
+
+
+def test_failed_run_stops_tracing():
+    profiler = Profiler(True)
+    try:
+        with profiler.running():
+            with profiler.phase("protocol"):
+                raise ValueError("transcription failed")
+    except ValueError:
+        pass
+    assert not tracemalloc.is_tracing()
+    assert profiler.open_phases == []
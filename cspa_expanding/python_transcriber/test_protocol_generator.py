@@ -0,0 +1,68 @@
+import io
+
+import pytest
+
+import parser
+import protocol_generator
+import scope_inference
+import sexp_reader
+from type_and_helpers import *
+
+
+def parse_generated(params: protocol_generator.GeneratorParams):
+    forms = list(sexp_reader.load_cspa_forms(io.StringIO(protocol_generator.generate_protocol(params))))
+    protocol = parser.parse_protocol(forms[0])
+    return protocol, forms[1:]
+
+
+def test_generated_protocol_has_the_requested_shape():
+    params = protocol_generator.GeneratorParams(roles=3, trace_length=5, enc_depth=3, tuple_width=3,
+                                                nonces=2, skeleton_constraints=6)
+    protocol, forms = parse_generated(params)
+    assert protocol.protocol_name == params.protocol_name()
+    assert [role.role_name for role in protocol.role_arr] == ["R0", "R1", "R2"]
+    for role in protocol.role_arr:
+        assert len(role.trace) == 5
+        assert [send_recv for send_recv, _ in role.trace][:2] == [SendRecv.SEND, SendRecv.RECV]
+        assert max([scope_inference.enc_nesting_depth(msg) for _, msg in role.trace]) == 3
+    assert len(forms) == 1
+    skeleton = parser.parse_skeleton(forms[0], protocol)
+    assert len(skeleton.constraints_list) == 6
+    assert skeleton.constraints_list[0].role_name == "R0"
+
+
+def test_generated_instance_parses_back():
+    params = protocol_generator.GeneratorParams(roles=2, with_instance=True)
+    protocol, forms = parse_generated(params)
+    instance = parser.parse_instance(forms[1], protocol)
+    assert instance.role_counts == {"R0": 1, "R1": 1}
+    assert instance.encryption_depth >= params.enc_depth
+
+
+@pytest.mark.parametrize("params", [
+    protocol_generator.GeneratorParams(),
+    protocol_generator.GeneratorParams(roles=3, trace_length=6, nonces=4, skeleton_constraints=8),
+    protocol_generator.GeneratorParams(roles=4, trace_length=4, tuple_width=5, nonces=3, skeleton_constraints=8),
+])
+def test_uniq_orig_nonces_have_one_originator(params):
+    protocol, forms = parse_generated(params)
+    skeleton = parser.parse_skeleton(forms[0], protocol)
+    uniq_terms = [repr(term) for constraint in skeleton.constraints_list
+                  if isinstance(constraint, UniqOrig) for term in constraint.terms]
+    assert len(uniq_terms) > 0
+    for term in uniq_terms:
+        originators = [role.role_name for role in protocol.role_arr
+                       if term in [repr(orig) for orig in scope_inference.originated_terms(role, len(role.trace))]]
+        assert len(originators) == 1, f"{term} originated by {originators}"
+
+
+def test_instance_protocols_use_no_ltks():
+    protocol, _ = parse_generated(protocol_generator.GeneratorParams(enc_depth=3, with_instance=True))
+    assert not any([isinstance(term, LtkTerm) for term in scope_inference.protocol_terms(protocol)])
+
+
+def test_invalid_params_are_rejected():
+    with pytest.raises(ValueError):
+        protocol_generator.generate_protocol(protocol_generator.GeneratorParams(trace_length=1))
+    with pytest.raises(ValueError):
+        protocol_generator.generate_protocol(protocol_generator.GeneratorParams(enc_depth=-1))
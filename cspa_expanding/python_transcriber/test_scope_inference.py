@@ -0,0 +1,76 @@
+import warnings
+from dataclasses import replace
+
+import pytest
+
+import parser
+import scope_inference
+import sexp_reader
+from type_and_helpers import *
+
+PROT_IMPL = "../../prot_impl"
+
+
+def load(folder):
+    with open(f"{PROT_IMPL}/{folder}/{folder}.rkt") as cpsa_file:
+        forms = list(sexp_reader.load_cspa_forms(cpsa_file))
+    protocol = parser.parse_protocol(forms[0])
+    skeletons = []
+    for form in forms[1:]:
+        match str(form[0]):
+            case "defskeleton":
+                skeletons.append(parser.parse_skeleton(form, protocol))
+            case "defaltinstance":
+                skeletons.append(parser.parse_alt_instance(form, protocol))
+    return protocol, skeletons
+
+
+def test_inferred_alt_instance_matches_hand_written_attack_bounds():
+    protocol, skeletons = load("andrew_secure_rpc")
+    attack_run_bounds = [skel for skel in skeletons if isinstance(skel, AltInstanceBounds)
+                         and skel.instance_name == "attack_run_bounds"][0]
+    inferred = scope_inference.infer_alt_instance("inferred", protocol, skeletons)
+    assert inferred.sig_counts == attack_run_bounds.sig_counts
+    assert inferred.role_counts == attack_run_bounds.role_counts
+    assert inferred.have_ltks
+
+
+def test_inferred_instance_counts_one_honest_run():
+    protocol, skeletons = load("nspk")
+    inferred = scope_inference.infer_instance("inferred", protocol, skeletons)
+    assert inferred.role_counts == {"A": 1, "B": 1, "S": 1}
+    # 5 + 5 + 4 events, the nonces na and nb
+    assert inferred.sig_counts[TIMESLOT_SIG] == 14
+    assert inferred.sig_counts[TEXT_SIG] == 2
+    assert inferred.sig_counts[SKEY_SIG] == 0
+    assert inferred.sig_counts[PUBK_SIG] == inferred.sig_counts[NAME_SIG] == 4
+    assert inferred.encryption_depth == 2
+
+
+def test_ltk_protocols_need_an_alt_instance():
+    protocol, skeletons = load("new_otway_rees")
+    with pytest.raises(ParseException, match=HAVE_LTKS):
+        scope_inference.infer_instance("inferred", protocol, skeletons)
+    inferred = scope_inference.infer_alt_instance("inferred", protocol, skeletons)
+    assert inferred.have_ltks
+    # one ltk for each pair of the 4 names and the session key kab
+    assert inferred.sig_counts[SKEY_SIG] == 6 + 1
+
+
+def test_loose_index_bounds_are_tightened_with_a_warning():
+    protocol, skeletons = load("andrew_secure_rpc")
+    attack_run_bounds = [skel for skel in skeletons if isinstance(skel, AltInstanceBounds)][1]
+    loose = replace(attack_run_bounds, tuple_length=6)
+    with pytest.warns(UserWarning, match="tuple-length 6"):
+        tightened = scope_inference.tighten_index_bounds(loose, protocol, skeletons)
+    assert tightened.tuple_length == 2
+
+    protocol, skeletons = load("nspk")
+    inferred = scope_inference.infer_instance("inferred", protocol, skeletons)
+    with pytest.warns(UserWarning, match="enc-depth 7"):
+        tightened = scope_inference.tighten_index_bounds(replace(inferred, encryption_depth=7),
+                                                         protocol, skeletons)
+    assert tightened.encryption_depth == 2
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        assert scope_inference.tighten_index_bounds(inferred, protocol, skeletons) == inferred
@@ -0,0 +1,52 @@
+import re
+
+import parser
+import scope_sweep
+import sexp_reader
+import solver_runner
+from main import path_rel_to_script
+from type_and_helpers import *
+
+CPSA_PATH = path_rel_to_script("../../prot_impl/two_nonce/two_nonce.rkt")
+RUN_FORGE_TXT = "two_nonce_run : run { wellformed } for tight\n"
+
+
+def read_cpsa():
+    with open(CPSA_PATH) as cpsa_file:
+        return cpsa_file.read()
+
+
+def test_grown_instance_round_trips_through_the_parser():
+    start = scope_sweep.start_instance(read_cpsa(), False, None, "tight")
+    grown = scope_sweep.grow_instance(start, {TIMESLOT_SIG: 2, TEXT_SIG: 1, NAME_SIG: 1, "init": 1}, 2)
+    assert grown.sig_counts[TIMESLOT_SIG] == start.sig_counts[TIMESLOT_SIG] + 4
+    assert grown.sig_counts[PUBK_SIG] == grown.sig_counts[NAME_SIG] == start.sig_counts[NAME_SIG] + 2
+    assert grown.sig_counts[MESG_SIG] == start.sig_counts[MESG_SIG] + 2 + 2 + 4
+    assert grown.role_counts["init"] == start.role_counts["init"] + 2
+    forms = list(sexp_reader.iter_top_level_forms(read_cpsa().split("\n", 1)[1]))
+    protocol = parser.parse_protocol(forms[0])
+    assert parser.parse_instance(sexp_reader.iter_top_level_forms(scope_sweep.instance_to_cpsa(grown)).__next__(),
+                                 protocol) == grown
+
+
+def test_sweep_stops_at_the_first_sat_scope(tmp_path):
+    start = scope_sweep.start_instance(read_cpsa(), False, None, "tight")
+    solved = []
+
+    # stand-in solver, finds a run once there are 10 timeslots
+    def runner(forge_file_path):
+        with open(forge_file_path) as forge_file:
+            timeslot_line = re.search(r"^\s*Timeslot = (.*)$", forge_file.read(), re.MULTILINE).group(1)
+        solved.append(forge_file_path)
+        status = "SAT" if timeslot_line.count("`Timeslot") >= 10 else "UNSAT"
+        return solver_runner.SolverResult(forge_file_path, None, status, 0.1, 0)
+
+    points = scope_sweep.sweep(read_cpsa(), RUN_FORGE_TXT, start, {TIMESLOT_SIG: 2}, 10, tmp_path, runner)
+    assert start.sig_counts[TIMESLOT_SIG] == 6
+    assert [(point.step, point.status) for point in points] == [(0, "UNSAT"), (1, "UNSAT"), (2, "SAT")]
+    assert "inst tight {" in open(points[2].forge_file_path).read()
+    assert RUN_FORGE_TXT in open(points[2].forge_file_path).read()
+
+    # two scope points at a time, the whole batch holding the first SAT is solved
+    points = scope_sweep.sweep(read_cpsa(), RUN_FORGE_TXT, start, {TIMESLOT_SIG: 2}, 10, tmp_path / "jobs", runner, jobs=2)
+    assert [(point.step, point.status) for point in points] == [(0, "UNSAT"), (1, "UNSAT"), (2, "SAT"), (3, "SAT")]
@@ -0,0 +1,60 @@
+import glob
+import io
+import pytest
+import sexpdata
+import sexp_reader
+from type_and_helpers import ParseException
+from main import get_root_s_expr_lst
+
+
+def test_forms_match_sexpdata():
+    txt = """
+(defprotocol two_nonce basic
+    (defrole init (vars (a b name) (n1 n2 text))
+        (trace (send (enc n1 (pubk b))) (recv (enc n1 n2 (pubk a))))))
+(definstance single (Timeslot 6) (enc-depth 2) (comment "a (string)"))
+"""
+    forms = list(sexp_reader.iter_top_level_forms(txt))
+    assert len(forms) == 2
+    assert forms[0] == sexpdata.loads(txt[:txt.index("(definstance")])
+    assert forms[1] == sexpdata.loads(txt[txt.index("(definstance"):])
+
+
+def test_brackets_in_comments_are_ignored():
+    txt = "(a b) ;; (unclosed\n(c ;; ) extra\n d)"
+    forms = list(sexp_reader.iter_top_level_forms(txt))
+    assert forms == [[sexpdata.Symbol("a"), sexpdata.Symbol("b")],
+                     [sexpdata.Symbol("c"), sexpdata.Symbol("d")]]
+
+
+def test_is_a_generator():
+    forms = sexp_reader.iter_top_level_forms("(a) (b")
+    assert next(forms) == [sexpdata.Symbol("a")]
+    with pytest.raises(ParseException):
+        next(forms)
+
+
+def test_unbalanced_close():
+    with pytest.raises(ParseException):
+        list(sexp_reader.iter_top_level_forms("(a))"))
+
+
+def test_all_example_files():
+    for rkt_file_path in glob.glob("../../prot_impl/*/*.rkt"):
+        with open(rkt_file_path) as rkt_file:
+            forms = list(sexp_reader.load_cspa_forms(rkt_file))
+        for form in forms:
+            assert isinstance(form, list)
+
+
+def test_source_form_spans():
+    txt = "#lang forge/domains/crypto\n;; (not a form)\n(a \"x)\"\n b)\n\n(c)\n"
+    forms = list(sexp_reader.load_cspa_source_forms(io.StringIO(txt)))
+    assert [form.text for form in forms] == ["(a \"x)\"\n b)", "(c)"]
+    assert [(form.start_line, form.end_line) for form in forms] == [(3, 4), (6, 6)]
+    for form in forms:
+        assert txt.encode()[form.start_offset:form.end_offset].decode() == form.text
+
+
+def test_get_root_s_expr_lst_skips_comments():
+    assert get_root_s_expr_lst("(a) ;; )(\n(b (c))") == ["(a)", "(b (c))"]
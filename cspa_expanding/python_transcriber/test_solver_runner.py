@@ -0,0 +1,80 @@
+import json
+import os
+import stat
+import sys
+
+import solver_runner
+
+FORGE_TXT = """#lang forge
+/*
+    old_run : run {}
+*/
+pred p { some Timeslot }
+option run_sterling "viz.js"
+
+first_run : run {
+    p
+} for exactly 3 Int
+
+-- commented : run {}
+unsat_run : run { not p }
+    for {next is linear}
+slow_run : run { p }
+"""
+
+# stand-in for racket, answers every run command left in the file
+STAND_IN_SOLVER = """import re, sys, time
+txt = open(sys.argv[1]).read()
+for name in re.findall(r"^(\\w+) : run", txt, re.MULTILINE):
+    if name == "slow_run":
+        time.sleep(30)
+    if name == "hungry_run":
+        hoard = bytearray(1 << 30)
+    print(f"{name}: " + ("Unsat" if name.startswith("unsat") else "Sat"))
+"""
+
+
+def make_stand_in(tmp_path):
+    script_path = tmp_path / "fake_racket"
+    script_path.write_text(f"#!{sys.executable}\n" + STAND_IN_SOLVER)
+    script_path.chmod(script_path.stat().st_mode | stat.S_IEXEC)
+    return [str(script_path)]
+
+
+def test_run_commands_outside_comments_are_found():
+    run_commands = solver_runner.find_run_commands(FORGE_TXT)
+    assert [run_command.name for run_command in run_commands] == ["first_run", "unsat_run", "slow_run"]
+    lines = FORGE_TXT.split("\n")
+    assert lines[run_commands[1].start_line] == "unsat_run : run { not p }"
+    assert run_commands[1].end_line == run_commands[2].start_line
+
+    isolated = solver_runner.isolate_run(FORGE_TXT, "unsat_run")
+    assert [run_command.name for run_command in solver_runner.find_run_commands(isolated)] == ["unsat_run"]
+    assert "option run_sterling off\n-- first_run : run {" in isolated
+
+
+def test_split_runs_are_solved_in_parallel_with_timeout(tmp_path):
+    forge_path = tmp_path / "prot.frg"
+    forge_path.write_text(FORGE_TXT)
+    jobs = solver_runner.plan_jobs([str(forge_path)], split_runs=True)
+    results = solver_runner.run_all(jobs, make_stand_in(tmp_path), 3, timeout=2)
+    assert [(result.run_name, result.status) for result in results] == [
+        ("first_run", "SAT"), ("unsat_run", "UNSAT"), ("slow_run", "TIMEOUT")]
+    assert results[0].output == "first_run: Sat\n"
+    # the copies with a single run command are removed again
+    assert sorted(os.listdir(tmp_path)) == ["fake_racket", "prot.frg"]
+
+    report_path = tmp_path / "report.json"
+    solver_runner.write_report(results, report_path)
+    report = json.loads(report_path.read_text())
+    assert report["results"][1]["outcomes"] == ["UNSAT"]
+    assert report["results"][2]["returncode"] is None
+
+
+def test_memory_limit_turns_a_big_allocation_into_memout(tmp_path):
+    forge_path = tmp_path / "hungry.frg"
+    forge_path.write_text("#lang forge\nhungry_run : run {}\nsmall_run : run {}\n")
+    jobs = solver_runner.plan_jobs([str(forge_path)], split_runs=True)
+    results = solver_runner.run_all(jobs, make_stand_in(tmp_path), 2, timeout=20, memory_limit_mb=256)
+    assert [(result.run_name, result.status) for result in results] == [
+        ("hungry_run", "MEMOUT"), ("small_run", "SAT")]
@@ -0,0 +1,40 @@
+from forge_ir import *
+from spec_metrics import MetricsCollector, pred_metrics
+
+
+def exec_pred():
+    return Pred("exec_A", [
+        Quant("all", ["arbitrary_A"], "A", [
+            Quant("some", ["t0"], "Timeslot", [
+                Quant("some", ["t1"], "t0.(^next)", [
+                    Let([("enc_1", "(t1.data)[0]"), ("enc_2", "(t1.data)[1]")], [
+                        Eq("enc_1.encryptionKey", "getLTK[arbitrary_A.a,arbitrary_A.b]"),
+                        Call("learnt_term_by", ["enc_2", "arbitrary_A.agent", "t1"]),
+                    ]),
+                ], bar=False, stacked=True),
+            ], bar=False, stacked=True),
+            Raw("no aStrand : strand | { aStrand.agent = arbitrary_A.agent }"),
+            Implies("some t1.data", [Raw("learnt_term_by[arbitrary_A.n,Attacker,t0.(^next)]")]),
+            Raw("some t2 : t1.*next | t2 in t0.next"),
+        ]),
+    ])
+
+
+def test_counts_of_one_predicate():
+    metrics = pred_metrics(exec_pred())
+    # `some t1.data` is a multiplicity check, not a quantifier
+    assert metrics.quantifiers == {"some": 3, "all": 1, "one": 0, "no": 1}
+    assert metrics.max_depth == 5
+    # ^next and *next but not the plain t0.next
+    assert metrics.next_closures == 3
+    assert metrics.learnt_term_by == 2
+    assert metrics.lines == 17
+
+
+def test_collector_leaves_nodes_alone():
+    collector = MetricsCollector()
+    pred = exec_pred()
+    assert collector(pred) is pred
+    assert collector(Inst("bounds")) == Inst("bounds")
+    assert list(collector.report().keys()) == ["exec_A"]
+    assert collector.report()["exec_A"]["lines"] == 17
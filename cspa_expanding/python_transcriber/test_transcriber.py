@@ -1,5 +1,13 @@
+import pytest
 from main import main,path_rel_to_script
+from type_and_helpers import ParseException, TIMESLOT_SIG
+import parser
+import scope_inference
+import scope_sweep
+import sexp_reader
 import io
+import json
+import re
 
 #TODO: figure out how to improve diff output here
 # currently as the strings being compared are large the current way diff is
@@ -26,3 +34,229 @@ import io
 #     with open(reference_transcription_file) as reference_file:
 #         correct_txt = reference_file.read()
 #         assert txt == correct_txt
+
+
+def transcribe_example(folder, rkt_name, **main_kwargs):
+    cpsa_file_path = path_rel_to_script(f"../../prot_impl/{folder}/{rkt_name}.rkt")
+    run_forge_file_path = path_rel_to_script(f"../../prot_impl/{folder}/{rkt_name}.frg")
+    destination_forge_file = io.StringIO()
+    with open(cpsa_file_path) as cpsa_file:
+        with open(path_rel_to_script("./base_with_seq.frg")) as base_file:
+            with open(path_rel_to_script("./extra_funcs.frg")) as extra_func_file:
+                with open(run_forge_file_path) as run_forge_file:
+                    main(cpsa_file,destination_forge_file,base_file,extra_func_file,run_forge_file,False,None,**main_kwargs)
+    return destination_forge_file.getvalue()
+
+
+def test_partial_strand_uses_prefix_predicate():
+    txt = transcribe_example("new_otway_rees_trace_test", "new_otway_rees_trace_test")
+    assert "pred exec_ootway_rees_B_prefix_2[arbitrary_B_ootway_rees: ootway_rees_B] {" in txt
+    assert "exec_ootway_rees_B_prefix_2[arbitrary_B_ootway_rees] or exec_ootway_rees_B_prefix_4[arbitrary_B_ootway_rees]" in txt
+    assert "exec_ootway_rees_B_prefix_2[skeleton_B_0_strand_1]" in txt
+    # roles without shorter strands keep a single predicate
+    assert "pred exec_ootway_rees_A {" in txt
+    assert "exec_ootway_rees_A_prefix" not in txt
+
+
+def test_skeleton_variables_bound_in_instance():
+    txt = transcribe_example("nspk", "nspk",
+                             infer_instance_name="tight", skeleton_bounds=True)
+    inst_txt = txt[txt.index("inst tight {"):]
+    assert "skeleton_nspk_0 = `skeleton_nspk_00" in inst_txt
+    assert "skeleton_nspk_0_a = `skeleton_nspk_00 -> `name0" in inst_txt
+    assert "skeleton_nspk_0_s = `skeleton_nspk_00 -> `name2" in inst_txt
+    assert "skeleton_nspk_0_nb = `skeleton_nspk_00 -> `text1" in inst_txt
+
+
+def test_inferred_instance_refuses_ltk_protocols():
+    with pytest.raises(ParseException, match="have-ltks"):
+        transcribe_example("new_otway_rees", "new_otway_rees", infer_instance_name="tight")
+
+
+def test_symmetry_breaking_orders_role_and_nonce_atoms():
+    txt = transcribe_example("two_nonce", "two_nonce",
+                             infer_instance_name="tight", symmetry_breaking=True)
+    assert "SymmetryOrder_text : set text -> text" in txt
+    assert "some t1 : (sender + receiver).a1 | t2 in t1.*next" in txt
+    inst_txt = txt[txt.index("inst tight {"):]
+    assert "SymmetryOrder_text = `SymmetryOrder0 -> (`text0->`text1)" in inst_txt
+    # one strand per role leaves nothing to order
+    assert "no SymmetryOrder_two_nonce_init" in inst_txt
+    with pytest.raises(RuntimeError):
+        transcribe_example("two_nonce", "two_nonce", skeleton_bounds=True, symmetry_breaking=True)
+
+
+def test_exact_time_order_replaces_next_closure():
+    txt = transcribe_example("two_nonce", "two_nonce",
+                             infer_instance_name="tight", exact_time_order=True)
+    assert "t0.(^next)" not in txt
+    assert "some t1 : t0.(TimeslotOrder.TimeslotOrder_later) {" in txt
+    # runs that do not use the inst still get the order of ^next
+    assert "pred exec_two_nonce_init {\n  TimeslotOrder.TimeslotOrder_later = ^next\n" in txt
+    inst_txt = txt[txt.index("inst tight {"):]
+    assert "TimeslotOrder_later = `TimeslotOrder0 -> (`Timeslot0->`Timeslot1 + `Timeslot0->`Timeslot2" in inst_txt
+    assert "`Timeslot4->`Timeslot5)" in inst_txt
+    with pytest.raises(RuntimeError):
+        transcribe_example("two_nonce", "two_nonce", exact_time_order=True)
+
+
+def test_exact_time_order_of_a_single_timeslot_is_empty():
+    cpsa_txt = open(path_rel_to_script("../../prot_impl/two_nonce/two_nonce.rkt")).read()
+    protocol = parser.parse_protocol(next(sexp_reader.load_cspa_forms(io.StringIO(cpsa_txt))))
+    instance = scope_inference.infer_instance("one_slot", protocol, [])
+    instance.sig_counts[TIMESLOT_SIG] = 1
+    cpsa_txt += "\n" + scope_sweep.instance_to_cpsa(instance) + "\n"
+    destination_forge_file = io.StringIO()
+    with open(path_rel_to_script("./base_with_seq.frg")) as base_file:
+        with open(path_rel_to_script("./extra_funcs.frg")) as extra_func_file:
+            main(io.StringIO(cpsa_txt),destination_forge_file,base_file,extra_func_file,io.StringIO(""),False,None,
+                 exact_time_order=True)
+    inst_txt = destination_forge_file.getvalue()
+    inst_txt = inst_txt[inst_txt.index("inst one_slot {"):]
+    assert "no next\n" in inst_txt
+    assert "no TimeslotOrder_later\n" in inst_txt
+
+
+def test_batched_orig_constraints_share_helper_predicates():
+    txt = transcribe_example("new_otway_rees", "new_otway_rees", batch_orig=True)
+    assert txt.count("pred non_orig_terms[ds: set mesg] {") == 1
+    skeleton_pred = txt[txt.index("pred constrain_skeleton_ootway_rees_0 {"):]
+    assert "no aStrand : strand" not in skeleton_pred
+    assert "non_orig_terms[getLTK[" in skeleton_pred
+    # one block per uniq-orig term, a shared helper would be expanded per term all the same
+    assert skeleton_pred.count("one aStrand : strand") == 4
+
+
+ORACLE_PROTOCOL = """#lang forge/domains/crypto
+(defprotocol oracle basic
+    (defrole A
+        (vars (a b name) (n1 text))
+        (trace
+            (send (enc n1 a (pubk b)))
+            (recv n1)))
+    (defrole B
+        (vars (a b name) (n1 text))
+        (trace
+            (recv (enc n1 a (pubk b)))
+            (send n1)))
+    (defrole C
+        (vars (c name) (n3 text))
+        (trace
+            (send (enc n3 (pubk c)))
+            (recv n3)))
+    (defrole D
+        (vars (d name) (n4 text))
+        (trace
+            (recv n4)
+            (send (cat n4 (privk d))))))
+(defskeleton oracle
+    (vars (a b name) (n1 text))
+    (defstrand A 2 (a a) (b b) (n1 n1))
+    (non-orig (privk a) (privk b))
+    (uniq-orig n1))
+"""
+
+
+def test_sliced_roles_have_no_strands():
+    destination_forge_file = io.StringIO()
+    with open(path_rel_to_script("./base_with_seq.frg")) as base_file:
+        with open(path_rel_to_script("./extra_funcs.frg")) as extra_func_file:
+            main(io.StringIO(ORACLE_PROTOCOL),destination_forge_file,base_file,extra_func_file,io.StringIO(""),False,None,
+                 infer_instance_name="tight",slice_roles=True)
+    txt = destination_forge_file.getvalue()
+    assert "pred exec_oracle_C {\n  no oracle_C\n}" in txt
+    inst_txt = txt[txt.index("inst tight {"):]
+    assert "no oracle_C" in inst_txt
+    # B decrypts what A sends and gives the attacker n1, so it has to stay
+    assert "no oracle_B" not in txt
+    # D leaks a private key that might be the one of b
+    assert "no oracle_D" not in txt
+    # S only completes when A and B made the encryptions it receives
+    txt = transcribe_example("new_otway_rees", "new_otway_rees", slice_roles=True)
+    assert "no ootway_rees_A" not in txt
+    assert "no ootway_rees_B" not in txt
+
+
+SPLIT_RUN_FILE = """first_pov : run {
+    wellformed
+    constrain_skeleton_new_reorder_terms_0
+} for tight
+
+second_pov : run {
+    wellformed
+    constrain_skeleton_new_reorder_terms_1
+} for loose
+
+both_pov : run {
+    constrain_skeleton_new_reorder_terms_0
+    constrain_skeleton_new_reorder_terms_1
+}
+"""
+
+
+def test_split_output_has_one_file_per_skeleton_and_instance(tmp_path):
+    cpsa_file_path = path_rel_to_script("../../prot_impl/new_reorder_terms/new_reorder_terms.rkt")
+    cpsa_txt = open(cpsa_file_path).read()
+    for instance_name, role_count in [("tight", 1), ("loose", 2)]:
+        cpsa_txt += (f"\n(definstance {instance_name} (A {role_count}) (B {role_count}) (Timeslot 8) (mesg 23) (Key 12)"
+                     " (name 3) (Ciphertext 4) (text 4) (Hashed 0) (akey 6) (skey 6) (Attacker 1) (PublicKey 3)"
+                     " (PrivateKey 3) (enc-depth 2))\n")
+    destination_forge_file = io.StringIO()
+    with open(path_rel_to_script("./base_with_seq.frg")) as base_file:
+        with open(path_rel_to_script("./extra_funcs.frg")) as extra_func_file:
+            main(io.StringIO(cpsa_txt),destination_forge_file,base_file,extra_func_file,io.StringIO(SPLIT_RUN_FILE),False,None,
+                 split_dir=str(tmp_path),split_per_instance=True)
+    assert sorted([path.name for path in tmp_path.iterdir()]) == [
+        "skeleton_new_reorder_terms_0_loose.frg", "skeleton_new_reorder_terms_0_tight.frg",
+        "skeleton_new_reorder_terms_1_loose.frg", "skeleton_new_reorder_terms_1_tight.frg"]
+    txt = (tmp_path / "skeleton_new_reorder_terms_0_tight.frg").read_text()
+    assert txt.startswith(destination_forge_file.getvalue()[:txt.index("one sig skeleton_new_reorder_terms_0")])
+    assert "pred constrain_skeleton_new_reorder_terms_1" not in txt
+    assert "inst loose" not in txt
+    assert "\nfirst_pov : run {" in txt
+    assert "-- second_pov : run {" in txt
+    assert "-- both_pov : run {" in txt
+    txt = (tmp_path / "skeleton_new_reorder_terms_1_loose.frg").read_text()
+    assert "\nsecond_pov : run {" in txt
+    assert "-- first_pov : run {" in txt
+    with pytest.raises(RuntimeError):
+        transcribe_example("two_nonce", "two_nonce", split_per_instance=True)
+
+
+def test_complexity_report_covers_every_emitted_predicate(tmp_path):
+    report_path = tmp_path / "complexity.json"
+    txt = transcribe_example("new_otway_rees", "new_otway_rees", complexity_report_path=str(report_path))
+    report = json.loads(report_path.read_text())
+    # the base files and the run file are copied as they are and not reported
+    emitted = re.findall(r"^pred (\w+)", txt[txt.index("pred exec_ootway_rees"):txt.index("pred prot_conditions")],
+                         re.MULTILINE)
+    assert list(report.keys()) == emitted
+    assert report["exec_ootway_rees_A"]["next_closures"] > 0
+    assert report["exec_ootway_rees_A"]["quantifiers"]["all"] == 1
+    transcribe_example("nspk", "nspk", complexity_report_path=str(report_path),
+                       exact_time_order=True, infer_instance_name="tight")
+    report = json.loads(report_path.read_text())
+    # only the one tying TimeslotOrder to ^next, which the inst makes a constant
+    assert report["exec_nspk_A"]["next_closures"] == 1
+    transcribe_example("nspk", "nspk", complexity_report_path=str(report_path),
+                       symmetry_breaking=True, infer_instance_name="tight")
+    report = json.loads(report_path.read_text())
+    # later strands of the order start at t1.*next
+    assert report["break_symmetry"]["next_closures"] > 0
+    with pytest.raises(RuntimeError):
+        transcribe_example("new_otway_rees", "new_otway_rees", complexity_report_path=str(report_path),
+                           fragment_cache_path=str(tmp_path / "fragments.json"))
+
+
+def test_profile_has_a_phase_per_role_skeleton_and_instance(tmp_path):
+    profile_path = tmp_path / "profile.json"
+    cprofile_path = tmp_path / "run.prof"
+    transcribe_example("nspk", "nspk", infer_instance_name="tight",
+                       profile_path=str(profile_path), cprofile_path=str(cprofile_path))
+    root = json.loads(profile_path.read_text())
+    phases = {record["name"]: record for record in root["children"]}
+    assert list(phases.keys()) == ["read", "sexp_parse", "ast", "scope_inference", "write", "protocol",
+                                   "skeleton skeleton_nspk_0", "instance tight"]
+    assert phases["write"]["calls"] == 2
+    assert [record["name"] for record in phases["protocol"]["children"]] == ["role A", "role B", "role S"]
+    assert cprofile_path.stat().st_size > 0
@@ -6,15 +6,22 @@ from enum import Enum
 
 from dataclasses import astuple
 from type_and_helpers import *
+from forge_writer import ForgeWriter
+from forge_ir import *
+from profiling import Profiler
 
 
 class Transcribe_obj:
 
-    def __init__(self, file: io.TextIOWrapper) -> None:
+    def __init__(self, file: io.TextIOWrapper, direct_fd: bool = False) -> None:
         self.space_lvl = 0
         self.fresh_num = 0
         self.space_str = " " * 2
         self.file = file
+        self.writer = ForgeWriter(file, self.space_str, direct_fd=direct_fd)
+        self.ir = IRBuilder(self.writer)
+        # phases of main_seq_text.py --profile, each role is timed as its own phase
+        self.profiler = Profiler()
 
     def get_fresh_num(self):
         self.fresh_num += 1
@@ -27,37 +34,36 @@ class Transcribe_obj:
         self.space_lvl -= 1
 
     def print_to_file(self, txt, add_space=True):
+        if self.ir.is_open():
+            self.emit(Blank() if txt == "\n" else Raw(txt.removesuffix("\n")))
+            return
         if txt == "\n":
             add_space = False
-        if add_space:
-            print(self.space_lvl * self.space_str, end="", file=self.file)
-        print(txt, end="", file=self.file)
+        self.writer.write(txt, self.space_lvl if add_space else 0)
+
+    def emit(self, node: Node):
+        """adds node to the block being built, or prints it straight away
+        if it is a top level declaration"""
+        self.ir.emit(node, self.space_lvl)
 
     def import_file(self, other_forge_file: io.TextIOWrapper):
-        for line in other_forge_file:
-            self.print_to_file(line)
+        self.writer.write_file(other_forge_file, self.space_lvl)
+
+    def flush(self):
+        """writes out everything still buffered, has to be called once
+        transcription is done"""
+        self.writer.flush()
 
 #TODO: can change signature modifier to use an enum instead of a plain string
 # like below
     def write_sig(self, sig_name: str, parent_sig_name: None | str,
                   field_name_type: List[Tuple[str,
                                               str]], sig_modifier: str | None):
-        parent_sig_name = "" if parent_sig_name is None else f"extends {parent_sig_name} "
-        sig_modifier = "" if sig_modifier is None else sig_modifier + " "
-        self.print_to_file(
-            f"{sig_modifier}sig {sig_name} {parent_sig_name}{{\n")
-        self.start_block()
-        for field_name, field_type in field_name_type[:-1]:
-            self.print_to_file(f"{field_name} : {field_type},\n")
-        field_name, field_type = field_name_type[-1]
-        self.print_to_file(f"{field_name} : {field_type}\n")
-
-        self.end_block()
-        self.print_to_file("}\n")
+        self.emit(Sig(sig_name, parent_sig_name, field_name_type, sig_modifier))
 
     def write_new_seq_constraint(self,seq_expr:str,seq_terms:List[NonCatTerm],send_recv:SendRecv,timeslot_expr:str,sig_context:"RoleOrSkelTranscrContext"):
         indices_str = "+".join([str(i) for i in range(len(seq_terms))])
-        self.print_to_file(f"inds[{seq_expr}] = {indices_str}\n")
+        self.emit(Eq(f"inds[{seq_expr}]", indices_str))
 
         seq_term_exprs : List[str]= []
         quantifier_variables : List[Tuple[int,str]] = []
@@ -73,7 +79,7 @@ class Transcribe_obj:
 
         def transcribe_subterms():
             for indx,quantifier_variable in quantifier_variables:
-                self.print_to_file(f"{seq_expr}[{indx}] = {quantifier_variable}\n")
+                self.emit(Eq(f"{seq_expr}[{indx}]", quantifier_variable))
             for indx,(seq_term_expr,seq_term) in enumerate(zip(seq_term_exprs,seq_terms)):
                 transcribe_non_cat(seq_term_expr,seq_term,send_recv,timeslot_expr,sig_context)
         if len(quantifier_variables) != 0:
@@ -125,12 +131,10 @@ class PredicateContext:
     transcr: Transcribe_obj
 
     def __enter__(self):
-        self.transcr.print_to_file(f"pred {self.pred_name} {{\n")
-        self.transcr.start_block()
+        self.transcr.ir.open_block(Pred(self.pred_name))
 
     def __exit__(self, exc_type, exc_value, traceback):
-        self.transcr.end_block()
-        self.transcr.print_to_file(f"}}\n")
+        self.transcr.ir.close_block(self.transcr.space_lvl)
 @dataclass
 class TimeslotContext:
     timeslot_names: List[str]
@@ -139,14 +143,12 @@ class TimeslotContext:
     def __enter__(self):
         cur_set = "Timeslot"
         for timeslot_name in self.timeslot_names:
-            self.transcr.print_to_file(f"some {timeslot_name} : {cur_set} {{\n")
-            self.transcr.start_block()
+            self.transcr.ir.open_block(Quant("some", [timeslot_name], cur_set, bar=False))
             cur_set = f"{timeslot_name}.(^next)"
 
     def __exit__(self,exc_type,exc_value,traceback):
         for _ in self.timeslot_names:
-            self.transcr.end_block()
-            self.transcr.print_to_file(f"}}\n")
+            self.transcr.ir.close_block(self.transcr.space_lvl)
 @dataclass
 class QuantifierPredicate:
     quantifer_enum: QuantiferEnum
@@ -155,25 +157,19 @@ class QuantifierPredicate:
     transcr: Transcribe_obj
 
     def __enter__(self):
-        variables_str = ','.join(self.var_names)
-        self.transcr.print_to_file(
-            f"{self.quantifer_enum} {variables_str} : {self.set_name} | {{\n")
-        self.transcr.start_block()
+        self.transcr.ir.open_block(Quant(str(self.quantifer_enum), self.var_names, self.set_name))
 
     def __exit__(self, exc_type, exc_value, traceback):
-        self.transcr.end_block()
-        self.transcr.print_to_file(f"}}\n")
+        self.transcr.ir.close_block(self.transcr.space_lvl)
 
 @dataclass
 class ImpliesPredicate:
     pre_condition:str
     transcr: Transcribe_obj
     def __enter__(self):
-        self.transcr.print_to_file(f"{self.pre_condition} => {{\n")
-        self.transcr.start_block()
+        self.transcr.ir.open_block(Implies(self.pre_condition))
     def __exit__(self,exc_type,exc_value,traceback):
-        self.transcr.end_block()
-        self.transcr.print_to_file(f"}}\n")
+        self.transcr.ir.close_block(self.transcr.space_lvl)
 
 @dataclass
 class SigContext:
@@ -371,7 +367,7 @@ def transcribe_enc(elm_expr: str, enc_term: EncTerm,send_recv:SendRecv ,timeslot
             term_str = sig_context.get_inv_key(enc_term.key)
             match sig_context:
                 case RoleTranscribeContext(_):
-                    transcr.print_to_file(f"learnt_term_by[{term_str},{sig_context.role_var_name}.agent,{timeslot_expr}]\n")
+                    transcr.emit(Call("learnt_term_by",[term_str,f"{sig_context.role_var_name}.agent",timeslot_expr]))
                 case SkeletonTranscribeContext(_):
                     pass
     transcr.write_new_seq_constraint(data_expr,enc_term.data,send_recv,timeslot_expr,sig_context)
@@ -399,9 +395,8 @@ def transcribe_base_term(elm_expr:str,msg:BaseTerm,send_recv:SendRecv,role_conte
     match msg:
         case Variable(_,MsgTypes.TEXT):
             if send_recv == SendRecv.SEND:
-                transcr.print_to_file(f"{elm_expr} in nonce\n")
-    constraint_expr = f"{elm_expr} = {role_context.get_base_term_str(msg)}\n"
-    transcr.print_to_file(constraint_expr)
+                transcr.emit(In(elm_expr,"nonce"))
+    transcr.emit(Eq(elm_expr,role_context.get_base_term_str(msg)))
 
 def transcribe_non_cat(elm_expr: str, msg: NonCatTerm,send_recv:SendRecv,timeslot_expr:str,
                        role_context: RoleOrSkelTranscrContext):
@@ -420,9 +415,9 @@ def transcribe_indv_trace(role: Role, indx: int,
     role_var_name = role_context.role_var_name
     match send_recv:
         case SendRecv.SEND:
-            transcr.print_to_file(f"t{indx}.sender = {role_var_name}\n")
+            transcr.emit(Eq(f"t{indx}.sender",role_var_name))
         case SendRecv.RECV:
-            transcr.print_to_file(f"t{indx}.receiver = {role_var_name}\n")
+            transcr.emit(Eq(f"t{indx}.receiver",role_var_name))
     match mesg:
         case CatTerm(_) as cat:
             transcr.write_new_seq_constraint(f"(t{indx}.data)",cat.data,send_recv,f"t{indx}",role_context)
@@ -456,10 +451,10 @@ def transcribe_trace(role: Role, role_context: RoleTranscribeContext):
     with TimeslotContext(timeslot_names,transcr):
         all_timeslots_set = "+".join(timeslot_names)
         role_var_name = role_context.role_var_name
-        transcr.print_to_file(f"{all_timeslots_set} = sender.{role_var_name} + receiver.{role_var_name}\n")
+        transcr.emit(Eq(all_timeslots_set,f"sender.{role_var_name} + receiver.{role_var_name}"))
         for i in range(len(role.trace)):
             transcribe_indv_trace(role,i,role_context)
-            role_context.get_transcr().print_to_file("\n")
+            role_context.get_transcr().emit(Blank())
 
     # for _ in timeslot_names:
     #     transcr.end_block()
@@ -480,12 +475,13 @@ def transcribe_protocol(protocol: Protocol, transcr: Transcribe_obj):
     """Function to transcribe the protocol object returned by the parser
     contains nested functions to parse sub components like roles,signatures"""
     for role in protocol.role_arr:
-        transcribe_role(
-            role,
-            transcr.create_role_context(
-                role, protocol,
-                transcr.role_var_name_in_prot_pred(role.role_name,
-                                                   protocol.protocol_name)))
+        with transcr.profiler.phase(f"role {role.role_name}"):
+            transcribe_role(
+                role,
+                transcr.create_role_context(
+                    role, protocol,
+                    transcr.role_var_name_in_prot_pred(role.role_name,
+                                                       protocol.protocol_name)))
 
 
 def transcribe_skeleton_to_sig(skeleton: Skeleton,protocol:Protocol, skeleton_sig_name: str,
@@ -518,7 +514,7 @@ def transcribe_strand(strand: Strand,
                 strand_var.var_name)
             skeleton_var_str = skeleton_transcr_context.acess_variable(
                 skeleton_var_name)
-            transcr.print_to_file(f"{strand_var_str} = {skeleton_var_str}\n")
+            transcr.emit(Eq(strand_var_str,skeleton_var_str))
 
 
 #TODO: Can simplifly functions related to transcribing publick key privk and others since they are very small
@@ -529,9 +525,7 @@ def transcribe_non_orig(non_orig: NonOrig,
         base_term_str = skeleton_transcr_context.get_base_term_str(base_term)
         with QuantifierPredicate(QuantiferEnum.NO, ["aStrand"], "strand",
                                  transcr):
-            transcr.print_to_file(
-                f"originates[aStrand,{base_term_str}] or generates [aStrand,{base_term_str}]\n"
-            )
+            transcr.emit(Raw(f"originates[aStrand,{base_term_str}] or generates [aStrand,{base_term_str}]"))
 
 
 def transcribe_uniq_orig(uniq_orig: UniqOrig,
@@ -541,16 +535,14 @@ def transcribe_uniq_orig(uniq_orig: UniqOrig,
         base_term_str = skeleton_transcr_context.get_base_term_str(base_term)
         with QuantifierPredicate(QuantiferEnum.ONE, ["aStrand"], "strand",
                                  transcr):
-            transcr.print_to_file(
-                f"originates[aStrand,{base_term_str}] or generates [aStrand,{base_term_str}]\n"
-            )
+            transcr.emit(Raw(f"originates[aStrand,{base_term_str}] or generates [aStrand,{base_term_str}]"))
 
 def transcribe_not_eq(not_eq:NotEqConstraint,
                       skeleton_transcr_context:SkeletonTranscribeContext):
     transcr = skeleton_transcr_context.transcr
     term1_str = skeleton_transcr_context.get_base_term_str(not_eq.term1)
     term2_str = skeleton_transcr_context.get_base_term_str(not_eq.term2)
-    transcr.print_to_file(f"{term1_str} != {term2_str}\n")
+    transcr.emit(NotEq(term1_str,term2_str))
 
 def transcribe_indv_trace_constraint(skeleton:Skeleton,indv_trace_constraint:IndvSendRecvInConstraint,timeslot_name:str,transcr:Transcribe_obj,skel_transcr_context:SkeletonTranscribeContext):
     send_recv = indv_trace_constraint.trace_type
@@ -558,9 +550,9 @@ def transcribe_indv_trace_constraint(skeleton:Skeleton,indv_trace_constraint:Ind
     message = indv_trace_constraint.message
     match send_recv:
         case SendRecv.SEND:
-            transcr.print_to_file(f"{timeslot_name}.sender = {skel_transcr_context.acess_variable(send_recv_strand)}\n")
+            transcr.emit(Eq(f"{timeslot_name}.sender",skel_transcr_context.acess_variable(send_recv_strand)))
         case SendRecv.RECV:
-            transcr.print_to_file(f"{timeslot_name}.receiver = {skel_transcr_context.acess_variable(send_recv_strand)}\n")
+            transcr.emit(Eq(f"{timeslot_name}.receiver",skel_transcr_context.acess_variable(send_recv_strand)))
     data_in_timeslot = None
     match message:
         case CatTerm(data):
@@ -585,7 +577,7 @@ def transcribe_trace_constraint(trace_constraint:TraceConstraint,
             for timeslot_name,indv_trace_constraint in zip(timeslot_names,indv_trace_constraints):
                 transcribe_indv_trace_constraint(skeleton,indv_trace_constraint,
                                                  timeslot_name,transcr,skel_transcr_context)
-                transcr.print_to_file("\n")
+                transcr.emit(Blank())
 
     return trace_pred_name
 def transcribe_skeleton_to_predicate(skeleton: Skeleton, skel_num: int,
@@ -632,7 +624,7 @@ def transcribe_skeleton_to_predicate(skeleton: Skeleton, skel_num: int,
                     transcribe_not_eq(not_eq,skel_transcr_context)
 
         for trace_pred_name in trace_pred_names:
-            transcr.print_to_file(trace_pred_name + "\n")
+            transcr.emit(Call(trace_pred_name))
 
 
 def transcribe_skeleton(skeleton: Skeleton, protocol: Protocol,
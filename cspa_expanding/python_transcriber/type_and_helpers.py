@@ -1,4 +1,5 @@
 import sexpdata
+import weakref
 from dataclasses import dataclass
 from enum import Enum
 from typing import List,Tuple,Dict,Optional
@@ -26,8 +27,64 @@ class MsgTypes(Enum):
 # this is needed
 # TODO: can improve this VarType probably
 
-@dataclass
-class Variable:
+class HashConsed:
+    """base of the message term classes. Terms are frozen, list fields are
+    turned into tuples and the hash is computed once when the term is built.
+    make_term hands out one object per structurally equal term, so comparing
+    two interned terms stops at the identity check, terms built any other way
+    still compare by structure"""
+    __slots__ = ("_key", "_hash", "__weakref__")
+
+    def __post_init__(self):
+        values = []
+        for field_name in self.__dataclass_fields__:
+            value = getattr(self, field_name)
+            if isinstance(value, list):
+                value = tuple(value)
+                object.__setattr__(self, field_name, value)
+            values.append(value)
+        # class and fields, both the hash and the key of the intern table
+        key = (type(self), *values)
+        object.__setattr__(self, "_key", key)
+        object.__setattr__(self, "_hash", hash(key))
+
+    def field_values(self) -> tuple:
+        return self._key[1:]
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __eq__(self, other) -> bool:
+        if self is other:
+            return True
+        if type(other) is not type(self):
+            return NotImplemented
+        return self._hash == other._hash and self._key == other._key
+
+    def __reduce__(self):
+        # str hashes differ between processes so the hash is never pickled,
+        # unpickled terms are rebuilt and interned again
+        return (unpickle_term, (type(self), self.field_values()))
+
+# keyed by the class and fields of a term, an entry goes away with the last
+# reference to its term
+_interned_terms: "weakref.WeakValueDictionary[tuple, HashConsed]" = weakref.WeakValueDictionary()
+
+def make_term(term_type: type, *values):
+    """the one term_type(*values) object, built only if no structurally equal
+    term exists yet. Subterms in values have to come from make_term too"""
+    key = (term_type, *[tuple(value) if isinstance(value, list) else value for value in values])
+    term = _interned_terms.get(key)
+    if term is None:
+        term = term_type(*values)
+        _interned_terms[key] = term
+    return term
+
+def unpickle_term(term_type: type, values: tuple):
+    return make_term(term_type, *values)
+
+@dataclass(frozen=True, eq=False, slots=True)
+class Variable(HashConsed):
     var_name: str
     var_type: MsgTypes
     def __str__(self) -> str:
@@ -37,63 +94,63 @@ class Variable:
 
 VarMap = Dict[str,Variable]
 
-@dataclass
-class LtkTerm:
+@dataclass(frozen=True, eq=False, slots=True)
+class LtkTerm(HashConsed):
     agent1_name: str
     agent2_name: str
     def __repr__(self):
         return f"(ltk {self.agent1_name} {self.agent2_name})"
     def __str__(self):
         return self.__repr__()
-@dataclass
-class PubkTerm:
+@dataclass(frozen=True, eq=False, slots=True)
+class PubkTerm(HashConsed):
     agent_name:str
     def __repr__(self):
         return f"(pubk {self.agent_name})"
     def __str__(self):
         return self.__repr__()
-@dataclass
-class PrivkTerm:
+@dataclass(frozen=True, eq=False, slots=True)
+class PrivkTerm(HashConsed):
     agent_name:str
     def __repr__(self):
         return f"(privk {self.agent_name})"
 KeyTerm = LtkTerm | PubkTerm | PrivkTerm | Variable
-@dataclass
-class EncTerm:
-    data: List["Message"]
+@dataclass(frozen=True, eq=False, slots=True)
+class EncTerm(HashConsed):
+    data: Tuple["Message", ...]
     key: KeyTerm
     def __repr__(self):
         data_str = ' '.join([f"{msg}" for msg in self.data])
         return f"(enc {data_str} {self.key})"
 
-@dataclass
-class EncTermNoTpl:
+@dataclass(frozen=True, eq=False, slots=True)
+class EncTermNoTpl(HashConsed):
     data: "Message"
     key: KeyTerm
     def __repr__(self) -> str:
         return f"(enc {self.data} {self.key})"
 
-@dataclass
-class CatTerm:
-    data: List["Message"]
+@dataclass(frozen=True, eq=False, slots=True)
+class CatTerm(HashConsed):
+    data: Tuple["Message", ...]
     def __repr__(self):
         data_str = ' '.join([f"{msg}" for msg in self.data])
         return f"(cat {data_str})"
     def __str__(self) -> str:
         return self.__repr__()
 
-@dataclass
-class SeqTerm:
+@dataclass(frozen=True, eq=False, slots=True)
+class SeqTerm(HashConsed):
     #TODO: currently have seq inside seq might want to change that like we had for cat
-    data: List["NonCatTerm"]
+    data: Tuple["NonCatTerm", ...]
     def __repr__(self) -> str:
         data_str = ' '.join([f"{msg}" for msg in self.data])
         return f"(seq {data_str})"
     def __str__(self) -> str:
         return self.__repr__()
 
-@dataclass
-class HashTerm:
+@dataclass(frozen=True, eq=False, slots=True)
+class HashTerm(HashConsed):
     hash_of: "NonCatTerm"
     def __repr__(self) -> str:
         return f"(hash {self.hash_of})"
@@ -411,7 +468,7 @@ MESSAGE_CATEGORIES = [ENC_STR,CAT_STR,LTK_STR,PUBK_STR,PRIVK_STR,SEQ_STR,HASH_ST
 Sexp = sexpdata.Symbol | int | List[sexpdata.Symbol]
 
 predefined_constants : Dict[str,Variable] = {
-    ATTACKER_STR : Variable(ATTACKER_STR,MsgTypes.NAME)
+    ATTACKER_STR : make_term(Variable,ATTACKER_STR,MsgTypes.NAME)
 }
 
 class ParseException(Exception):
@@ -484,7 +541,7 @@ def var_in_msg_term(variable:Variable,msg_term:Message) -> bool:
         case Variable(_) as var:
             return variable == var
         case EncTerm(_) as enc:
-            return reduce(func_or,map(var_in_msg_lam,enc.data + [enc.key]))
+            return reduce(func_or,map(var_in_msg_lam,[*enc.data,enc.key]))
         case EncTermNoTpl(_) as enc_no_tpl:
             return var_in_msg_term(variable,enc_no_tpl.data)
         case CatTerm(_) as cat: